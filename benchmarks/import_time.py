@@ -0,0 +1,93 @@
+"""
+Cold import-time benchmark for llama_index_llms_asi.
+
+Every sample runs in a fresh interpreter, so nothing is cached in
+`sys.modules`. Exits non-zero when the median exceeds `--max-seconds`.
+
+Usage:
+    python -m benchmarks.import_time --repeat 10 --max-seconds 0.05
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, Optional, Sequence
+
+# Modules that must not be loaded by a bare `import llama_index_llms_asi`.
+HEAVY_MODULES = ("openai", "llama_index.core", "llama_index.llms.openai")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in {heavy} if m in sys.modules)
+print(json.dumps([elapsed, heavy]))
+"""
+
+
+def measure_import(
+    statement: str = "import llama_index_llms_asi",
+) -> Dict[str, Any]:
+    """
+    Time `statement` in a fresh interpreter.
+
+    Returns:
+        Dict[str, Any]: The elapsed seconds and which of `HEAVY_MODULES`
+            ended up imported.
+    """
+    code = _PROBE.format(statement=statement, heavy=repr(HEAVY_MODULES))
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    elapsed, heavy = json.loads(output.strip().splitlines()[-1])
+    return {"seconds": elapsed, "heavy_modules": heavy}
+
+
+def run(statement: str, repeat: int) -> Dict[str, Any]:
+    samples = [measure_import(statement) for _ in range(repeat)]
+    seconds = [s["seconds"] for s in samples]
+    return {
+        "statement": statement,
+        "repeat": repeat,
+        "median": statistics.median(seconds),
+        "min": min(seconds),
+        "max": max(seconds),
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    results = [
+        run("import llama_index_llms_asi", args.repeat),
+        run("from llama_index_llms_asi import ASI", args.repeat),
+    ]
+    for result in results:
+        print(
+            f"{result['statement']:<40} median={result['median'] * 1000:8.1f}ms  "
+            f"heavy={','.join(result['heavy_modules']) or '-'}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    bare = results[0]
+    if bare["heavy_modules"]:
+        print(f"Bare import loaded {bare['heavy_modules']}")
+        return 1
+    if args.max_seconds is not None and bare["median"] > args.max_seconds:
+        print(f"Bare import took {bare['median']:.3f}s > {args.max_seconds}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
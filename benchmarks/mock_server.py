@@ -0,0 +1,261 @@
+"""Local OpenAI-compatible stand-in for the ASI API."""
+
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class MockServerConfig:
+    """
+    Behaviour of the mock ASI server.
+
+    Args:
+        latency (float): Seconds before the response (or first chunk) is sent.
+        latency_jitter (float): Uniform random extra latency, in seconds.
+        completion_tokens (int): Number of tokens in every reply.
+        tokens_per_second (Optional[float]): Streaming token rate. None sends
+            all chunks as fast as possible.
+        chunk_tokens (int): Tokens per streamed chunk.
+        error_rate (float): Fraction of requests answered with `error_status`.
+        error_status (int): HTTP status used for injected errors.
+        seed (Optional[int]): Seed of the jitter/error random generator.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        completion_tokens: int = 16,
+        tokens_per_second: Optional[float] = None,
+        chunk_tokens: int = 1,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.completion_tokens = completion_tokens
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> Dict[str, int]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("content-length", 0))
+        data = self.rfile.read(length)
+        if self.headers.get("content-encoding") == "gzip":
+            data = gzip.decompress(data)
+        body = json.loads(data or b"{}")
+        state = self.server.state
+        config = state.config
+        with state.lock:
+            state.requests += 1
+            fail = state.random.random() < config.error_rate
+            delay = config.latency + state.random.uniform(0, config.latency_jitter)
+
+        time.sleep(delay)
+        if fail:
+            self._send_json(
+                config.error_status,
+                {"error": {"message": "injected error", "type": "mock_error"}},
+                headers={"retry-after": "0"},
+            )
+            return
+
+        is_chat = self.path.rstrip("/").endswith("/chat/completions")
+        if not is_chat and not self.path.rstrip("/").endswith("/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        tokens = [f"tok{i} " for i in range(config.completion_tokens)]
+        text = "".join(tokens)
+        prompt = body.get("messages", body.get("prompt", ""))
+        prompt_tokens = len(json.dumps(prompt)) // 4
+        if body.get("stream"):
+            self._stream(body, tokens, is_chat)
+        elif is_chat:
+            self._send_json(
+                200,
+                {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "asi1-mini"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": _usage(prompt_tokens, len(tokens)),
+                },
+            )
+        else:
+            self._send_json(
+                200,
+                {
+                    "id": "cmpl-mock",
+                    "object": "text_completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "asi1-mini"),
+                    "choices": [
+                        {"index": 0, "text": text, "finish_reason": "stop"}
+                    ],
+                    "usage": _usage(prompt_tokens, len(tokens)),
+                },
+            )
+
+    def _send_json(
+        self,
+        status: int,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _stream(
+        self, body: Dict[str, Any], tokens: List[str], is_chat: bool
+    ) -> None:
+        config = self.server.state.config
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+
+        step = config.chunk_tokens
+        pause = step / config.tokens_per_second if config.tokens_per_second else 0.0
+        for start in range(0, len(tokens), step):
+            text = "".join(tokens[start : start + step])
+            if is_chat:
+                choice: Dict[str, Any] = {
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": text},
+                    "finish_reason": None,
+                }
+                kind = "chat.completion.chunk"
+            else:
+                choice = {"index": 0, "text": text, "finish_reason": None}
+                kind = "text_completion"
+            event = {
+                "id": "chunk-mock",
+                "object": kind,
+                "created": int(time.time()),
+                "model": body.get("model", "asi1-mini"),
+                "choices": [choice],
+            }
+            data = json.dumps(event).encode("utf-8")
+            self._write_chunk(b"data: " + data + b"\n\n")
+            if pause and start + step < len(tokens):
+                time.sleep(pause)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class _ServerState:
+    def __init__(self, config: MockServerConfig) -> None:
+        self.config = config
+        self.lock = threading.Lock()
+        self.random = random.Random(config.seed)
+        self.requests = 0
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    state: _ServerState
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients closing keep-alive or cancelled streams are expected here.
+        pass
+
+
+class MockASIServer:
+    """
+    Runs the mock ASI API on a background thread.
+
+    Examples:
+        ```python
+        with MockASIServer(MockServerConfig(latency=0.05)) as server:
+            llm = ASI(api_key="mock", api_base=server.url)
+            llm.complete("Hello")
+        ```
+    """
+
+    def __init__(
+        self,
+        config: Optional[MockServerConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or MockServerConfig()
+        self._server = _Server((host, port), _Handler)
+        self._server.state = _ServerState(self.config)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as the ASI `api_base`."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def requests(self) -> int:
+        """Number of requests received so far."""
+        return self._server.state.requests
+
+    def start(self) -> "MockASIServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mock-asi-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockASIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
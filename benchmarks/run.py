@@ -0,0 +1,256 @@
+"""
+Client-side overhead benchmarks for ASI against the local mock server.
+
+Usage:
+    python -m benchmarks.run --concurrency 1,8,32 --requests 200 \
+        --output bench_results.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from benchmarks.mock_server import MockASIServer, MockServerConfig
+from llama_index_llms_asi import ASI
+
+MODES = (
+    "complete",
+    "chat",
+    "stream_complete",
+    "stream_chat",
+    "acomplete",
+    "achat",
+    "astream_complete",
+    "astream_chat",
+    "stream_chat_deltas",
+    "astream_chat_deltas",
+)
+
+PROMPT = "Summarize the benefits of connection pooling in one sentence."
+
+
+def _messages() -> List[ChatMessage]:
+    return [
+        ChatMessage(role=MessageRole.SYSTEM, content="You are a helpful assistant."),
+        ChatMessage(role=MessageRole.USER, content=PROMPT),
+    ]
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of `samples`, or None when empty."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(q * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def _sync_call(llm: ASI, mode: str) -> Optional[float]:
+    """Run one sync request, returning the time to first chunk for streams."""
+    start = time.perf_counter()
+    if mode == "complete":
+        llm.complete(PROMPT)
+        return None
+    if mode == "chat":
+        llm.chat(_messages())
+        return None
+    if mode == "stream_complete":
+        stream: Any = llm.stream_complete(PROMPT)
+    elif mode == "stream_chat_deltas":
+        stream = llm.stream_chat_deltas(_messages())
+    else:
+        stream = llm.stream_chat(_messages())
+    first_chunk = None
+    for _ in stream:
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+    return first_chunk
+
+
+async def _async_call(llm: ASI, mode: str) -> Optional[float]:
+    """Run one async request, returning the time to first chunk for streams."""
+    start = time.perf_counter()
+    if mode == "acomplete":
+        await llm.acomplete(PROMPT)
+        return None
+    if mode == "achat":
+        await llm.achat(_messages())
+        return None
+    if mode == "astream_complete":
+        stream: Any = await llm.astream_complete(PROMPT)
+    elif mode == "astream_chat_deltas":
+        stream = llm.astream_chat_deltas(_messages())
+    else:
+        stream = await llm.astream_chat(_messages())
+    first_chunk = None
+    async for _ in stream:
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+    return first_chunk
+
+
+def _timed(call: Callable[[], Optional[float]]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        first_chunk = call()
+    except Exception as e:
+        return {"latency": time.perf_counter() - start, "error": repr(e)}
+    return {"latency": time.perf_counter() - start, "first_chunk": first_chunk}
+
+
+async def _atimed(llm: ASI, mode: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        first_chunk = await _async_call(llm, mode)
+    except Exception as e:
+        return {"latency": time.perf_counter() - start, "error": repr(e)}
+    return {"latency": time.perf_counter() - start, "first_chunk": first_chunk}
+
+
+async def _arun(llm: ASI, mode: str, concurrency: int, requests: int) -> List[Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> Dict[str, Any]:
+        async with semaphore:
+            return await _atimed(llm, mode)
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+def run_benchmark(
+    llm: ASI,
+    mode: str,
+    concurrency: int,
+    requests: int,
+    trace_memory: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run `requests` calls of `mode` with `concurrency` callers in flight.
+
+    Returns:
+        Dict[str, Any]: Throughput, latency and time-to-first-chunk
+            percentiles (seconds), error count and peak traced memory.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}.")
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    if mode.startswith("a"):
+        samples = asyncio.run(_arun(llm, mode, concurrency, requests))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(
+                executor.map(
+                    lambda _: _timed(lambda: _sync_call(llm, mode)), range(requests)
+                )
+            )
+    elapsed = time.perf_counter() - start
+
+    peak_memory = None
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    latencies = [s["latency"] for s in samples if "error" not in s]
+    first_chunks = [s["first_chunk"] for s in samples if s.get("first_chunk")]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for s in samples if "error" in s),
+        "elapsed": elapsed,
+        "throughput": requests / elapsed if elapsed else None,
+        "latency_mean": statistics.mean(latencies) if latencies else None,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "first_chunk_p50": percentile(first_chunks, 0.5),
+        "first_chunk_p95": percentile(first_chunks, 0.95),
+        "peak_traced_memory": peak_memory,
+    }
+
+
+def run_suite(
+    config: MockServerConfig,
+    modes: Sequence[str] = MODES,
+    concurrency_levels: Sequence[int] = (1, 8, 32),
+    requests: int = 200,
+    trace_memory: bool = False,
+    **llm_kwargs: Any,
+) -> Dict[str, Any]:
+    """Start a mock server and benchmark every mode at every concurrency."""
+    results = []
+    with MockASIServer(config) as server:
+        llm = ASI(api_key="mock", api_base=server.url, max_retries=0, **llm_kwargs)
+        for mode in modes:
+            for concurrency in concurrency_levels:
+                results.append(
+                    run_benchmark(llm, mode, concurrency, requests, trace_memory)
+                )
+    return {
+        "created": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "server": config.as_dict(),
+        "results": results,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    config = MockServerConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        completion_tokens=args.completion_tokens,
+        tokens_per_second=args.tokens_per_second,
+        chunk_tokens=args.chunk_tokens,
+        error_rate=args.error_rate,
+        seed=0,
+    )
+    report = run_suite(
+        config,
+        modes=args.modes.split(","),
+        concurrency_levels=[int(c) for c in args.concurrency.split(",")],
+        requests=args.requests,
+        trace_memory=args.trace_memory,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for result in report["results"]:
+        print(
+            f"{result['mode']:>16} c={result['concurrency']:<3} "
+            f"{result['throughput']:8.1f} req/s  "
+            f"p50={result['latency_p50'] or 0:.4f}s  "
+            f"p99={result['latency_p99'] or 0:.4f}s  "
+            f"errors={result['errors']}"
+        )
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
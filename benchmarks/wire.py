@@ -0,0 +1,114 @@
+"""
+Client-side cost of building and sending ASI chat requests.
+
+Sends RAG-sized chats (a shared system prompt and retrieved context with a
+different question each time) through an in-process transport, so only the
+client's own work is measured: CPU time per request and bytes on the wire,
+for the default SDK path and the compact and gzip paths.
+
+Usage:
+    python -m benchmarks.wire --requests 500 --context-kb 40
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI
+
+CONFIGS = {
+    "default": {},
+    "compact": {"compact_requests": True},
+    "compact+gzip": {"compact_requests": True, "gzip_requests": True},
+}
+
+_REPLY = json.dumps(
+    {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "asi1-mini",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "ok"},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+).encode("utf-8")
+
+
+def _context(kilobytes: int) -> str:
+    passage = (
+        "Rust guarantees memory safety with a borrow checker; \"unsafe\" blocks "
+        "opt out. Python favours readability and ships batteries included.\n"
+    )
+    return passage * (kilobytes * 1024 // len(passage) + 1)
+
+
+def run_config(
+    name: str, requests: int, context_kb: int, **llm_kwargs: Any
+) -> Dict[str, Any]:
+    """Send `requests` chats with one configuration and measure them."""
+    sent: List[int] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(len(request.content))
+        return httpx.Response(
+            200, content=_REPLY, headers={"content-type": "application/json"}
+        )
+
+    llm = ASI(
+        api_key="bench",
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+        **llm_kwargs,
+    )
+    system = ChatMessage(
+        role=MessageRole.SYSTEM,
+        content="Answer from the context below.\n" + _context(context_kb),
+    )
+    llm.chat([system, ChatMessage(role=MessageRole.USER, content="warm-up")])
+    sent.clear()
+    start = time.process_time()
+    for i in range(requests):
+        question = ChatMessage(role=MessageRole.USER, content=f"Question {i}?")
+        llm.chat([system, question])
+    cpu = time.process_time() - start
+    return {
+        "config": name,
+        "requests": requests,
+        "cpu_ms_per_request": cpu / requests * 1000,
+        "bytes_per_request": sum(sent) / len(sent),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--context-kb", type=int, default=40)
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.configs.split(","):
+        result = run_config(name, args.requests, args.context_kb, **CONFIGS[name])
+        results.append(result)
+        print(
+            f"{name:<14} cpu/request={result['cpu_ms_per_request']:7.3f}ms  "
+            f"bytes/request={result['bytes_per_request']:9.0f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
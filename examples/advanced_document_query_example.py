@@ -107,10 +107,8 @@ def create_sample_documents():
 def main():
     """Run the advanced document query example."""
     # Import necessary modules
-    from llama_index_llms_asi import ASI
+    from llama_index_llms_asi import ASI, NodeCache, run_queries
     from llama_index.core.node_parser import SentenceSplitter
-    from llama_index.core.indices.vector_store import VectorStoreIndex
-    from llama_index.core.query_engine import RetrieverQueryEngine
     from llama_index.core.retrievers import VectorIndexRetriever
     from llama_index.core.postprocessor import SimilarityPostprocessor
     from llama_index.core.settings import Settings
@@ -139,13 +137,22 @@ def main():
     
     # Create a parser for splitting the documents into nodes
     parser = SentenceSplitter(chunk_size=Settings.chunk_size)
-    nodes = parser.get_nodes_from_documents(documents)
     
-    print(f"Documents split into {len(nodes)} nodes")
+    # Cache parsed nodes and their embeddings on disk, so later runs only
+    # embed new or changed documents
+    node_cache = NodeCache(
+        os.environ.get("ASI_NODE_CACHE", ".asi-node-cache/languages"),
+        embed_model,
+        transformations=[parser],
+    )
     
-    # Create a vector store index from the nodes
+    # Create a vector store index from the cached nodes
     print("\nCreating a vector store index...")
-    index = VectorStoreIndex(nodes)
+    index = node_cache.build_index(documents)
+    stats = node_cache.stats
+    print(f"Documents embedded: {stats.documents_indexed}, "
+          f"loaded from cache: {stats.documents_reused}")
+    node_cache.close()
     
     # Create a retriever with customized parameters
     retriever = VectorIndexRetriever(
@@ -153,13 +160,8 @@ def main():
         similarity_top_k=3,  # Retrieve top 3 most similar nodes
     )
     
-    # Create a query engine with the retriever and a similarity postprocessor
-    query_engine = RetrieverQueryEngine.from_args(
-        retriever=retriever,
-        node_postprocessors=[
-            SimilarityPostprocessor(similarity_cutoff=0.7)  # Only use nodes with similarity > 0.7
-        ]
-    )
+    # Only use nodes with similarity > 0.7
+    postprocessors = [SimilarityPostprocessor(similarity_cutoff=0.7)]
     
     # Example queries
     queries = [
@@ -170,18 +172,32 @@ def main():
         "Which programming languages support multiple programming paradigms?",
     ]
     
-    # Run queries
-    for i, query in enumerate(queries, 1):
-        print(f"\nQuery {i}: {query}")
-        response = query_engine.query(query)
-        print(f"Response: {response}")
-        print(f"Source nodes: {len(response.source_nodes)}")
+    # Run queries as a pipeline: retrieval for the next queries overlaps with
+    # generation of earlier answers, with up to 3 answers streaming at once.
+    results = run_queries(
+        llm,
+        retriever,
+        queries,
+        max_concurrency=3,
+        node_postprocessors=postprocessors,
+    )
+    for i, result in enumerate(results, 1):
+        print(f"\nQuery {i}: {result.query}")
+        if not result.ok:
+            print(f"Error: {result.error}")
+            continue
+        print(f"Response: {result.response}")
+        print(f"Source nodes: {len(result.source_nodes)}")
         
         # Print metadata from source nodes
         print("Sources:")
-        for j, node in enumerate(response.source_nodes, 1):
+        for j, node in enumerate(result.source_nodes, 1):
             print(f"  {j}. {node.metadata.get('language', 'Unknown')} "
                   f"(Relevance score: {node.score:.4f})")
+        print(f"Timings: retrieve {result.retrieve_time:.2f}s, "
+              f"first token {result.first_token_time or 0:.2f}s, "
+              f"generate {result.generate_time:.2f}s, "
+              f"total {result.total_time:.2f}s")
 
 
 if __name__ == "__main__":
@@ -60,9 +60,8 @@ def create_sample_document():
 def main():
     """Run the document query example."""
     # Import necessary modules
-    from llama_index_llms_asi import ASI
+    from llama_index_llms_asi import ASI, NodeCache
     from llama_index.core.node_parser import SentenceSplitter
-    from llama_index.core.indices.vector_store import VectorStoreIndex
     from llama_index.core.settings import Settings
     from llama_index.embeddings.huggingface import HuggingFaceEmbedding
     
@@ -88,13 +87,22 @@ def main():
     
     # Create a parser for splitting the document into nodes
     parser = SentenceSplitter(chunk_size=Settings.chunk_size)
-    nodes = parser.get_nodes_from_documents([document])
     
-    print(f"Document split into {len(nodes)} nodes")
+    # Cache parsed nodes and their embeddings on disk, so later runs only
+    # embed new or changed documents
+    node_cache = NodeCache(
+        os.environ.get("ASI_NODE_CACHE", ".asi-node-cache/ai"),
+        embed_model,
+        transformations=[parser],
+    )
     
-    # Create a vector store index from the nodes
+    # Create a vector store index from the cached nodes
     print("\nCreating a vector store index...")
-    index = VectorStoreIndex(nodes)
+    index = node_cache.build_index([document])
+    stats = node_cache.stats
+    print(f"Documents embedded: {stats.documents_indexed}, "
+          f"loaded from cache: {stats.documents_reused}")
+    node_cache.close()
     
     # Create a query engine
     query_engine = index.as_query_engine()
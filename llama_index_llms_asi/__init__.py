@@ -1,5 +1,144 @@
-"""ASI LLM integration for LlamaIndex."""
+"""
+ASI LLM integration for LlamaIndex.
 
-from llama_index_llms_asi.asi import ASI
+Public names are imported lazily on first access, so importing this package
+does not load `llama_index.core` or the OpenAI SDK until `ASI` (or another
+export) is actually used.
+"""
 
-__all__ = ["ASI"]
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from llama_index_llms_asi.asi import ASI
+    from llama_index_llms_asi.balancer import CircuitBreaker, Endpoint, LoadBalancer
+    from llama_index_llms_asi.batch import BatchResult
+    from llama_index_llms_asi.batch_file import (
+        BatchFileStats,
+        arun_batch_file,
+        run_batch_file,
+    )
+    from llama_index_llms_asi.cache import BaseCache, InMemoryCache, SQLiteCache
+    from llama_index_llms_asi.concurrency import (
+        AdaptiveConcurrencyLimiter,
+        LoadShedError,
+    )
+    from llama_index_llms_asi.models import ModelInfo, register_model
+    from llama_index_llms_asi.node_cache import NodeCache
+    from llama_index_llms_asi.pool import (
+        aclose_connection_pool,
+        close_connection_pool,
+    )
+    from llama_index_llms_asi.process_pool import map_chat, map_complete
+    from llama_index_llms_asi.query_pipeline import (
+        QueryResult,
+        aiter_queries,
+        arun_queries,
+        run_queries,
+    )
+    from llama_index_llms_asi.recording import (
+        AsyncRecordingTransport,
+        AsyncReplayTransport,
+        Recorder,
+        Recording,
+        RecordingTransport,
+        ReplayTransport,
+    )
+    from llama_index_llms_asi.scheduler import (
+        DeadlineExceededError,
+        FairScheduler,
+        Tenant,
+        tenant_context,
+    )
+    from llama_index_llms_asi.semantic_cache import SemanticCache
+    from llama_index_llms_asi.stopping import StopCondition
+    from llama_index_llms_asi.streaming import AsyncDeltaStream, DeltaStream
+    from llama_index_llms_asi.structured import (
+        AsyncStructuredStream,
+        StructuredItem,
+        StructuredOutputError,
+        StructuredStream,
+    )
+    from llama_index_llms_asi.telemetry import (
+        CallbackSink,
+        CallMetrics,
+        HistogramSink,
+        MultiSink,
+        OpenTelemetrySink,
+        PrometheusSink,
+        TelemetrySink,
+    )
+    from llama_index_llms_asi.tokens import TokenCounter
+    from llama_index_llms_asi.tools import acall_tools, call_tools
+
+_EXPORTS = {
+    "ASI": "asi",
+    "AdaptiveConcurrencyLimiter": "concurrency",
+    "AsyncDeltaStream": "streaming",
+    "AsyncRecordingTransport": "recording",
+    "AsyncReplayTransport": "recording",
+    "AsyncStructuredStream": "structured",
+    "BaseCache": "cache",
+    "BatchFileStats": "batch_file",
+    "BatchResult": "batch",
+    "CallMetrics": "telemetry",
+    "CallbackSink": "telemetry",
+    "CircuitBreaker": "balancer",
+    "DeadlineExceededError": "scheduler",
+    "DeltaStream": "streaming",
+    "Endpoint": "balancer",
+    "FairScheduler": "scheduler",
+    "HistogramSink": "telemetry",
+    "InMemoryCache": "cache",
+    "LoadBalancer": "balancer",
+    "LoadShedError": "concurrency",
+    "ModelInfo": "models",
+    "MultiSink": "telemetry",
+    "NodeCache": "node_cache",
+    "OpenTelemetrySink": "telemetry",
+    "PrometheusSink": "telemetry",
+    "QueryResult": "query_pipeline",
+    "Recorder": "recording",
+    "Recording": "recording",
+    "RecordingTransport": "recording",
+    "ReplayTransport": "recording",
+    "SQLiteCache": "cache",
+    "SemanticCache": "semantic_cache",
+    "StopCondition": "stopping",
+    "StructuredItem": "structured",
+    "StructuredOutputError": "structured",
+    "StructuredStream": "structured",
+    "TelemetrySink": "telemetry",
+    "Tenant": "scheduler",
+    "TokenCounter": "tokens",
+    "acall_tools": "tools",
+    "aclose_connection_pool": "pool",
+    "aiter_queries": "query_pipeline",
+    "arun_batch_file": "batch_file",
+    "arun_queries": "query_pipeline",
+    "call_tools": "tools",
+    "close_connection_pool": "pool",
+    "map_chat": "process_pool",
+    "map_complete": "process_pool",
+    "register_model": "models",
+    "run_batch_file": "batch_file",
+    "run_queries": "query_pipeline",
+    "tenant_context": "scheduler",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{module_name}")
+    value = getattr(module, name)
+    # Cache on the package so later lookups skip __getattr__.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -1,12 +1,191 @@
 """ASI LLM implementation."""
 
+import asyncio
+import functools
+import logging
 import os
-from typing import Any, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
+import httpx
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.llms.openai.utils import to_openai_message_dicts
 from llama_index.llms.openai_like import OpenAILike
+from openai import AsyncOpenAI
+from openai import OpenAI as SyncOpenAI
+
+from llama_index_llms_asi.balancer import (
+    DEFAULT_FAILURE_THRESHOLD,
+    DEFAULT_RESET_TIMEOUT,
+    AsyncBalancedTransport,
+    BalancedTransport,
+    Endpoint,
+    LoadBalancer,
+)
+from llama_index_llms_asi.batch import (
+    DEFAULT_BATCH_CONCURRENCY,
+    BatchResult,
+    aiter_batch,
+    arun_batch,
+)
+from llama_index_llms_asi.cache import (
+    BaseCache,
+    CacheEntry,
+    dump_chat_response,
+    dump_completion_response,
+    load_chat_response,
+    load_completion_response,
+    make_cache_key,
+    replay_chat_response,
+    replay_completion_response,
+)
+from llama_index_llms_asi.coalesce import SingleFlight
+from llama_index_llms_asi.concurrency import (
+    DEFAULT_INITIAL_LIMIT,
+    DEFAULT_MAX_LIMIT,
+    AdaptiveConcurrencyLimiter,
+)
+from llama_index_llms_asi.hedging import (
+    DEFAULT_HEDGE_BUDGET,
+    DEFAULT_HEDGE_INITIAL_DELAY,
+    DEFAULT_HEDGE_PERCENTILE,
+    Hedger,
+)
+from llama_index_llms_asi.models import ModelInfo, get_model_info
+from llama_index_llms_asi.pool import (
+    DEFAULT_KEEPALIVE_EXPIRY,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    PoolKey,
+    get_connection_pool,
+    make_pool_key,
+)
+from llama_index_llms_asi.prefetch import (
+    DEFAULT_PREFETCH_TTL,
+    AsyncPriorityTransport,
+    Prefetcher,
+    PriorityGate,
+    PriorityTransport,
+    in_background,
+)
+from llama_index_llms_asi.ratelimit import (
+    AdaptiveRateLimiter,
+    AsyncRateLimitedTransport,
+    RateLimitedTransport,
+    get_rate_limiter,
+)
+from llama_index_llms_asi.recording import (
+    AsyncRecordingTransport,
+    AsyncReplayTransport,
+    Recorder,
+    Recording,
+    RecordingTransport,
+    ReplayTransport,
+)
+from llama_index_llms_asi.scheduler import (
+    BATCH,
+    FairScheduler,
+    current_tenant,
+    tenant_context,
+)
+from llama_index_llms_asi.semantic_cache import DEFAULT_NAMESPACE, SemanticCache
+from llama_index_llms_asi.stopping import StopCondition, astop_stream, stop_stream
+from llama_index_llms_asi.streaming import AsyncDeltaStream, DeltaStream
+from llama_index_llms_asi.structured import AsyncStructuredStream, StructuredStream
+from llama_index_llms_asi.telemetry import (
+    AsyncTracingTransport,
+    CallMetrics,
+    TelemetrySink,
+    TracingTransport,
+    arecord_call,
+    arecord_stream,
+    record_cache_lookup,
+    record_call,
+    record_stream,
+)
+from llama_index_llms_asi.tokens import (
+    TokenCounter,
+    fit_messages,
+    get_token_counter,
+    pack_nodes,
+)
+from llama_index_llms_asi.tools import acall_tools, call_tools
+from llama_index_llms_asi.wire import (
+    DEFAULT_GZIP_MIN_SIZE,
+    ASIOpenAI,
+    AsyncASIOpenAI,
+    RequestEncoder,
+)
+
+if TYPE_CHECKING:
+    from llama_index.core.chat_engine.types import AgentChatResponse
+    from llama_index.core.tools import BaseTool, ToolOutput
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_MODEL = "asi1-mini"
 
+# Options holding locks, threads or live sinks. They are not pickled, so an
+# unpickled ASI gets none and needs its own.
+_PROCESS_LOCAL_OPTIONS = ("scheduler", "telemetry", "rate_limiter")
+
+N = TypeVar("N")
+
+
+def _chat_text(messages: Sequence[ChatMessage]) -> str:
+    """Render a chat as the text embedded by the semantic cache."""
+    return "\n".join(f"{m.role.value}: {m.content or ''}" for m in messages)
+
+
+def _agent_response(
+    response: ChatResponse,
+    outputs: List["ToolOutput"],
+    allow_parallel_tool_calls: bool,
+    error_on_tool_error: bool,
+) -> "AgentChatResponse":
+    """Combine tool outputs the way `FunctionCallingLLM.predict_and_call` does."""
+    from llama_index.core.chat_engine.types import AgentChatResponse
+
+    if error_on_tool_error and any(output.is_error for output in outputs):
+        raise ValueError("\n\n".join(output.content for output in outputs))
+    if allow_parallel_tool_calls:
+        text = "\n\n".join(output.content for output in outputs)
+        return AgentChatResponse(response=text, sources=outputs)
+    if len(outputs) > 1:
+        raise ValueError(
+            f"Expected at most one tool call, got {len(outputs)}. "
+            "Pass allow_parallel_tool_calls=True to run several."
+        )
+    if not outputs:
+        return AgentChatResponse(response=response.message.content or "", sources=[])
+    return AgentChatResponse(response=outputs[0].content, sources=outputs)
+
 
 class ASI(OpenAILike):
     """
@@ -29,15 +208,359 @@ class ASI(OpenAILike):
         
         print(response)
         ```
+
+    Unless an explicit `http_client`/`async_http_client` is given, all ASI
+    instances talking to the same `api_base` with the same credentials share
+    one keep-alive connection pool per process. Call
+    `llama_index_llms_asi.close_connection_pool()` on shutdown to release it.
+
+    Pass a `cache` (e.g. `InMemoryCache()` or `SQLiteCache("asi.db")`) to reuse
+    responses of identical requests. Keys cover the model, the messages or
+    prompt and all sampling parameters; cached chats are replayed as a single
+    chunk by the streaming methods. Hit/miss counters live in `cache.stats`.
+
+    A `semantic_cache` (`SemanticCache(embed_model)`) additionally answers
+    prompts that paraphrase an earlier one: on an exact miss the prompt is
+    embedded and the answer of the most similar stored prompt with the same
+    parameters is returned if it clears the similarity threshold. Entries are
+    grouped by `semantic_cache_namespace` and can be dropped per namespace
+    with `semantic_cache.invalidate(namespace)`.
+
+    ASI instances pickle as their configuration (including the API key) and
+    rebuild HTTP clients lazily in the process that uses them; a forked child
+    drops inherited clients and connections on first use. `scheduler`,
+    `telemetry` and `rate_limiter` stay in their process: they are left unset
+    in unpickled copies, with a warning. `map_complete` and `map_chat` spread
+    requests over a process pool this way.
+
+    Models registered as function calling (`asi1-mini` is) take native
+    `tools`, so LlamaIndex agents use tool calls instead of ReAct prompting,
+    and streamed tool-call deltas are accumulated into the final message.
+    `predict_and_call` and `apredict_and_call` run the tool calls of one turn
+    concurrently, at most `tool_concurrency` at a time.
+
+    With `record_path`, every HTTP exchange (including the timing of each
+    streamed chunk) is appended to a compact JSON Lines file. An instance
+    with `replay_path` answers requests from such a file instead of the
+    network, at the recorded pace divided by `replay_speed`, which makes load
+    tests deterministic and free.
+
+    With `prefetch_follow_ups` (e.g. `["Summarize that.", "Make it shorter."]`),
+    every chat queues those follow-up turns on a background thread, in list
+    order. They run only while no foreground request is in flight, and their
+    answers are kept for `prefetch_ttl` seconds, so asking one of them next
+    returns at once. Counters live in `prefetcher.stats`.
+
+    Pass `endpoints` (URLs or `Endpoint(api_base, api_key, weight)`) to spread
+    requests over several gateways or API keys, by weighted round-robin or
+    least outstanding requests (`load_balancing`). Endpoints failing
+    `circuit_failure_threshold` times in a row are ejected for
+    `circuit_reset_timeout` seconds, failed attempts move to another endpoint
+    at once, and `load_balancer.stats()` reports per-endpoint health and
+    latency.
+
+    Setting `requests_per_minute` and/or `tokens_per_minute` enables an
+    adaptive token-bucket limiter shared by every instance of the process that
+    targets the same endpoint and key (one limiter per endpoint when
+    balancing). It honors `Retry-After` and
+    `x-ratelimit-*` headers and backs off with jittered AIMD.
+
+    With `hedge_requests=True`, chat calls (and completions, which are sent as
+    chats) that have not answered, or streamed their first chunk, within the
+    `hedge_percentile` of recent latencies are duplicated and the faster
+    attempt wins. `hedge_budget` caps hedges as a fraction of all requests.
+
+    With `adaptive_concurrency=True`, async calls that reach the network hold
+    one of `concurrency_limiter.limit` slots. The limit follows a latency
+    gradient (or AIMD with `concurrency_algorithm="aimd"`) between 1 and
+    `max_in_flight`, backs off on 5xx, 429 and timeouts, and calls queued
+    longer than `max_queue_wait` fail fast with `LoadShedError`.
+
+    A `scheduler` (`FairScheduler(max_concurrency, tenants=[Tenant(...)])`)
+    queues requests that reach the network and starts them by weighted fair
+    queuing: interactive before batch, then by tenant weight, within
+    per-tenant concurrency and token budgets. Calls are attributed with
+    `with tenant_context("acme", priority="batch", timeout=30): ...`, and
+    requests still queued at their deadline raise `DeadlineExceededError`.
+
+    With `coalesce_requests=True`, identical chat or completion calls (same
+    model, messages and parameters) that overlap in time share one request:
+    the others wait for it and get the same response. Identical concurrent
+    streams share one upstream stream, and late joiners replay the chunks
+    already received. Coalesced calls sit behind the cache and in front of
+    hedging.
+
+    Context limits come from the ASI model registry (`register_model` adds
+    new models). `count_tokens`, `fit_messages` and `pack_nodes` budget
+    prompts locally with a memoizing token counter, and
+    `trim_to_context_window=True` trims chat histories automatically before
+    they are sent.
+
+    Pass a `telemetry` sink (`HistogramSink`, `PrometheusSink`,
+    `OpenTelemetrySink` or a `CallbackSink`) to record the timings of every
+    call: connection wait, serialization, time to first byte and token,
+    stream duration and parsing, along with token counts, cache hits and
+    retries. Without a sink no measurements are taken.
     """
 
+    use_connection_pool: bool = Field(
+        default=True,
+        description=(
+            "Share keep-alive HTTP connections with other ASI instances that use "
+            "the same api_base and credentials."
+        ),
+    )
+    http2: bool = Field(
+        default=False,
+        description="Negotiate HTTP/2 on pooled connections. Requires `h2`.",
+    )
+    max_connections: int = Field(
+        default=DEFAULT_MAX_CONNECTIONS,
+        description="Maximum number of concurrent pooled connections.",
+        gt=0,
+    )
+    max_keepalive_connections: int = Field(
+        default=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        description="Maximum number of idle connections kept alive in the pool.",
+        ge=0,
+    )
+    keepalive_expiry: float = Field(
+        default=DEFAULT_KEEPALIVE_EXPIRY,
+        description="Seconds an idle pooled connection is kept before closing.",
+        ge=0,
+    )
+    endpoints: Optional[List[Union[str, Endpoint]]] = Field(
+        default=None,
+        exclude=True,
+        description=(
+            "Endpoints (URLs, or Endpoint objects with their own key and weight) "
+            "to balance requests across. api_base then only prefixes request URLs."
+        ),
+    )
+    load_balancing: Literal["round_robin", "least_outstanding"] = Field(
+        default="round_robin",
+        description="How requests are spread across endpoints.",
+    )
+    circuit_failure_threshold: int = Field(
+        default=DEFAULT_FAILURE_THRESHOLD,
+        description="Consecutive failures after which an endpoint is ejected.",
+        gt=0,
+    )
+    circuit_reset_timeout: float = Field(
+        default=DEFAULT_RESET_TIMEOUT,
+        description="Seconds an ejected endpoint waits before being probed again.",
+        gt=0,
+    )
+    requests_per_minute: Optional[float] = Field(
+        default=None,
+        description=(
+            "Client-side request quota shared by all ASI instances using the same "
+            "api_base and key. None disables request rate limiting."
+        ),
+        gt=0,
+    )
+    tokens_per_minute: Optional[float] = Field(
+        default=None,
+        description=(
+            "Client-side token quota shared by all ASI instances using the same "
+            "api_base and key. None disables token rate limiting."
+        ),
+        gt=0,
+    )
+    hedge_requests: bool = Field(
+        default=False,
+        description=(
+            "Send a duplicate chat request when the first one is slower than the "
+            "hedge_percentile of recent latencies, keeping the faster one."
+        ),
+    )
+    hedge_percentile: float = Field(
+        default=DEFAULT_HEDGE_PERCENTILE,
+        description="Latency percentile after which a hedge is sent.",
+        gt=0,
+        lt=1,
+    )
+    hedge_budget: float = Field(
+        default=DEFAULT_HEDGE_BUDGET,
+        description="Maximum ratio of hedged to total requests (at most 1.0).",
+        ge=0,
+        le=1,
+    )
+    hedge_initial_delay: float = Field(
+        default=DEFAULT_HEDGE_INITIAL_DELAY,
+        description="Hedge deadline in seconds until enough latencies are known.",
+        gt=0,
+    )
+    coalesce_requests: bool = Field(
+        default=False,
+        description=(
+            "Share one in-flight request between concurrent identical chat and "
+            "completion calls, including streams."
+        ),
+    )
+    adaptive_concurrency: bool = Field(
+        default=False,
+        description=(
+            "Limit in-flight async calls with a limit adapted to observed "
+            "latency and overload errors."
+        ),
+    )
+    concurrency_algorithm: Literal["gradient", "aimd"] = Field(
+        default="gradient",
+        description="How the adaptive concurrency limit is tuned.",
+    )
+    initial_concurrency: int = Field(
+        default=DEFAULT_INITIAL_LIMIT,
+        description="Starting adaptive concurrency limit.",
+        ge=1,
+    )
+    max_in_flight: int = Field(
+        default=DEFAULT_MAX_LIMIT,
+        description="Upper bound of the adaptive concurrency limit.",
+        ge=1,
+    )
+    max_queue_wait: Optional[float] = Field(
+        default=None,
+        description=(
+            "Seconds an async call may wait for a concurrency slot before it "
+            "is shed with a LoadShedError."
+        ),
+        gt=0,
+    )
+    trim_to_context_window: bool = Field(
+        default=False,
+        description=(
+            "Drop the oldest chat messages (keeping system messages) so requests "
+            "fit the context window instead of being rejected by the server."
+        ),
+    )
+    cache: Optional[BaseCache] = Field(
+        default=None,
+        exclude=True,
+        description="Optional response cache applied to chat and completion calls.",
+    )
+    semantic_cache: Optional[SemanticCache] = Field(
+        default=None,
+        exclude=True,
+        description=(
+            "Optional cache answering paraphrased prompts, consulted after `cache`."
+        ),
+    )
+    semantic_cache_namespace: str = Field(
+        default=DEFAULT_NAMESPACE,
+        description="Namespace of this instance's entries in `semantic_cache`.",
+    )
+    prefetch_follow_ups: Optional[List[str]] = Field(
+        default=None,
+        description=(
+            "Follow-up user prompts (e.g. 'Summarize that.') answered in the "
+            "background after every chat, highest priority first."
+        ),
+    )
+    prefetch_ttl: float = Field(
+        default=DEFAULT_PREFETCH_TTL,
+        description="Seconds a prefetched follow-up answer stays valid.",
+        gt=0,
+    )
+    record_path: Optional[str] = Field(
+        default=None,
+        description=(
+            "File every HTTP exchange is appended to, with its chunk timings, "
+            "for later replay."
+        ),
+    )
+    replay_path: Optional[str] = Field(
+        default=None,
+        description="Recording answering requests instead of the network.",
+    )
+    replay_speed: float = Field(
+        default=1.0,
+        description=(
+            "Replay speed relative to the recorded timings; 0 replays without "
+            "delays."
+        ),
+        ge=0,
+    )
+    replay_mode: Literal["exact", "any"] = Field(
+        default="exact",
+        description=(
+            "'exact' answers only recorded requests; 'any' answers other "
+            "requests with all recordings in turn."
+        ),
+    )
+    compact_requests: bool = Field(
+        default=False,
+        description=(
+            "Encode chat requests once with a fast JSON encoder, reusing the "
+            "encoding of messages repeated across calls."
+        ),
+    )
+    gzip_requests: bool = Field(
+        default=False,
+        description=(
+            "Gzip chat request bodies of at least `gzip_min_size` bytes; the "
+            "endpoint must accept `Content-Encoding: gzip`."
+        ),
+    )
+    gzip_min_size: int = Field(
+        default=DEFAULT_GZIP_MIN_SIZE,
+        description="Smallest request body, in bytes, sent gzipped.",
+        ge=0,
+    )
+    tool_concurrency: Optional[int] = Field(
+        default=None,
+        description=(
+            "Maximum tool calls of one turn run at a time by `predict_and_call`; "
+            "None runs them all at once."
+        ),
+        gt=0,
+    )
+    scheduler: Optional[FairScheduler] = Field(
+        default=None,
+        exclude=True,
+        description=(
+            "Weighted fair scheduler ordering requests across tenants and "
+            "priority classes (see `tenant_context`)."
+        ),
+    )
+    stop_condition: Optional[StopCondition] = Field(
+        default=None,
+        exclude=True,
+        description=(
+            "Client-side stop condition applied to every stream; a "
+            "`stop_condition` argument overrides it per call."
+        ),
+    )
+    telemetry: Optional[TelemetrySink] = Field(
+        default=None,
+        exclude=True,
+        description="Sink receiving per-call timings, token counts and events.",
+    )
+
+    _aclient_loop: Optional[asyncio.AbstractEventLoop] = PrivateAttr(default=None)
+    _pid: int = PrivateAttr(default_factory=os.getpid)
+    _hedger: Optional[Hedger] = PrivateAttr(default=None)
+    _single_flight: Optional[SingleFlight] = PrivateAttr(default=None)
+    _token_counter: Optional[TokenCounter] = PrivateAttr(default=None)
+    _load_balancer: Optional[LoadBalancer] = PrivateAttr(default=None)
+    _prefetcher: Optional[Prefetcher] = PrivateAttr(default=None)
+    _recorder: Optional[Recorder] = PrivateAttr(default=None)
+    _concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = PrivateAttr(
+        default=None
+    )
+    _recording: Optional[Recording] = PrivateAttr(default=None)
+    _request_encoder: Optional[RequestEncoder] = PrivateAttr(default=None)
+    _rate_limiters: Dict[Tuple[str, str], AdaptiveRateLimiter] = PrivateAttr(
+        default_factory=dict
+    )
+
     def __init__(
         self,
         model: str = DEFAULT_MODEL,
         api_key: Optional[str] = None,
         api_base: str = "https://api.asi1.ai/v1",
         is_chat_model: bool = True,
-        is_function_calling_model: bool = False,
+        is_function_calling_model: Optional[bool] = None,
         **kwargs: Any,
     ) -> None:
         """
@@ -50,11 +573,30 @@ class ASI(OpenAILike):
             api_base (str): The base URL for the ASI API. Defaults to
                 "https://api.asi1.ai/v1".
             is_chat_model (bool): Whether the model supports chat. Defaults to True.
-            is_function_calling_model (bool): Whether the model supports function
-                calling. Defaults to False.
+            is_function_calling_model (Optional[bool]): Whether the model supports
+                function calling. Defaults to the model registry, or False for
+                unknown models.
             **kwargs (Any): Additional arguments to pass to the OpenAILike constructor.
         """
+        info = get_model_info(model)
+        if info is not None:
+            kwargs.setdefault("context_window", info.context_window)
+        if is_function_calling_model is None:
+            is_function_calling_model = (
+                info is not None and info.is_function_calling_model
+            )
+
         api_key = api_key or os.environ.get("ASI_API_KEY", None)
+        if api_key is None:
+            # Every endpoint may bring its own key.
+            api_key = next(
+                (
+                    e.api_key
+                    for e in kwargs.get("endpoints") or ()
+                    if isinstance(e, Endpoint) and e.api_key
+                ),
+                None,
+            )
         if api_key is None:
             raise ValueError(
                 "ASI API key is required. Set it using the api_key parameter "
@@ -74,3 +616,1366 @@ class ASI(OpenAILike):
     def class_name(cls) -> str:
         """Get class name."""
         return "ASI"
+
+    @property
+    def model_info(self) -> ModelInfo:
+        """Registry metadata of the model, with `context_window` as configured."""
+        info = get_model_info(self.model) or ModelInfo()
+        return ModelInfo(
+            context_window=self.context_window,
+            num_output=info.num_output,
+            is_function_calling_model=self.is_function_calling_model,
+        )
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        """LLM metadata, reserving the model's default reply size if unset."""
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.max_tokens or self.model_info.num_output,
+            is_chat_model=self.is_chat_model,
+            is_function_calling_model=self.is_function_calling_model,
+            model_name=self.model,
+        )
+
+    # -- Tool calling --
+
+    def predict_and_call(
+        self,
+        tools: Sequence["BaseTool"],
+        user_msg: Optional[Union[str, ChatMessage]] = None,
+        chat_history: Optional[List[ChatMessage]] = None,
+        verbose: bool = False,
+        allow_parallel_tool_calls: bool = False,
+        error_on_no_tool_call: bool = True,
+        error_on_tool_error: bool = False,
+        **kwargs: Any,
+    ) -> "AgentChatResponse":
+        """
+        Ask the model for tool calls and run them concurrently.
+
+        Sync tools run on a thread pool and async tools on an event loop, at
+        most `tool_concurrency` at a time, so a turn with several independent
+        calls takes about as long as its slowest call.
+        """
+        if not self.metadata.is_function_calling_model:
+            return super().predict_and_call(
+                tools,
+                user_msg=user_msg,
+                chat_history=chat_history,
+                verbose=verbose,
+                **kwargs,
+            )
+        response = self.chat_with_tools(
+            tools,
+            user_msg=user_msg,
+            chat_history=chat_history,
+            verbose=verbose,
+            allow_parallel_tool_calls=allow_parallel_tool_calls,
+            **kwargs,
+        )
+        tool_calls = self.get_tool_calls_from_response(
+            response, error_on_no_tool_call=error_on_no_tool_call
+        )
+        outputs = call_tools(tool_calls, tools, self.tool_concurrency, verbose)
+        return _agent_response(
+            response, outputs, allow_parallel_tool_calls, error_on_tool_error
+        )
+
+    async def apredict_and_call(
+        self,
+        tools: Sequence["BaseTool"],
+        user_msg: Optional[Union[str, ChatMessage]] = None,
+        chat_history: Optional[List[ChatMessage]] = None,
+        verbose: bool = False,
+        allow_parallel_tool_calls: bool = False,
+        error_on_no_tool_call: bool = True,
+        error_on_tool_error: bool = False,
+        **kwargs: Any,
+    ) -> "AgentChatResponse":
+        """Async version of `predict_and_call`."""
+        if not self.metadata.is_function_calling_model:
+            return await super().apredict_and_call(
+                tools,
+                user_msg=user_msg,
+                chat_history=chat_history,
+                verbose=verbose,
+                **kwargs,
+            )
+        response = await self.achat_with_tools(
+            tools,
+            user_msg=user_msg,
+            chat_history=chat_history,
+            verbose=verbose,
+            allow_parallel_tool_calls=allow_parallel_tool_calls,
+            **kwargs,
+        )
+        tool_calls = self.get_tool_calls_from_response(
+            response, error_on_no_tool_call=error_on_no_tool_call
+        )
+        outputs = await acall_tools(tool_calls, tools, self.tool_concurrency, verbose)
+        return _agent_response(
+            response, outputs, allow_parallel_tool_calls, error_on_tool_error
+        )
+
+    # -- Token budgeting --
+
+    @property
+    def token_counter(self) -> TokenCounter:
+        """Local memoizing token counter, using `tokenizer` if one is set."""
+        if self.tokenizer is None:
+            return get_token_counter()
+        if self._token_counter is None:
+            self._token_counter = TokenCounter(self._tokenizer)
+        return self._token_counter
+
+    @property
+    def prompt_budget(self) -> int:
+        """Prompt tokens available once the reply is reserved."""
+        metadata = self.metadata
+        return metadata.context_window - metadata.num_output
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens of `text` locally."""
+        return self.token_counter.count(text)
+
+    def count_message_tokens(self, messages: Sequence[ChatMessage]) -> int:
+        """Count the prompt tokens of a chat request with `messages` locally."""
+        return self.token_counter.count_messages(messages)
+
+    def fit_messages(
+        self, messages: Sequence[ChatMessage], budget: Optional[int] = None
+    ) -> List[ChatMessage]:
+        """
+        Trim a chat history to fit the prompt budget.
+
+        See `llama_index_llms_asi.tokens.fit_messages` for the policy.
+
+        Args:
+            messages (Sequence[ChatMessage]): The chat history, oldest first.
+            budget (Optional[int]): Maximum prompt tokens. Defaults to
+                `prompt_budget`.
+
+        Returns:
+            List[ChatMessage]: The kept messages, in their original order.
+        """
+        if budget is None:
+            budget = self.prompt_budget
+        return fit_messages(messages, budget, self.token_counter)
+
+    def pack_nodes(
+        self,
+        nodes: Sequence[N],
+        messages: Sequence[ChatMessage] = (),
+        budget: Optional[int] = None,
+    ) -> List[N]:
+        """
+        Select the retrieved nodes that fit next to `messages`.
+
+        Args:
+            nodes (Sequence[N]): Nodes or strings, most relevant first.
+            messages (Sequence[ChatMessage]): Messages sent along with the
+                nodes, whose tokens are subtracted from the budget.
+            budget (Optional[int]): Maximum prompt tokens. Defaults to
+                `prompt_budget`.
+
+        Returns:
+            List[N]: The selected nodes, in their original order.
+        """
+        if budget is None:
+            budget = self.prompt_budget
+        budget -= self.count_message_tokens(messages)
+        return pack_nodes(nodes, budget, self.token_counter)
+
+    def _fit_context(self, messages: Sequence[ChatMessage]) -> Sequence[ChatMessage]:
+        if not self.trim_to_context_window:
+            return messages
+        return self.fit_messages(messages)
+
+    # -- Batch APIs --
+
+    async def abatch_complete(
+        self,
+        prompts: Iterable[str],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        **kwargs: Any,
+    ) -> List[BatchResult[CompletionResponse]]:
+        """
+        Complete many prompts concurrently.
+
+        Args:
+            prompts (Iterable[str]): The prompts to complete.
+            max_concurrency (int): Maximum number of requests in flight.
+            **kwargs (Any): Additional arguments passed to `acomplete`.
+
+        Returns:
+            List[BatchResult[CompletionResponse]]: One result per prompt, in
+                input order. Failed requests carry their exception in `error`.
+        """
+        fn = functools.partial(self.acomplete, **kwargs)
+        return await arun_batch(fn, prompts, max_concurrency)
+
+    async def abatch_chat(
+        self,
+        message_lists: Iterable[Sequence[ChatMessage]],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        **kwargs: Any,
+    ) -> List[BatchResult[ChatResponse]]:
+        """
+        Run many chats concurrently.
+
+        Args:
+            message_lists (Iterable[Sequence[ChatMessage]]): One message list
+                per chat.
+            max_concurrency (int): Maximum number of requests in flight.
+            **kwargs (Any): Additional arguments passed to `achat`.
+
+        Returns:
+            List[BatchResult[ChatResponse]]: One result per chat, in input
+                order. Failed requests carry their exception in `error`.
+        """
+        fn = functools.partial(self.achat, **kwargs)
+        return await arun_batch(fn, message_lists, max_concurrency)
+
+    def batch_complete(
+        self,
+        prompts: Iterable[str],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        **kwargs: Any,
+    ) -> List[BatchResult[CompletionResponse]]:
+        """Synchronous version of `abatch_complete`."""
+        return asyncio_run(self.abatch_complete(prompts, max_concurrency, **kwargs))
+
+    def batch_chat(
+        self,
+        message_lists: Iterable[Sequence[ChatMessage]],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        **kwargs: Any,
+    ) -> List[BatchResult[ChatResponse]]:
+        """Synchronous version of `abatch_chat`."""
+        return asyncio_run(self.abatch_chat(message_lists, max_concurrency, **kwargs))
+
+    def aiter_batch_complete(
+        self,
+        prompts: Iterable[str],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        **kwargs: Any,
+    ) -> AsyncGenerator[BatchResult[CompletionResponse], None]:
+        """Like `abatch_complete`, but yield results as they finish."""
+        fn = functools.partial(self.acomplete, **kwargs)
+        return aiter_batch(fn, prompts, max_concurrency)
+
+    def aiter_batch_chat(
+        self,
+        message_lists: Iterable[Sequence[ChatMessage]],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        **kwargs: Any,
+    ) -> AsyncGenerator[BatchResult[ChatResponse], None]:
+        """Like `abatch_chat`, but yield results as they finish."""
+        fn = functools.partial(self.achat, **kwargs)
+        return aiter_batch(fn, message_lists, max_concurrency)
+
+    # -- Lean streaming --
+
+    def stream_chat_sse(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> Generator[bytes, None, None]:
+        """
+        Stream a chat as the raw SSE bytes sent by the server.
+
+        The bytes are yielded unchanged, so they can be forwarded as is to
+        another HTTP response. Closing the generator closes the connection.
+
+        Messages are trimmed to the context window when
+        `trim_to_context_window` is set, and requests are queued by the
+        `scheduler`. The other layers of `stream_chat` do not apply to this
+        path: response caching, request coalescing, hedging, the adaptive
+        concurrency limiter, `stop_condition`, telemetry and follow-up
+        prefetching.
+        """
+        messages = self._fit_context(messages)
+        scheduler = self.scheduler
+        if scheduler is None:
+            stream = self._sse_bytes(messages, kwargs)
+        else:
+            stream = scheduler.stream(
+                lambda: self._sse_bytes(messages, kwargs),
+                self._schedule_cost(messages, kwargs),
+            )
+        gate = self._foreground_gate(is_async=False)
+        return stream if gate is None else gate.stream(stream)
+
+    def _sse_bytes(
+        self, messages: Sequence[ChatMessage], kwargs: Dict[str, Any]
+    ) -> Generator[bytes, None, None]:
+        client = self._get_client()
+        message_dicts = to_openai_message_dicts(messages, model=self.model)
+        with client.chat.completions.with_streaming_response.create(
+            messages=message_dicts, **self._get_model_kwargs(stream=True, **kwargs)
+        ) as response:
+            yield from response.iter_bytes()
+
+    async def astream_chat_sse(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> AsyncGenerator[bytes, None]:
+        """Async version of `stream_chat_sse`."""
+        messages = self._fit_context(messages)
+        scheduler = self.scheduler
+        if scheduler is None:
+            stream = self._asse_bytes(messages, kwargs)
+        else:
+
+            async def open_stream() -> AsyncGenerator[bytes, None]:
+                return self._asse_bytes(messages, kwargs)
+
+            cost = self._schedule_cost(messages, kwargs)
+            stream = await scheduler.astream(open_stream, cost)
+        gate = self._foreground_gate(is_async=True)
+        if gate is not None:
+            stream = gate.astream(stream)
+        async for chunk in stream:
+            yield chunk
+
+    async def _asse_bytes(
+        self, messages: Sequence[ChatMessage], kwargs: Dict[str, Any]
+    ) -> AsyncGenerator[bytes, None]:
+        aclient = self._get_aclient()
+        message_dicts = to_openai_message_dicts(messages, model=self.model)
+        async with aclient.chat.completions.with_streaming_response.create(
+            messages=message_dicts, **self._get_model_kwargs(stream=True, **kwargs)
+        ) as response:
+            async for chunk in response.iter_bytes():
+                yield chunk
+
+    def stream_chat_deltas(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> DeltaStream:
+        """
+        Stream a chat as plain text deltas.
+
+        This skips building a `ChatResponse` with the accumulated text for
+        every chunk. The full text is available as `DeltaStream.text` and is
+        only joined when read. Requests are sent by `stream_chat_sse`, so
+        the same layers are skipped: caching, coalescing, hedging, the
+        adaptive concurrency limiter, `stop_condition`, telemetry and
+        prefetching.
+
+        Args:
+            messages (Sequence[ChatMessage]): The chat messages.
+            **kwargs (Any): Additional request parameters.
+
+        Returns:
+            DeltaStream: An iterator of `str` deltas.
+        """
+        return DeltaStream(self.stream_chat_sse(messages, **kwargs))
+
+    def astream_chat_deltas(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> AsyncDeltaStream:
+        """Async version of `stream_chat_deltas`."""
+        return AsyncDeltaStream(self.astream_chat_sse(messages, **kwargs))
+
+    def stream_structured(
+        self,
+        prompt: Union[str, Sequence[ChatMessage]],
+        schema: Optional[Any] = None,
+        json_lines: bool = False,
+        **kwargs: Any,
+    ) -> StructuredStream:
+        """
+        Stream a JSON (or JSON Lines) reply, yielding values as they complete.
+
+        Fields of a top-level object and elements of a top-level array are
+        yielded as soon as they close, followed by the whole document. With a
+        `schema` they are validated on the fly: the stream is closed and a
+        `StructuredOutputError` raised on the first invalid value. In JSON
+        mode the stream is also closed once the document ends.
+
+        Args:
+            prompt (Union[str, Sequence[ChatMessage]]): A prompt or chat messages.
+            schema (Optional[Any]): A Pydantic model (or any type) records are
+                validated against.
+            json_lines (bool): Expect one JSON document per line.
+            **kwargs (Any): Additional request parameters.
+
+        Returns:
+            StructuredStream: An iterator of `StructuredItem`s.
+        """
+        messages = self._as_messages(prompt)
+        deltas = self.stream_chat_deltas(messages, **kwargs)
+        return StructuredStream(deltas, schema, json_lines)
+
+    def astream_structured(
+        self,
+        prompt: Union[str, Sequence[ChatMessage]],
+        schema: Optional[Any] = None,
+        json_lines: bool = False,
+        **kwargs: Any,
+    ) -> AsyncStructuredStream:
+        """Async version of `stream_structured`."""
+        messages = self._as_messages(prompt)
+        deltas = self.astream_chat_deltas(messages, **kwargs)
+        return AsyncStructuredStream(deltas, schema, json_lines)
+
+    @staticmethod
+    def _as_messages(
+        prompt: Union[str, Sequence[ChatMessage]],
+    ) -> Sequence[ChatMessage]:
+        if isinstance(prompt, str):
+            return [ChatMessage(role=MessageRole.USER, content=prompt)]
+        return prompt
+
+    # -- Processes --
+
+    def _check_pid(self) -> None:
+        """Drop the clients and per-process state inherited through fork."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._pid = pid
+        self._client = None
+        self._aclient = None
+        self._aclient_loop = None
+        self._hedger = None
+        self._single_flight = None
+        self._prefetcher = None
+        self._load_balancer = None
+        self._concurrency_limiter = None
+        self._request_encoder = None
+        self._rate_limiters = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Pickle the configuration only; clients are rebuilt lazily by the
+        # process that unpickles it. Options holding per-process state are
+        # left at their defaults; anything else must pickle.
+        config = {}
+        dropped = []
+        for name in type(self).model_fields:
+            value = getattr(self, name)
+            if name in _PROCESS_LOCAL_OPTIONS:
+                if value is not None:
+                    dropped.append(name)
+                continue
+            config[name] = value
+        if dropped:
+            logger.warning(
+                "Not pickling ASI options %s: they hold per-process state and "
+                "are left unset in the unpickled copy.",
+                ", ".join(dropped),
+            )
+        return {"config": config}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state["config"])  # type: ignore[misc]
+
+    # -- HTTP clients --
+
+    @property
+    def adaptive_rate_limiter(self) -> Optional[AdaptiveRateLimiter]:
+        """The process-wide adaptive limiter of this endpoint and key, if enabled."""
+        return self._rate_limiter(self.api_base, self.api_key)
+
+    @property
+    def load_balancer(self) -> Optional[LoadBalancer]:
+        """The balancer routing requests across `endpoints`, if any are set."""
+        if not self.endpoints:
+            return None
+        self._check_pid()
+        if self._load_balancer is None:
+            self._load_balancer = LoadBalancer(
+                self.endpoints,
+                strategy=self.load_balancing,
+                failure_threshold=self.circuit_failure_threshold,
+                reset_timeout=self.circuit_reset_timeout,
+            )
+        return self._load_balancer
+
+    def _rate_limiter(
+        self, api_base: str, api_key: Optional[str]
+    ) -> Optional[AdaptiveRateLimiter]:
+        if self.requests_per_minute is None and self.tokens_per_minute is None:
+            return None
+        self._check_pid()
+        # Resolved once per endpoint, so the shared limiter is not
+        # re-negotiated on every client build.
+        key = self._pool_key(api_base, api_key)[:2]
+        limiter = self._rate_limiters.get(key)
+        if limiter is None:
+            limiter = get_rate_limiter(
+                key, self.requests_per_minute, self.tokens_per_minute
+            )
+            self._rate_limiters[key] = limiter
+        return limiter
+
+    def _pool_key(
+        self, api_base: Optional[str] = None, api_key: Optional[str] = None
+    ) -> PoolKey:
+        return make_pool_key(
+            api_base or self.api_base,
+            api_key or self.api_key,
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+            http2=self.http2,
+        )
+
+    def _manages_http_client(self, is_async: bool) -> bool:
+        """Whether ASI builds the httpx client itself rather than using the user's."""
+        own_client = self._async_http_client if is_async else self._http_client
+        if own_client is not None:
+            return False
+        return (
+            self.use_connection_pool
+            or self.adaptive_rate_limiter is not None
+            or self.telemetry is not None
+            or bool(self.endpoints)
+            or bool(self.prefetch_follow_ups)
+            or bool(self.record_path)
+            or bool(self.replay_path)
+        )
+
+    def _base_transport(
+        self,
+        is_async: bool,
+        api_base: Optional[str] = None,
+        api_key: Optional[str] = None,
+    ) -> Any:
+        if self.use_connection_pool:
+            pool = get_connection_pool()
+            key = self._pool_key(api_base, api_key)
+            if is_async:
+                return pool.get_async_transport(key)
+            return pool.get_transport(key)
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        if is_async:
+            return httpx.AsyncHTTPTransport(limits=limits, http2=self.http2)
+        return httpx.HTTPTransport(limits=limits, http2=self.http2)
+
+    def _endpoint_transport(
+        self,
+        is_async: bool,
+        api_base: Optional[str] = None,
+        api_key: Optional[str] = None,
+    ) -> Any:
+        """The transport to one endpoint: its connections behind its limiter."""
+        recording = self.recording
+        if recording is not None:
+            if is_async:
+                transport = AsyncReplayTransport(
+                    recording, self.replay_speed, self.replay_mode
+                )
+            else:
+                transport = ReplayTransport(
+                    recording, self.replay_speed, self.replay_mode
+                )
+        else:
+            transport = self._base_transport(is_async, api_base, api_key)
+        recorder = self.recorder
+        if recorder is not None:
+            if is_async:
+                transport = AsyncRecordingTransport(transport, recorder)
+            else:
+                transport = RecordingTransport(transport, recorder)
+        limiter = self._rate_limiter(api_base or self.api_base, api_key or self.api_key)
+        if limiter is not None:
+            if is_async:
+                transport = AsyncRateLimitedTransport(transport, limiter)
+            else:
+                transport = RateLimitedTransport(transport, limiter)
+        return transport
+
+    def _wrap_transport(self, transport: Any, is_async: bool) -> Any:
+        """Layer middleware applying to every endpoint on top of the transport."""
+        prefetcher = self.prefetcher
+        if prefetcher is not None:
+            if is_async:
+                transport = AsyncPriorityTransport(transport, prefetcher.gate)
+            else:
+                transport = PriorityTransport(transport, prefetcher.gate)
+        if self.telemetry is not None:
+            if is_async:
+                transport = AsyncTracingTransport(transport)
+            else:
+                transport = TracingTransport(transport)
+        return transport
+
+    def _build_http_client(self, is_async: bool) -> Any:
+        balancer = self.load_balancer
+        if balancer is None:
+            transport = self._endpoint_transport(is_async)
+        else:
+            transports = {
+                endpoint.name: self._endpoint_transport(
+                    is_async, endpoint.api_base, endpoint.api_key
+                )
+                for endpoint in balancer.endpoints
+            }
+            if is_async:
+                transport = AsyncBalancedTransport(balancer, transports, self.api_base)
+            else:
+                transport = BalancedTransport(balancer, transports, self.api_base)
+        transport = self._wrap_transport(transport, is_async)
+        if is_async:
+            return httpx.AsyncClient(
+                transport=transport, timeout=self.timeout, follow_redirects=True
+            )
+        return httpx.Client(
+            transport=transport, timeout=self.timeout, follow_redirects=True
+        )
+
+    def _get_credential_kwargs(self, is_async: bool = False) -> Dict[str, Any]:
+        credential_kwargs = super()._get_credential_kwargs(is_async=is_async)
+        if self._manages_http_client(is_async):
+            credential_kwargs["http_client"] = self._build_http_client(is_async)
+        return credential_kwargs
+
+    def _new_client(self) -> SyncOpenAI:
+        return ASIOpenAI(
+            encoder=self.request_encoder, **self._get_credential_kwargs()
+        )
+
+    def _new_aclient(self) -> AsyncOpenAI:
+        return AsyncASIOpenAI(
+            encoder=self.request_encoder,
+            **self._get_credential_kwargs(is_async=True),
+        )
+
+    def _get_client(self) -> SyncOpenAI:
+        self._check_pid()
+        if not self.reuse_client:
+            return self._new_client()
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    def _get_aclient(self) -> AsyncOpenAI:
+        self._check_pid()
+        if not self.reuse_client:
+            return self._new_aclient()
+        if not self._manages_http_client(is_async=True):
+            if self._aclient is None:
+                self._aclient = self._new_aclient()
+            return self._aclient
+
+        # Async connections are bound to the loop that opened them.
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient = self._new_aclient()
+            self._aclient_loop = loop
+        return self._aclient
+
+    # -- Wire encoding --
+
+    @property
+    def request_encoder(self) -> Optional[RequestEncoder]:
+        """The encoder of chat request bodies, if a compact path is enabled."""
+        if not (self.compact_requests or self.gzip_requests):
+            return None
+        self._check_pid()
+        if self._request_encoder is None:
+            self._request_encoder = RequestEncoder(
+                gzip_min_size=self.gzip_min_size if self.gzip_requests else None
+            )
+        return self._request_encoder
+
+    # -- Hedging --
+
+    @property
+    def hedger(self) -> Optional[Hedger]:
+        """The hedger of this instance, if hedging is enabled."""
+        if not self.hedge_requests:
+            return None
+        self._check_pid()
+        if self._hedger is None:
+            self._hedger = Hedger(
+                percentile=self.hedge_percentile,
+                budget=self.hedge_budget,
+                initial_delay=self.hedge_initial_delay,
+            )
+        return self._hedger
+
+    def _send_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        send = super()._chat
+        hedger = self.hedger
+        scheduler = self.scheduler
+
+        def call() -> ChatResponse:
+            if hedger is None:
+                return send(messages, **kwargs)
+            return hedger.call(lambda: send(messages, **kwargs))
+
+        def scheduled() -> ChatResponse:
+            if scheduler is None:
+                return call()
+            return scheduler.call(call, self._schedule_cost(messages, kwargs))
+
+        gate = self._foreground_gate(is_async=False)
+        if gate is None:
+            return scheduled()
+        with gate.hold():
+            return scheduled()
+
+    async def _asend_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        send = super()._achat
+        hedger = self.hedger
+        limiter = self.concurrency_limiter
+        scheduler = self.scheduler
+
+        async def call() -> ChatResponse:
+            if hedger is None:
+                return await send(messages, **kwargs)
+            return await hedger.acall(lambda: send(messages, **kwargs))
+
+        async def limited() -> ChatResponse:
+            if limiter is None:
+                return await call()
+            return await limiter.call(call)
+
+        async def scheduled() -> ChatResponse:
+            if scheduler is None:
+                return await limited()
+            cost = self._schedule_cost(messages, kwargs)
+            return await scheduler.acall(limited, cost)
+
+        gate = self._foreground_gate(is_async=True)
+        if gate is None:
+            return await scheduled()
+        with gate.hold():
+            return await scheduled()
+
+    def _send_stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        send = super()._stream_chat
+        hedger = self.hedger
+        scheduler = self.scheduler
+
+        def open_stream() -> ChatResponseGen:
+            if hedger is None:
+                return send(messages, **kwargs)
+            return hedger.stream(lambda: send(messages, **kwargs))
+
+        if scheduler is None:
+            stream = open_stream()
+        else:
+            cost = self._schedule_cost(messages, kwargs)
+            stream = scheduler.stream(open_stream, cost)
+        gate = self._foreground_gate(is_async=False)
+        return stream if gate is None else gate.stream(stream)
+
+    async def _asend_stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        send = super()._astream_chat
+        hedger = self.hedger
+        limiter = self.concurrency_limiter
+        scheduler = self.scheduler
+
+        async def open_stream() -> ChatResponseAsyncGen:
+            if hedger is None:
+                return await send(messages, **kwargs)
+            return hedger.astream(lambda: send(messages, **kwargs))
+
+        async def limited() -> ChatResponseAsyncGen:
+            if limiter is None:
+                return await open_stream()
+            return await limiter.stream(open_stream)
+
+        if scheduler is None:
+            stream = await limited()
+        else:
+            cost = self._schedule_cost(messages, kwargs)
+            stream = await scheduler.astream(limited, cost)
+        gate = self._foreground_gate(is_async=True)
+        return stream if gate is None else gate.astream(stream)
+
+    # -- Adaptive concurrency --
+
+    @property
+    def concurrency_limiter(self) -> Optional[AdaptiveConcurrencyLimiter]:
+        """The adaptive limiter of async calls, if `adaptive_concurrency` is on."""
+        if not self.adaptive_concurrency:
+            return None
+        self._check_pid()
+        if self._concurrency_limiter is None:
+            self._concurrency_limiter = AdaptiveConcurrencyLimiter(
+                algorithm=self.concurrency_algorithm,
+                initial_limit=min(self.initial_concurrency, self.max_in_flight),
+                max_limit=self.max_in_flight,
+                max_queue_wait=self.max_queue_wait,
+            )
+        return self._concurrency_limiter
+
+    # -- Scheduling --
+
+    def _schedule_cost(
+        self, messages: Sequence[ChatMessage], kwargs: Dict[str, Any]
+    ) -> float:
+        """Estimated tokens of a request, charged to its tenant's fair share."""
+        max_tokens = kwargs.get("max_tokens") or self.max_tokens or 0
+        return self.count_message_tokens(messages) + max_tokens
+
+    # -- Request coalescing --
+
+    @property
+    def single_flight(self) -> Optional[SingleFlight]:
+        """The request coalescer of this instance, if coalescing is enabled."""
+        if not self.coalesce_requests:
+            return None
+        self._check_pid()
+        if self._single_flight is None:
+            self._single_flight = SingleFlight()
+        return self._single_flight
+
+    def _shared_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        flight = self.single_flight
+        if flight is None:
+            return self._send_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        return flight.call(key, lambda: self._send_chat(messages, **kwargs))
+
+    async def _ashared_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        flight = self.single_flight
+        if flight is None:
+            return await self._asend_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        return await flight.acall(key, lambda: self._asend_chat(messages, **kwargs))
+
+    def _shared_stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        flight = self.single_flight
+        if flight is None:
+            return self._send_stream_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        return flight.stream(key, lambda: self._send_stream_chat(messages, **kwargs))
+
+    async def _ashared_stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        flight = self.single_flight
+        if flight is None:
+            return await self._asend_stream_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        return flight.astream(key, lambda: self._asend_stream_chat(messages, **kwargs))
+
+    def _shared_complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        send = super()._complete
+        flight = self.single_flight
+        if flight is None:
+            return send(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        return flight.call(key, lambda: send(prompt, **kwargs))
+
+    async def _ashared_complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        send = super()._acomplete
+        flight = self.single_flight
+        if flight is None:
+            return await send(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        return await flight.acall(key, lambda: send(prompt, **kwargs))
+
+    def _shared_stream_complete(
+        self, prompt: str, **kwargs: Any
+    ) -> CompletionResponseGen:
+        send = super()._stream_complete
+        flight = self.single_flight
+        if flight is None:
+            return send(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        return flight.stream(key, lambda: send(prompt, **kwargs))
+
+    async def _ashared_stream_complete(
+        self, prompt: str, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        send = super()._astream_complete
+        flight = self.single_flight
+        if flight is None:
+            return await send(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        return flight.astream(key, lambda: send(prompt, **kwargs))
+
+    # -- Recording and replay --
+
+    @property
+    def recorder(self) -> Optional[Recorder]:
+        """The recorder appending exchanges to `record_path`, if set."""
+        if not self.record_path:
+            return None
+        if self._recorder is None:
+            self._recorder = Recorder(self.record_path)
+        return self._recorder
+
+    @property
+    def recording(self) -> Optional[Recording]:
+        """The recording loaded from `replay_path`, if set."""
+        if not self.replay_path:
+            return None
+        if self._recording is None:
+            self._recording = Recording(self.replay_path)
+        return self._recording
+
+    # -- Prefetching --
+
+    @property
+    def prefetcher(self) -> Optional[Prefetcher]:
+        """The follow-up prefetcher of this instance, if follow-ups are set."""
+        if not self.prefetch_follow_ups:
+            return None
+        self._check_pid()
+        if self._prefetcher is None:
+            self._prefetcher = Prefetcher(ttl=self.prefetch_ttl)
+        return self._prefetcher
+
+    def _foreground_gate(self, is_async: bool) -> Optional[PriorityGate]:
+        """
+        The gate to mark a foreground request on, if its transport does not.
+
+        Clients built by ASI mark requests in `PriorityTransport`; with a
+        user-supplied client requests are marked around the call instead.
+        """
+        prefetcher = self.prefetcher
+        if (
+            prefetcher is None
+            or self._manages_http_client(is_async)
+            or in_background()
+        ):
+            return None
+        return prefetcher.gate
+
+    def _prefetch_follow_ups(
+        self,
+        messages: Sequence[ChatMessage],
+        response: ChatResponse,
+        kwargs: Dict[str, Any],
+    ) -> None:
+        prefetcher = self.prefetcher
+        if prefetcher is None or not response.message.content:
+            return
+        history = [
+            *messages,
+            ChatMessage(role=MessageRole.ASSISTANT, content=response.message.content),
+        ]
+        # Prefetches are charged to the tenant that triggered them, as batch
+        # work, although they run on the prefetcher's threads.
+        tenant = current_tenant()
+        for priority, prompt in enumerate(self.prefetch_follow_ups or ()):
+            follow_up = [*history, ChatMessage(role=MessageRole.USER, content=prompt)]
+
+            def send(follow_up: List[ChatMessage] = follow_up) -> CacheEntry:
+                # Below the caches, so a foreground request for the same
+                # follow-up coalesces with this one when coalescing is on.
+                with tenant_context(tenant, priority=BATCH):
+                    response = self._shared_chat(follow_up, **kwargs)
+                return dump_chat_response(response)
+
+            key = self._chat_cache_key(follow_up, kwargs)
+            prefetcher.schedule(key, send, priority)
+
+    def _prefetch_after_stream(
+        self,
+        messages: Sequence[ChatMessage],
+        kwargs: Dict[str, Any],
+        stream: ChatResponseGen,
+    ) -> ChatResponseGen:
+        last = None
+        for last in stream:
+            yield last
+        if last is not None:
+            self._prefetch_follow_ups(messages, last, kwargs)
+
+    async def _aprefetch_after_stream(
+        self,
+        messages: Sequence[ChatMessage],
+        kwargs: Dict[str, Any],
+        stream: ChatResponseAsyncGen,
+    ) -> ChatResponseAsyncGen:
+        last = None
+        async for last in stream:
+            yield last
+        if last is not None:
+            self._prefetch_follow_ups(messages, last, kwargs)
+
+    # -- Response caching --
+
+    def _caches_responses(self) -> bool:
+        return (
+            self.cache is not None
+            or self.semantic_cache is not None
+            or self.prefetcher is not None
+        )
+
+    def _cache_key(self, payload: Any, kwargs: Dict[str, Any]) -> str:
+        return make_cache_key(self._get_model_kwargs(**kwargs), payload)
+
+    def _chat_cache_key(
+        self, messages: Sequence[ChatMessage], kwargs: Dict[str, Any]
+    ) -> str:
+        message_dicts = to_openai_message_dicts(messages, model=self.model)
+        return self._cache_key(message_dicts, kwargs)
+
+    def _semantic_scope(self, kwargs: Dict[str, Any]) -> str:
+        # Paraphrases only match prompts sent with the same parameters.
+        return self._cache_key(None, kwargs)
+
+    def _cache_lookup(
+        self, key: str, text: str, kwargs: Dict[str, Any]
+    ) -> Optional[CacheEntry]:
+        entry = self.cache.get(key) if self.cache is not None else None
+        if entry is None and self.prefetcher is not None:
+            entry = self.prefetcher.get(key)
+        if entry is None and self.semantic_cache is not None:
+            entry = self.semantic_cache.get(
+                text, self.semantic_cache_namespace, self._semantic_scope(kwargs)
+            )
+        record_cache_lookup(entry is not None)
+        return entry
+
+    async def _acache_lookup(
+        self, key: str, text: str, kwargs: Dict[str, Any]
+    ) -> Optional[CacheEntry]:
+        entry = self.cache.get(key) if self.cache is not None else None
+        if entry is None and self.prefetcher is not None:
+            entry = self.prefetcher.get(key)
+        if entry is None and self.semantic_cache is not None:
+            entry = await self.semantic_cache.aget(
+                text, self.semantic_cache_namespace, self._semantic_scope(kwargs)
+            )
+        record_cache_lookup(entry is not None)
+        return entry
+
+    def _cache_store(
+        self, key: str, text: str, kwargs: Dict[str, Any], entry: CacheEntry
+    ) -> None:
+        if self.cache is not None:
+            self.cache.set(key, entry)
+        if self.semantic_cache is not None:
+            self.semantic_cache.set(
+                text, entry, self.semantic_cache_namespace, self._semantic_scope(kwargs)
+            )
+
+    async def _acache_store(
+        self, key: str, text: str, kwargs: Dict[str, Any], entry: CacheEntry
+    ) -> None:
+        if self.cache is not None:
+            self.cache.set(key, entry)
+        if self.semantic_cache is not None:
+            await self.semantic_cache.aset(
+                text, entry, self.semantic_cache_namespace, self._semantic_scope(kwargs)
+            )
+
+    def _cache_stream(
+        self,
+        key: str,
+        text: str,
+        kwargs: Dict[str, Any],
+        stream: Generator[Any, None, None],
+        dump: Callable[[Any], CacheEntry],
+    ) -> Generator[Any, None, None]:
+        last = None
+        for last in stream:
+            yield last
+        # Only streams that ran to completion are cached.
+        if last is not None:
+            self._cache_store(key, text, kwargs, dump(last))
+
+    async def _acache_stream(
+        self,
+        key: str,
+        text: str,
+        kwargs: Dict[str, Any],
+        stream: AsyncGenerator[Any, None],
+        dump: Callable[[Any], CacheEntry],
+    ) -> AsyncGenerator[Any, None]:
+        last = None
+        async for last in stream:
+            yield last
+        if last is not None:
+            await self._acache_store(key, text, kwargs, dump(last))
+
+    @staticmethod
+    def _replay(response: Any) -> Generator[Any, None, None]:
+        yield response
+
+    @staticmethod
+    async def _areplay(response: Any) -> AsyncGenerator[Any, None]:
+        yield response
+
+    def _cached_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        if not self._caches_responses():
+            return self._shared_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        text = _chat_text(messages)
+        entry = self._cache_lookup(key, text, kwargs)
+        if entry is not None:
+            response = load_chat_response(entry)
+        else:
+            response = self._shared_chat(messages, **kwargs)
+            self._cache_store(key, text, kwargs, dump_chat_response(response))
+        self._prefetch_follow_ups(messages, response, kwargs)
+        return response
+
+    async def _cached_achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        if not self._caches_responses():
+            return await self._ashared_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        text = _chat_text(messages)
+        entry = await self._acache_lookup(key, text, kwargs)
+        if entry is not None:
+            response = load_chat_response(entry)
+        else:
+            response = await self._ashared_chat(messages, **kwargs)
+            await self._acache_store(key, text, kwargs, dump_chat_response(response))
+        self._prefetch_follow_ups(messages, response, kwargs)
+        return response
+
+    def _cached_stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        if not self._caches_responses():
+            return self._shared_stream_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        text = _chat_text(messages)
+        entry = self._cache_lookup(key, text, kwargs)
+        if entry is not None:
+            stream = self._replay(replay_chat_response(entry))
+        else:
+            stream = self._cache_stream(
+                key,
+                text,
+                kwargs,
+                self._shared_stream_chat(messages, **kwargs),
+                dump_chat_response,
+            )
+        if self.prefetcher is None:
+            return stream
+        return self._prefetch_after_stream(messages, kwargs, stream)
+
+    async def _cached_astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        if not self._caches_responses():
+            return await self._ashared_stream_chat(messages, **kwargs)
+        key = self._chat_cache_key(messages, kwargs)
+        text = _chat_text(messages)
+        entry = await self._acache_lookup(key, text, kwargs)
+        if entry is not None:
+            stream = self._areplay(replay_chat_response(entry))
+        else:
+            stream = self._acache_stream(
+                key,
+                text,
+                kwargs,
+                await self._ashared_stream_chat(messages, **kwargs),
+                dump_chat_response,
+            )
+        if self.prefetcher is None:
+            return stream
+        return self._aprefetch_after_stream(messages, kwargs, stream)
+
+    def _cached_complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        if not self._caches_responses():
+            return self._shared_complete(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        entry = self._cache_lookup(key, prompt, kwargs)
+        if entry is not None:
+            return load_completion_response(entry)
+        response = self._shared_complete(prompt, **kwargs)
+        self._cache_store(key, prompt, kwargs, dump_completion_response(response))
+        return response
+
+    async def _cached_acomplete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        if not self._caches_responses():
+            return await self._ashared_complete(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        entry = await self._acache_lookup(key, prompt, kwargs)
+        if entry is not None:
+            return load_completion_response(entry)
+        response = await self._ashared_complete(prompt, **kwargs)
+        await self._acache_store(
+            key, prompt, kwargs, dump_completion_response(response)
+        )
+        return response
+
+    def _cached_stream_complete(
+        self, prompt: str, **kwargs: Any
+    ) -> CompletionResponseGen:
+        if not self._caches_responses():
+            return self._shared_stream_complete(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        entry = self._cache_lookup(key, prompt, kwargs)
+        if entry is not None:
+            return self._replay(replay_completion_response(entry))
+        return self._cache_stream(
+            key,
+            prompt,
+            kwargs,
+            self._shared_stream_complete(prompt, **kwargs),
+            dump_completion_response,
+        )
+
+    async def _cached_astream_complete(
+        self, prompt: str, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        if not self._caches_responses():
+            return await self._ashared_stream_complete(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        entry = await self._acache_lookup(key, prompt, kwargs)
+        if entry is not None:
+            return self._areplay(replay_completion_response(entry))
+        return self._acache_stream(
+            key,
+            prompt,
+            kwargs,
+            await self._ashared_stream_complete(prompt, **kwargs),
+            dump_completion_response,
+        )
+
+    # -- Early stopping --
+
+    def _stop_stream(
+        self, stream: Any, condition: Optional[StopCondition], chat: bool
+    ) -> Any:
+        if condition is None:
+            return stream
+        return stop_stream(stream, condition, self.token_counter, chat=chat)
+
+    def _astop_stream(
+        self, stream: Any, condition: Optional[StopCondition], chat: bool
+    ) -> Any:
+        if condition is None:
+            return stream
+        return astop_stream(stream, condition, self.token_counter, chat=chat)
+
+    # -- Telemetry --
+
+    def _call_metrics(self, operation: str) -> CallMetrics:
+        return CallMetrics(operation, self.model)
+
+    def _chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        messages = self._fit_context(messages)
+        if self.telemetry is None:
+            return self._cached_chat(messages, **kwargs)
+        return record_call(
+            self.telemetry,
+            self._call_metrics("chat"),
+            self._cached_chat,
+            messages,
+            **kwargs,
+        )
+
+    async def _achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        messages = self._fit_context(messages)
+        if self.telemetry is None:
+            return await self._cached_achat(messages, **kwargs)
+        return await arecord_call(
+            self.telemetry,
+            self._call_metrics("achat"),
+            self._cached_achat,
+            messages,
+            **kwargs,
+        )
+
+    def _stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        condition = kwargs.pop("stop_condition", self.stop_condition)
+        messages = self._fit_context(messages)
+        if self.telemetry is None:
+            stream = self._cached_stream_chat(messages, **kwargs)
+        else:
+            stream = record_stream(
+                self.telemetry,
+                self._call_metrics("stream_chat"),
+                self._cached_stream_chat,
+                messages,
+                **kwargs,
+            )
+        return self._stop_stream(stream, condition, chat=True)
+
+    async def _astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        condition = kwargs.pop("stop_condition", self.stop_condition)
+        messages = self._fit_context(messages)
+        if self.telemetry is None:
+            stream = await self._cached_astream_chat(messages, **kwargs)
+        else:
+            stream = await arecord_stream(
+                self.telemetry,
+                self._call_metrics("astream_chat"),
+                self._cached_astream_chat,
+                messages,
+                **kwargs,
+            )
+        return self._astop_stream(stream, condition, chat=True)
+
+    def _complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        if self.telemetry is None:
+            return self._cached_complete(prompt, **kwargs)
+        return record_call(
+            self.telemetry,
+            self._call_metrics("complete"),
+            self._cached_complete,
+            prompt,
+            **kwargs,
+        )
+
+    async def _acomplete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        if self.telemetry is None:
+            return await self._cached_acomplete(prompt, **kwargs)
+        return await arecord_call(
+            self.telemetry,
+            self._call_metrics("acomplete"),
+            self._cached_acomplete,
+            prompt,
+            **kwargs,
+        )
+
+    def _stream_complete(self, prompt: str, **kwargs: Any) -> CompletionResponseGen:
+        condition = kwargs.pop("stop_condition", self.stop_condition)
+        if self.telemetry is None:
+            stream = self._cached_stream_complete(prompt, **kwargs)
+        else:
+            stream = record_stream(
+                self.telemetry,
+                self._call_metrics("stream_complete"),
+                self._cached_stream_complete,
+                prompt,
+                **kwargs,
+            )
+        return self._stop_stream(stream, condition, chat=False)
+
+    async def _astream_complete(
+        self, prompt: str, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        condition = kwargs.pop("stop_condition", self.stop_condition)
+        if self.telemetry is None:
+            stream = await self._cached_astream_complete(prompt, **kwargs)
+        else:
+            stream = await arecord_stream(
+                self.telemetry,
+                self._call_metrics("astream_complete"),
+                self._cached_astream_complete,
+                prompt,
+                **kwargs,
+            )
+        return self._astop_stream(stream, condition, chat=False)
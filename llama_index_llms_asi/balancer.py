@@ -0,0 +1,446 @@
+"""Load balancing and failover of ASI requests across several endpoints."""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+import httpx
+
+from llama_index_llms_asi.hedging import LatencyHistogram
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+STRATEGIES = (ROUND_ROBIN, LEAST_OUTSTANDING)
+
+# Smoothing factor of the per-endpoint latency moving average.
+_EWMA_ALPHA = 0.2
+
+
+class Endpoint:
+    """
+    One ASI gateway, or one API key of a gateway.
+
+    Args:
+        api_base (str): Base URL of the endpoint.
+        api_key (Optional[str]): Key used for this endpoint. Defaults to the
+            `api_key` of the ASI instance.
+        weight (float): Relative share of traffic.
+        name (Optional[str]): Name used in stats. Defaults to `api_base`.
+    """
+
+    __slots__ = ("api_base", "api_key", "weight", "name")
+
+    def __init__(
+        self,
+        api_base: str,
+        api_key: Optional[str] = None,
+        weight: float = 1.0,
+        name: Optional[str] = None,
+    ) -> None:
+        if weight <= 0:
+            raise ValueError("Endpoint weight must be positive.")
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+        self.weight = weight
+        self.name = name or self.api_base
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.name!r}, weight={self.weight})"
+
+
+class CircuitBreaker:
+    """
+    Ejects an endpoint after consecutive failures.
+
+    After `failure_threshold` failures in a row the circuit opens and the
+    endpoint gets no traffic for `reset_timeout` seconds. It then goes
+    half-open and a single probe request decides whether it closes again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def available(self) -> bool:
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probing)
+
+    def on_dispatch(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._probing = True
+
+    def on_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def on_abort(self) -> None:
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+class _EndpointState:
+    def __init__(self, endpoint: Endpoint, breaker: CircuitBreaker) -> None:
+        self.endpoint = endpoint
+        self.breaker = breaker
+        self.latency = LatencyHistogram()
+        self.ewma: Optional[float] = None
+        self.current_weight = 0.0
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+
+
+class LoadBalancer:
+    """
+    Chooses the endpoint of every HTTP attempt and tracks endpoint health.
+
+    Args:
+        endpoints (Sequence[Union[str, Endpoint]]): Endpoints, or their URLs.
+        strategy (str): "round_robin" (smooth weighted round-robin) or
+            "least_outstanding" (fewest in-flight requests per unit of weight,
+            ties broken by latency).
+        failure_threshold (int): Consecutive failures opening a circuit.
+        reset_timeout (float): Seconds before an open circuit is probed.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[Union[str, Endpoint]],
+        strategy: str = ROUND_ROBIN,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("At least one endpoint is required.")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected {STRATEGIES}.")
+        self.strategy = strategy
+        self._states: List[_EndpointState] = []
+        names = set()
+        for endpoint in endpoints:
+            if isinstance(endpoint, str):
+                endpoint = Endpoint(endpoint)
+            if endpoint.name in names:
+                endpoint = Endpoint(
+                    endpoint.api_base,
+                    endpoint.api_key,
+                    endpoint.weight,
+                    f"{endpoint.name}#{len(self._states)}",
+                )
+            names.add(endpoint.name)
+            breaker = CircuitBreaker(failure_threshold, reset_timeout)
+            self._states.append(_EndpointState(endpoint, breaker))
+        self._lock = threading.Lock()
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        return [state.endpoint for state in self._states]
+
+    def choose(
+        self, exclude: Sequence[Endpoint] = (), fallback: bool = True
+    ) -> Optional[Endpoint]:
+        """
+        Pick the endpoint of the next attempt and count it as in flight.
+
+        Endpoints in `exclude` and those with an open circuit are skipped.
+        If none is left and `fallback` is set, the endpoint whose circuit
+        opened first is used rather than failing outright.
+        """
+        with self._lock:
+            candidates = [
+                s
+                for s in self._states
+                if s.endpoint not in exclude and s.breaker.available()
+            ]
+            if not candidates:
+                others = [s for s in self._states if s.endpoint not in exclude]
+                if not fallback or not others:
+                    return None
+                candidates = [min(others, key=lambda s: s.breaker.opened_at or 0.0)]
+
+            if self.strategy == ROUND_ROBIN:
+                total = 0.0
+                for state in candidates:
+                    state.current_weight += state.endpoint.weight
+                    total += state.endpoint.weight
+                chosen = max(candidates, key=lambda s: s.current_weight)
+                chosen.current_weight -= total
+            else:
+                chosen = min(
+                    candidates,
+                    key=lambda s: (s.outstanding / s.endpoint.weight, s.ewma or 0.0),
+                )
+            chosen.breaker.on_dispatch()
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen.endpoint
+
+    def _state(self, endpoint: Endpoint) -> _EndpointState:
+        return next(s for s in self._states if s.endpoint is endpoint)
+
+    def on_result(
+        self, endpoint: Endpoint, ok: bool, latency: Optional[float] = None
+    ) -> None:
+        """Record the outcome of an attempt sent to `endpoint`."""
+        state = self._state(endpoint)
+        with self._lock:
+            if ok:
+                state.breaker.on_success()
+            else:
+                state.failures += 1
+                state.breaker.on_failure()
+            if latency is not None:
+                state.ewma = (
+                    latency
+                    if state.ewma is None
+                    else _EWMA_ALPHA * latency + (1 - _EWMA_ALPHA) * state.ewma
+                )
+        if latency is not None:
+            state.latency.record(latency)
+
+    def release(self, endpoint: Endpoint, aborted: bool = False) -> None:
+        """
+        Mark an attempt to `endpoint` as no longer in flight.
+
+        Aborted attempts (e.g. cancelled ones) have no outcome; a half-open
+        circuit then waits for the next probe.
+        """
+        state = self._state(endpoint)
+        with self._lock:
+            state.outstanding -= 1
+            if aborted:
+                state.breaker.on_abort()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint health, load and latency (time to response headers)."""
+        with self._lock:
+            return {
+                s.endpoint.name: {
+                    "state": s.breaker.state,
+                    "requests": s.requests,
+                    "failures": s.failures,
+                    "outstanding": s.outstanding,
+                    "latency_ewma": s.ewma,
+                    "latency_p50": s.latency.percentile(0.5),
+                    "latency_p95": s.latency.percentile(0.95),
+                }
+                for s in self._states
+            }
+
+
+def _is_failure(status_code: int) -> bool:
+    return status_code >= 500
+
+
+def _should_failover(status_code: int) -> bool:
+    # Another endpoint or key may not be overloaded or rate limited.
+    return status_code == 429 or status_code >= 500
+
+
+def _path_suffix(request: httpx.Request, base_url: str) -> Optional[str]:
+    url = str(request.url)
+    return url[len(base_url) :] if url.startswith(base_url) else None
+
+
+def _route(request: httpx.Request, suffix: Optional[str], endpoint: Endpoint) -> None:
+    if suffix is not None:
+        request.url = httpx.URL(endpoint.api_base + suffix)
+        request.headers["Host"] = request.url.netloc.decode("ascii")
+    if endpoint.api_key is not None:
+        request.headers["Authorization"] = f"Bearer {endpoint.api_key}"
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream: Any, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    async def __aiter__(self) -> Any:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class BalancedTransport(httpx.BaseTransport):
+    """
+    Sends every HTTP attempt to an endpoint chosen by a `LoadBalancer`.
+
+    Requests are built against `base_url`; that prefix is replaced by the
+    chosen endpoint's `api_base` and the endpoint's key is set. Connection
+    errors, 5xx and 429 responses fail over to another endpoint at once.
+
+    Args:
+        balancer (LoadBalancer): The balancer choosing endpoints.
+        transports (Dict[str, httpx.BaseTransport]): Transport per endpoint name.
+        base_url (str): URL prefix the requests are built against.
+    """
+
+    def __init__(
+        self,
+        balancer: LoadBalancer,
+        transports: Dict[str, httpx.BaseTransport],
+        base_url: str,
+    ) -> None:
+        self._balancer = balancer
+        self._transports = transports
+        self._base_url = base_url.rstrip("/")
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        balancer = self._balancer
+        request.read()
+        suffix = _path_suffix(request, self._base_url)
+        tried: List[Endpoint] = []
+        endpoint = balancer.choose()
+        while endpoint is not None:
+            tried.append(endpoint)
+            _route(request, suffix, endpoint)
+            start = time.perf_counter()
+            try:
+                response = self._transports[endpoint.name].handle_request(request)
+            except httpx.TransportError:
+                balancer.on_result(endpoint, ok=False)
+                balancer.release(endpoint)
+                endpoint = balancer.choose(exclude=tried, fallback=False)
+                if endpoint is None:
+                    raise
+                continue
+            except BaseException:
+                balancer.release(endpoint, aborted=True)
+                raise
+
+            latency = time.perf_counter() - start
+            status = response.status_code
+            balancer.on_result(endpoint, ok=not _is_failure(status), latency=latency)
+            if _should_failover(status):
+                next_endpoint = balancer.choose(exclude=tried, fallback=False)
+                if next_endpoint is not None:
+                    response.close()
+                    balancer.release(endpoint)
+                    endpoint = next_endpoint
+                    continue
+            if response.is_closed:
+                # Already read (e.g. built from bytes), nothing left to stream.
+                balancer.release(endpoint)
+            else:
+                response.stream = _ReleasingStream(
+                    response.stream, lambda e=endpoint: balancer.release(e)
+                )
+            return response
+        raise httpx.ConnectError("No ASI endpoint available.", request=request)
+
+    def close(self) -> None:
+        for transport in self._transports.values():
+            transport.close()
+
+
+class AsyncBalancedTransport(httpx.AsyncBaseTransport):
+    """Async version of `BalancedTransport`."""
+
+    def __init__(
+        self,
+        balancer: LoadBalancer,
+        transports: Dict[str, httpx.AsyncBaseTransport],
+        base_url: str,
+    ) -> None:
+        self._balancer = balancer
+        self._transports = transports
+        self._base_url = base_url.rstrip("/")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        balancer = self._balancer
+        await request.aread()
+        suffix = _path_suffix(request, self._base_url)
+        tried: List[Endpoint] = []
+        endpoint = balancer.choose()
+        while endpoint is not None:
+            tried.append(endpoint)
+            _route(request, suffix, endpoint)
+            start = time.perf_counter()
+            transport = self._transports[endpoint.name]
+            try:
+                response = await transport.handle_async_request(request)
+            except httpx.TransportError:
+                balancer.on_result(endpoint, ok=False)
+                balancer.release(endpoint)
+                endpoint = balancer.choose(exclude=tried, fallback=False)
+                if endpoint is None:
+                    raise
+                continue
+            except BaseException:
+                balancer.release(endpoint, aborted=True)
+                raise
+
+            latency = time.perf_counter() - start
+            status = response.status_code
+            balancer.on_result(endpoint, ok=not _is_failure(status), latency=latency)
+            if _should_failover(status):
+                next_endpoint = balancer.choose(exclude=tried, fallback=False)
+                if next_endpoint is not None:
+                    await response.aclose()
+                    balancer.release(endpoint)
+                    endpoint = next_endpoint
+                    continue
+            if response.is_closed:
+                # Already read (e.g. built from bytes), nothing left to stream.
+                balancer.release(endpoint)
+            else:
+                response.stream = _AsyncReleasingStream(
+                    response.stream, lambda e=endpoint: balancer.release(e)
+                )
+            return response
+        raise httpx.ConnectError("No ASI endpoint available.", request=request)
+
+    async def aclose(self) -> None:
+        for transport in self._transports.values():
+            await transport.aclose()
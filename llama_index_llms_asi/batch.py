@@ -0,0 +1,114 @@
+"""Concurrency-limited batch execution for ASI requests."""
+
+import asyncio
+from typing import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+)
+
+DEFAULT_BATCH_CONCURRENCY = 16
+
+InputT = TypeVar("InputT")
+ResponseT = TypeVar("ResponseT")
+
+
+class BatchResult(Generic[ResponseT]):
+    """
+    Outcome of a single item of a batch.
+
+    Args:
+        index (int): Position of the item in the batch input.
+        response (Optional[ResponseT]): The response, if the request succeeded.
+        error (Optional[BaseException]): The exception raised by the request,
+            if it failed.
+    """
+
+    __slots__ = ("index", "response", "error")
+
+    def __init__(
+        self,
+        index: int,
+        response: Optional[ResponseT] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        self.index = index
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Whether the request succeeded."""
+        return self.error is None
+
+    def __repr__(self) -> str:
+        if self.error is not None:
+            return f"BatchResult(index={self.index}, error={self.error!r})"
+        return f"BatchResult(index={self.index}, response={self.response!r})"
+
+
+async def aiter_batch(
+    fn: Callable[[InputT], Awaitable[ResponseT]],
+    items: Iterable[InputT],
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+) -> AsyncGenerator[BatchResult[ResponseT], None]:
+    """
+    Run `fn` over `items` with at most `max_concurrency` calls in flight.
+
+    Results are yielded as soon as they finish. Items are pulled lazily from
+    `items`, so large iterables are never materialized up front.
+    Exceptions raised by `fn` are reported on the result instead of
+    aborting the batch.
+    """
+    if max_concurrency <= 0:
+        raise ValueError("max_concurrency must be positive.")
+
+    queue: "asyncio.Queue[Optional[BatchResult[ResponseT]]]" = asyncio.Queue()
+    pending = enumerate(items)
+
+    async def worker() -> None:
+        try:
+            # The enumerate iterator is shared, so each item is taken exactly once.
+            for index, item in pending:
+                try:
+                    result = BatchResult(index, response=await fn(item))
+                except Exception as e:
+                    result = BatchResult(index, error=e)
+                queue.put_nowait(result)
+        finally:
+            queue.put_nowait(None)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max_concurrency)]
+    remaining = len(workers)
+    try:
+        while remaining:
+            result = await queue.get()
+            if result is None:
+                remaining -= 1
+            else:
+                yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for task in workers:
+            # Surface unexpected failures of the iteration itself.
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()  # type: ignore[misc]
+
+
+async def arun_batch(
+    fn: Callable[[InputT], Awaitable[ResponseT]],
+    items: Iterable[InputT],
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+) -> List[BatchResult[ResponseT]]:
+    """Run `fn` over `items` concurrently and return results in input order."""
+    results = [result async for result in aiter_batch(fn, items, max_concurrency)]
+    results.sort(key=lambda result: result.index)
+    return results
+
@@ -0,0 +1,334 @@
+"""
+Resumable JSONL batch runs of ASI chat requests.
+
+Every input line is a JSON object with `messages` (OpenAI-style role and
+content dicts), an optional `id` (defaulting to the line number) and
+optional `params` passed on to `achat` (e.g. `temperature`, `max_tokens`).
+Every output line holds the `id` with either the reply `content`, token
+`usage` and `latency`, or an `error`.
+
+The output file doubles as the checkpoint: a restarted run skips the ids
+already answered there and appends the rest. Input is read lazily and
+results are written as they finish, so memory use does not grow with the
+size of the input.
+
+Usage:
+    python -m llama_index_llms_asi.batch_file requests.jsonl results.jsonl \\
+        --max-concurrency 32
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.base.llms.types import ChatMessage
+
+from llama_index_llms_asi.batch import DEFAULT_BATCH_CONCURRENCY, aiter_batch
+
+if TYPE_CHECKING:
+    from llama_index_llms_asi.asi import ASI
+
+DEFAULT_PROGRESS_INTERVAL = 5.0
+# Results written between two fsyncs of the output file.
+DEFAULT_SYNC_EVERY = 100
+
+
+class BatchFileStats:
+    """Progress of a batch file run; `skipped` counts ids answered earlier."""
+
+    __slots__ = (
+        "completed",
+        "failed",
+        "skipped",
+        "prompt_tokens",
+        "completion_tokens",
+        "started_at",
+        "elapsed",
+    )
+
+    def __init__(self) -> None:
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.started_at = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Requests finished (successfully or not) per second in this run."""
+        done = self.completed + self.failed
+        return done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.completed} completed, {self.failed} failed, "
+            f"{self.skipped} skipped in {self.elapsed:.1f}s "
+            f"({self.throughput:.1f} req/s, "
+            f"{self.completion_tokens / max(self.elapsed, 1e-9):.0f} tok/s)"
+        )
+
+
+class _Request:
+    __slots__ = ("id", "messages", "params", "error")
+
+    def __init__(
+        self,
+        id: Any,
+        messages: Sequence[ChatMessage] = (),
+        params: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        self.id = id
+        self.messages = messages
+        self.params = params or {}
+        self.error = error
+
+
+def _checkpoint(output_path: str, retry_failed: bool) -> Set[Any]:
+    """
+    Collect the ids answered in `output_path`.
+
+    A partial last line left by a crash is cut off so appended results start
+    on a fresh line.
+    """
+    done: Set[Any] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            end += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not (retry_failed and "error" in record):
+                done.add(record.get("id"))
+        f.truncate(end)
+    return done
+
+
+def _read_requests(
+    input_path: str, skip: Set[Any], stats: BatchFileStats
+) -> Iterator[_Request]:
+    """
+    Lazily parse the requests of a JSONL file, skipping ids in `skip`.
+
+    Malformed lines, including ids that are not strings or integers, are
+    yielded as requests carrying an error (under their line number when the
+    id is unusable), so they are reported in the output rather than aborting
+    the run.
+    """
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                request_id = data.get("id", line_number)
+            except (ValueError, AttributeError) as e:
+                request_id, error = line_number, f"Invalid JSON: {e}"
+            else:
+                error = None
+                if not isinstance(request_id, (str, int)):
+                    error = (
+                        "Invalid request: id must be a string or an integer, "
+                        f"not {type(request_id).__name__}"
+                    )
+                    request_id = line_number
+            if request_id in skip:
+                stats.skipped += 1
+                continue
+            if error is not None:
+                yield _Request(request_id, error=error)
+                continue
+            try:
+                messages = [ChatMessage.model_validate(m) for m in data["messages"]]
+            except Exception as e:
+                yield _Request(request_id, error=f"Invalid request: {e}")
+                continue
+            yield _Request(request_id, messages, data.get("params"))
+
+
+async def arun_batch_file(
+    llm: "ASI",
+    input_path: str,
+    output_path: str,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    retry_failed: bool = True,
+    progress: Optional[Callable[[BatchFileStats], None]] = None,
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+) -> BatchFileStats:
+    """
+    Answer every chat request of a JSONL file, appending results to another.
+
+    Args:
+        llm (ASI): The LLM answering the requests.
+        input_path (str): JSONL file of requests.
+        output_path (str): JSONL file results are appended to. Ids already
+            answered there are skipped.
+        max_concurrency (int): Maximum requests in flight.
+        retry_failed (bool): Whether ids recorded with an error by an earlier
+            run are sent again. Their new result is appended; the last line of
+            an id wins.
+        progress (Optional[Callable[[BatchFileStats], None]]): Called every
+            `progress_interval` seconds and once at the end.
+        progress_interval (float): Seconds between `progress` calls.
+
+    Returns:
+        BatchFileStats: Counts, token usage and throughput of this run.
+    """
+    done = _checkpoint(output_path, retry_failed)
+    stats = BatchFileStats()
+    requests = _read_requests(input_path, done, stats)
+
+    async def send(request: _Request) -> Dict[str, Any]:
+        if request.error is not None:
+            return {"id": request.id, "error": request.error}
+        start = time.perf_counter()
+        try:
+            response = await llm.achat(request.messages, **request.params)
+        except Exception as e:
+            return {"id": request.id, "error": f"{type(e).__name__}: {e}"}
+        usage = {
+            key: response.additional_kwargs[key]
+            for key in ("prompt_tokens", "completion_tokens")
+            if key in response.additional_kwargs
+        }
+        return {
+            "id": request.id,
+            "content": response.message.content,
+            "usage": usage,
+            "latency": round(time.perf_counter() - start, 4),
+        }
+
+    unsynced = 0
+    last_report = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        try:
+            async for result in aiter_batch(send, requests, max_concurrency):
+                record = result.response
+                assert record is not None
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if "error" in record:
+                    stats.failed += 1
+                else:
+                    stats.completed += 1
+                    stats.prompt_tokens += record["usage"].get("prompt_tokens", 0)
+                    stats.completion_tokens += record["usage"].get(
+                        "completion_tokens", 0
+                    )
+                # Flush every line so a crash loses at most in-flight requests.
+                out.flush()
+                unsynced += 1
+                if unsynced >= DEFAULT_SYNC_EVERY:
+                    os.fsync(out.fileno())
+                    unsynced = 0
+                now = time.perf_counter()
+                stats.elapsed = now - stats.started_at
+                if progress is not None and now - last_report >= progress_interval:
+                    last_report = now
+                    progress(stats)
+        finally:
+            out.flush()
+            os.fsync(out.fileno())
+    stats.elapsed = time.perf_counter() - stats.started_at
+    if progress is not None:
+        progress(stats)
+    return stats
+
+
+def run_batch_file(
+    llm: "ASI",
+    input_path: str,
+    output_path: str,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    retry_failed: bool = True,
+    progress: Optional[Callable[[BatchFileStats], None]] = None,
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+) -> BatchFileStats:
+    """Synchronous version of `arun_batch_file`."""
+    return asyncio_run(
+        arun_batch_file(
+            llm,
+            input_path,
+            output_path,
+            max_concurrency,
+            retry_failed,
+            progress,
+            progress_interval,
+        )
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--api-base", default=None)
+    parser.add_argument(
+        "--max-concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY
+    )
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--no-retry-failed", action="store_true")
+    parser.add_argument(
+        "--progress-interval", type=float, default=DEFAULT_PROGRESS_INTERVAL
+    )
+    args = parser.parse_args(argv)
+
+    from llama_index_llms_asi.asi import ASI
+
+    kwargs: Dict[str, Any] = {"max_retries": args.max_retries, "timeout": args.timeout}
+    if args.model:
+        kwargs["model"] = args.model
+    if args.api_base:
+        kwargs["api_base"] = args.api_base
+    llm = ASI(**kwargs)
+
+    def report(stats: BatchFileStats) -> None:
+        print(stats, file=sys.stderr, flush=True)
+
+    stats = run_batch_file(
+        llm,
+        args.input,
+        args.output,
+        max_concurrency=args.max_concurrency,
+        retry_failed=not args.no_retry_failed,
+        progress=report,
+        progress_interval=args.progress_interval,
+    )
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""Response caches for ASI completions and chats."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from llama_index.core.base.llms.types import ChatResponse, CompletionResponse
+
+CacheEntry = Dict[str, Any]
+
+
+def make_cache_key(params: Dict[str, Any], payload: Any) -> str:
+    """
+    Build a deterministic cache key.
+
+    Args:
+        params (Dict[str, Any]): The model and sampling parameters of the request.
+        payload (Any): The JSON-serializable request input (messages or prompt).
+    """
+    blob = json.dumps(
+        {"params": params, "payload": payload},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def dump_chat_response(response: ChatResponse) -> CacheEntry:
+    """Serialize a chat response, dropping the raw provider payload."""
+    return response.model_dump(mode="json", exclude={"raw", "delta"})
+
+
+def load_chat_response(entry: CacheEntry) -> ChatResponse:
+    """Rebuild a chat response from a cache entry."""
+    return ChatResponse.model_validate(entry)
+
+
+def dump_completion_response(response: CompletionResponse) -> CacheEntry:
+    """Serialize a completion response, dropping the raw provider payload."""
+    return response.model_dump(mode="json", exclude={"raw", "delta"})
+
+
+def load_completion_response(entry: CacheEntry) -> CompletionResponse:
+    """Rebuild a completion response from a cache entry."""
+    return CompletionResponse.model_validate(entry)
+
+
+def replay_chat_response(entry: CacheEntry) -> ChatResponse:
+    """Rebuild a cached chat response as a single, complete stream chunk."""
+    response = load_chat_response(entry)
+    response.delta = response.message.content or ""
+    return response
+
+
+def replay_completion_response(entry: CacheEntry) -> CompletionResponse:
+    """Rebuild a cached completion response as a single, complete stream chunk."""
+    response = load_completion_response(entry)
+    response.delta = response.text
+    return response
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters of a cache."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def record_evictions(self, count: int = 1) -> None:
+        with self._lock:
+            self.evictions += count
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class BaseCache(ABC):
+    """Base class for ASI response caches."""
+
+    def __init__(self) -> None:
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Look up `key`, recording a hit or a miss."""
+        entry = self._get(key)
+        if entry is None:
+            self.stats.record_miss()
+        else:
+            self.stats.record_hit()
+        return entry
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        """Look up `key` without touching the stats."""
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Store `entry` under `key`."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove `key` if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored entries."""
+
+
+class InMemoryCache(BaseCache):
+    """
+    In-process LRU cache with an optional time-to-live.
+
+    Args:
+        max_size (int): Maximum number of entries before the least recently
+            used one is evicted. Defaults to 1024.
+        ttl (Optional[float]): Seconds after which an entry expires. None keeps
+            entries until they are evicted. Defaults to None.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size must be positive.")
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, CacheEntry]]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            stored_at, entry = item
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.stats.record_evictions(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Entries are per process; a pickled cache arrives empty.
+        return {"max_size": self.max_size, "ttl": self.ttl}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
+
+
+class SQLiteCache(BaseCache):
+    """
+    On-disk cache backed by SQLite, shareable across processes.
+
+    The connection is reopened in forked or unpickled processes, so one
+    database file can back the ASI instances of a whole process pool.
+
+    Args:
+        path (str): Path of the SQLite database file. Use ":memory:" for a
+            private in-memory database.
+        max_size (Optional[int]): Maximum number of entries before the least
+            recently used ones are evicted. None disables the limit.
+            Defaults to None.
+        ttl (Optional[float]): Seconds after which an entry expires. None keeps
+            entries until they are evicted. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._connect()
+
+    def _connect(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS asi_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # SQLite connections must not be used across fork.
+        if self._pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        db = self._db
+        with self._lock, db:
+            row = db.execute(
+                "SELECT value, created_at FROM asi_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                db.execute("DELETE FROM asi_cache WHERE key = ?", (key,))
+                return None
+            db.execute(
+                "UPDATE asi_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(value)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        now = time.time()
+        evicted = 0
+        db = self._db
+        with self._lock, db:
+            db.execute(
+                "INSERT OR REPLACE INTO asi_cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry), now, now),
+            )
+            if self.max_size is not None:
+                evicted = db.execute(
+                    "DELETE FROM asi_cache WHERE key IN (SELECT key FROM asi_cache "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,),
+                ).rowcount
+        if evicted > 0:
+            self.stats.record_evictions(evicted)
+
+    def delete(self, key: str) -> None:
+        db = self._db
+        with self._lock, db:
+            db.execute("DELETE FROM asi_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        db = self._db
+        with self._lock, db:
+            db.execute("DELETE FROM asi_cache")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        db = self._db
+        with self._lock:
+            return db.execute("SELECT COUNT(*) FROM asi_cache").fetchone()[0]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path, "max_size": self.max_size, "ttl": self.ttl}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
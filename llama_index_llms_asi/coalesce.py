@@ -0,0 +1,309 @@
+"""Single-flight coalescing of identical concurrent ASI requests."""
+
+import asyncio
+import threading
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    Generator,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+_PULL = object()
+
+
+class SingleFlightStats:
+    """Counters of how many calls were answered by another caller's request."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.coalesced = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"requests": self.requests, "coalesced": self.coalesced}
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _Broadcast:
+    """
+    Fans one upstream iterator out to several consumers.
+
+    Consumers take turns pulling the next chunk from upstream; every chunk is
+    buffered so consumers that join late replay the stream from the start.
+    """
+
+    def __init__(
+        self, open_stream: Callable[[], Iterator[Any]], on_done: Callable[[], None]
+    ) -> None:
+        self._open_stream = open_stream
+        self._on_done = on_done
+        self._upstream: Optional[Iterator[Any]] = None
+        self._cond = threading.Condition()
+        self._pulling = False
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.consumers = 0
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._pulling = False
+            self._cond.notify_all()
+        self._on_done()
+
+    def _pull(self) -> None:
+        try:
+            if self._upstream is None:
+                self._upstream = self._open_stream()
+            chunk = next(self._upstream)
+        except StopIteration:
+            self._finish(None)
+            return
+        except BaseException as e:
+            self._finish(e)
+            return
+        with self._cond:
+            self.chunks.append(chunk)
+            self._pulling = False
+            self._cond.notify_all()
+
+    def iterate(self) -> Generator[Any, None, None]:
+        index = 0
+        try:
+            while True:
+                with self._cond:
+                    while self._pulling and index >= len(self.chunks):
+                        self._cond.wait()
+                    if index < len(self.chunks):
+                        chunk = self.chunks[index]
+                        index += 1
+                    elif self.done:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    else:
+                        self._pulling = True
+                        chunk = _PULL
+                if chunk is _PULL:
+                    self._pull()
+                else:
+                    yield chunk
+        finally:
+            self._leave()
+
+    def _leave(self) -> None:
+        with self._cond:
+            self.consumers -= 1
+            abandoned = self.consumers == 0 and not self.done
+        if abandoned:
+            # Nobody is pulling once the last consumer left.
+            close = getattr(self._upstream, "close", None)
+            if close is not None:
+                close()
+            self._finish(None)
+
+
+class _AsyncBroadcast:
+    """Async version of `_Broadcast`, fed by a single pump task."""
+
+    def __init__(
+        self,
+        open_stream: Callable[[], Awaitable[AsyncGenerator[Any, None]]],
+        on_done: Callable[[], None],
+    ) -> None:
+        self._open_stream = open_stream
+        self._on_done = on_done
+        self._changed = asyncio.Event()
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.consumers = 0
+        self.task = asyncio.get_running_loop().create_task(self._pump())
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self) -> None:
+        try:
+            stream = await self._open_stream()
+            try:
+                async for chunk in stream:
+                    self.chunks.append(chunk)
+                    self._notify()
+            finally:
+                aclose = getattr(stream, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._on_done()
+            self._notify()
+
+    async def iterate(self) -> AsyncGenerator[Any, None]:
+        index = 0
+        try:
+            while True:
+                if index < len(self.chunks):
+                    index += 1
+                    yield self.chunks[index - 1]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.consumers -= 1
+            if self.consumers == 0 and not self.done:
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    Shares one in-flight request between concurrent identical calls.
+
+    The first caller for a key runs the request; callers arriving with the
+    same key while it is in flight wait for and receive the same result (or
+    exception). Streams are fanned out: late joiners first replay the chunks
+    already received. Keys are forgotten as soon as the request finishes, so
+    this never serves stale results.
+    """
+
+    def __init__(self) -> None:
+        self.stats = SingleFlightStats()
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Flight] = {}
+        self._tasks: Dict[Tuple[Any, Hashable], "asyncio.Task[Any]"] = {}
+        self._waiters: Dict["asyncio.Task[Any]", int] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self._astreams: Dict[Tuple[Any, Hashable], _AsyncBroadcast] = {}
+
+    def _forget(self, table: Dict[Any, Any], key: Any, value: Any) -> None:
+        with self._lock:
+            if table.get(key) is value:
+                del table[key]
+
+    def call(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run `fn`, or wait for the identical call already in flight."""
+        with self._lock:
+            self.stats.requests += 1
+            flight = self._calls.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._calls[key] = _Flight()
+            else:
+                self.stats.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._forget(self._calls, key, flight)
+            flight.done.set()
+        return flight.result
+
+    async def acall(
+        self, key: Hashable, fn: Callable[[], Coroutine[Any, Any, T]]
+    ) -> T:
+        """
+        Async version of `call`.
+
+        The request runs in a task of its own, so cancelling one waiter does
+        not affect the others; it is cancelled once every waiter is gone.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            self.stats.requests += 1
+            task = self._tasks.get(flight_key)
+            if task is None:
+                task = loop.create_task(fn())
+                self._tasks[flight_key] = task
+                self._waiters[task] = 0
+                task.add_done_callback(
+                    lambda t: self._forget(self._tasks, flight_key, t)
+                )
+            else:
+                self.stats.coalesced += 1
+            self._waiters[task] += 1
+
+        try:
+            return await asyncio.shield(task)
+        finally:
+            with self._lock:
+                self._waiters[task] -= 1
+                abandoned = self._waiters[task] == 0
+                if abandoned:
+                    del self._waiters[task]
+            if abandoned and not task.done():
+                task.cancel()
+
+    def stream(
+        self, key: Hashable, open_stream: Callable[[], Iterator[T]]
+    ) -> Generator[T, None, None]:
+        """Stream from `open_stream`, sharing it with identical live streams."""
+        with self._lock:
+            self.stats.requests += 1
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                broadcast = _Broadcast(
+                    open_stream, lambda: self._forget(self._streams, key, broadcast)
+                )
+                self._streams[key] = broadcast
+            else:
+                self.stats.coalesced += 1
+            broadcast.consumers += 1
+        return broadcast.iterate()
+
+    def astream(
+        self,
+        key: Hashable,
+        open_stream: Callable[[], Awaitable[AsyncGenerator[T, None]]],
+    ) -> AsyncGenerator[T, None]:
+        """Async version of `stream`. Must be called from a running loop."""
+        flight_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            self.stats.requests += 1
+            broadcast = self._astreams.get(flight_key)
+            if broadcast is None:
+                broadcast = _AsyncBroadcast(
+                    open_stream,
+                    lambda: self._forget(self._astreams, flight_key, broadcast),
+                )
+                self._astreams[flight_key] = broadcast
+            else:
+                self.stats.coalesced += 1
+            broadcast.consumers += 1
+        return broadcast.iterate()
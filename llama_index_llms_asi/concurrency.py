@@ -0,0 +1,278 @@
+"""Adaptive concurrency limiting of async ASI calls."""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+import openai
+
+GRADIENT = "gradient"
+AIMD = "aimd"
+ALGORITHMS = (GRADIENT, AIMD)
+
+DEFAULT_INITIAL_LIMIT = 16
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 256
+# Multiplicative decrease applied on overload signals (5xx, 429, timeouts).
+DEFAULT_BACKOFF_RATIO = 0.9
+# Latency growth tolerated before the gradient starts shrinking the limit.
+_TOLERANCE = 1.5
+# Weight of a new limit estimate in the smoothed limit.
+_SMOOTHING = 0.2
+# Samples averaged into the long-term (no-load) latency.
+_LONG_WINDOW = 600
+
+
+class LoadShedError(RuntimeError):
+    """A call waited longer than `max_queue_wait` for a concurrency slot."""
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether `error` signals an overloaded server rather than a bad request."""
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException)):
+        return True
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class ConcurrencyStats:
+    """Counters of an adaptive concurrency limiter."""
+
+    def __init__(self) -> None:
+        self.accepted = 0
+        self.queued = 0
+        self.shed = 0
+        self.overloads = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "accepted": self.accepted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "overloads": self.overloads,
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps in-flight async calls at a limit tuned from latency and errors.
+
+    With the "gradient" algorithm (after Netflix's concurrency-limits
+    Gradient2), every sample compares the long-term average latency with the
+    latest one: while latency stays within tolerance the limit grows by about
+    its square root, and as queueing inflates latency the limit shrinks in
+    proportion. With "aimd" the limit grows by one per call completed at full
+    load. Both cut the limit by `backoff_ratio` on overload errors (5xx, 429,
+    timeouts) and leave it alone while less than half of it is in use.
+
+    Calls beyond the limit wait in FIFO order. With `max_queue_wait`, a call
+    that waits longer is shed with a `LoadShedError` instead of adding to the
+    backlog.
+
+    The limiter may be shared by several event loops; its state is guarded by
+    a lock and waiters are woken on their own loop.
+
+    Args:
+        algorithm (str): "gradient" or "aimd".
+        initial_limit (int): Starting limit.
+        min_limit (int): Lower bound of the limit.
+        max_limit (int): Upper bound of the limit.
+        max_queue_wait (Optional[float]): Seconds a call may wait for a slot.
+        backoff_ratio (float): Factor applied to the limit on overload.
+    """
+
+    def __init__(
+        self,
+        algorithm: str = GRADIENT,
+        initial_limit: int = DEFAULT_INITIAL_LIMIT,
+        min_limit: int = DEFAULT_MIN_LIMIT,
+        max_limit: int = DEFAULT_MAX_LIMIT,
+        max_queue_wait: Optional[float] = None,
+        backoff_ratio: float = DEFAULT_BACKOFF_RATIO,
+    ) -> None:
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"algorithm must be one of {ALGORITHMS}.")
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial_limit <= max_limit.")
+        self.algorithm = algorithm
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue_wait = max_queue_wait
+        self.backoff_ratio = backoff_ratio
+        self.stats = ConcurrencyStats()
+        self._limit = float(initial_limit)
+        self._long_rtt: Optional[float] = None
+        self._samples = 0
+        self._in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Current maximum number of calls in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls holding a slot."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a slot."""
+        return len(self._waiters)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current limit, occupancy and counters, e.g. for a metrics endpoint."""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "long_rtt": self._long_rtt,
+            **self.stats.as_dict(),
+        }
+
+    async def acquire(self) -> None:
+        """Wait for a slot, or raise `LoadShedError` past `max_queue_wait`."""
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                self.stats.accepted += 1
+                return
+            future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            self.stats.queued += 1
+        try:
+            await asyncio.wait_for(future, self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            with self._lock:
+                self.stats.shed += 1
+            raise LoadShedError(
+                f"No ASI concurrency slot within {self.max_queue_wait}s "
+                f"(limit {self.limit}, {self.queue_depth} queued)."
+            )
+        except BaseException:
+            self._abandon(future)
+            raise
+        with self._lock:
+            self.stats.accepted += 1
+
+    def _abandon(self, future: "asyncio.Future[None]") -> None:
+        with self._lock:
+            try:
+                self._waiters.remove(future)
+            except ValueError:
+                # Already handed a slot; `_grant` gives it back.
+                pass
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters. Must hold the lock."""
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.get_loop().call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: "asyncio.Future[None]") -> None:
+        if future.done():
+            # The waiter gave up after its slot was assigned.
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(
+        self, latency: Optional[float] = None, overload: bool = False
+    ) -> None:
+        """
+        Free a slot, updating the limit from the call's outcome.
+
+        Args:
+            latency (Optional[float]): Seconds the call took, or None if it
+                says nothing about the server (e.g. a client error).
+            overload (bool): Whether the call failed with an overload error.
+        """
+        with self._lock:
+            if overload:
+                self.stats.overloads += 1
+                self._set_limit(self._limit * self.backoff_ratio)
+            elif latency is not None:
+                self._update(latency)
+            self._in_flight -= 1
+            self._wake()
+
+    def _update(self, rtt: float) -> None:
+        rtt = max(rtt, 1e-6)
+        self._samples += 1
+        if self._long_rtt is None:
+            self._long_rtt = rtt
+        else:
+            weight = 1.0 / min(self._samples, _LONG_WINDOW)
+            self._long_rtt += (rtt - self._long_rtt) * weight
+            if self._long_rtt / rtt > 2:
+                # Latency dropped a lot: forget the old baseline quickly.
+                self._long_rtt *= 0.95
+        # An underused limit says nothing about the server's capacity.
+        if self._in_flight < self._limit / 2:
+            return
+        if self.algorithm == AIMD:
+            self._set_limit(self._limit + 1)
+            return
+        gradient = max(0.5, min(1.0, _TOLERANCE * self._long_rtt / rtt))
+        estimate = self._limit * gradient + math.sqrt(self._limit)
+        self._set_limit(self._limit * (1 - _SMOOTHING) + estimate * _SMOOTHING)
+
+    def _set_limit(self, limit: float) -> None:
+        self._limit = min(float(self.max_limit), max(float(self.min_limit), limit))
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` holding a slot, learning from its latency and errors."""
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            result = await fn()
+        except BaseException as e:
+            overload = isinstance(e, Exception) and is_overload(e)
+            self.release(overload=overload)
+            raise
+        self.release(time.perf_counter() - start)
+        return result
+
+    async def stream(
+        self, fn: Callable[[], Awaitable[AsyncGenerator[Any, None]]]
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Like `call`, holding the slot until the stream returned by `fn` ends.
+
+        The slot is only taken when the stream is first iterated, so a stream
+        dropped unread holds nothing. The latency learned from is the time to
+        the first item: how long a generation runs says nothing about load.
+        """
+        return self._hold(fn)
+
+    async def _hold(
+        self, fn: Callable[[], Awaitable[AsyncGenerator[Any, None]]]
+    ) -> AsyncGenerator[Any, None]:
+        await self.acquire()
+        start = time.perf_counter()
+        latency: Optional[float] = None
+        overload = False
+        try:
+            async for item in await fn():
+                if latency is None:
+                    latency = time.perf_counter() - start
+                yield item
+            if latency is None:
+                latency = time.perf_counter() - start
+        except Exception as e:
+            overload = is_overload(e)
+            raise
+        finally:
+            self.release(latency, overload)
@@ -0,0 +1,410 @@
+"""Hedged requests for cutting the latency tail of ASI calls."""
+
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_BUDGET = 0.1
+DEFAULT_HEDGE_INITIAL_DELAY = 2.0
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+
+_MAX_BURST_CREDITS = 10.0
+_END_OF_STREAM = object()
+
+
+class LatencyHistogram:
+    """
+    Thread-safe online latency histogram with log-spaced buckets.
+
+    Bucket bounds grow geometrically, so percentiles are accurate to within
+    `growth` relative error regardless of scale. Once `max_samples` have been
+    recorded all counts are halved, which lets the histogram follow drifting
+    latencies.
+
+    Args:
+        min_latency (float): Upper bound of the first bucket, in seconds.
+        max_latency (float): Latencies above this land in the last bucket.
+        growth (float): Ratio between consecutive bucket bounds.
+        max_samples (int): Number of samples after which counts decay.
+    """
+
+    def __init__(
+        self,
+        min_latency: float = 0.001,
+        max_latency: float = 600.0,
+        growth: float = 1.1,
+        max_samples: int = 10_000,
+    ) -> None:
+        self.min_latency = min_latency
+        self.growth = growth
+        self.max_samples = max_samples
+        num_buckets = int(math.log(max_latency / min_latency, growth)) + 2
+        self._counts: List[float] = [0.0] * num_buckets
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.min_latency:
+            return 0
+        index = int(math.log(seconds / self.min_latency, self.growth)) + 1
+        return min(index, len(self._counts) - 1)
+
+    def _upper_bound(self, bucket: int) -> float:
+        return self.min_latency * self.growth**bucket
+
+    @property
+    def count(self) -> float:
+        return self._total
+
+    def record(self, seconds: float) -> None:
+        """Record one latency sample."""
+        bucket = self._bucket(seconds)
+        with self._lock:
+            self._counts[bucket] += 1
+            self._total += 1
+            if self._total >= self.max_samples:
+                self._counts = [count / 2 for count in self._counts]
+                self._total /= 2
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Get the latency below which a `q` fraction of samples fall."""
+        with self._lock:
+            if self._total == 0:
+                return None
+            threshold = q * self._total
+            seen = 0.0
+            for bucket, count in enumerate(self._counts):
+                seen += count
+                if seen >= threshold:
+                    return self._upper_bound(bucket)
+        return self._upper_bound(len(self._counts) - 1)
+
+
+class HedgeStats:
+    """Counters describing how often hedging kicked in and paid off."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class Hedger:
+    """
+    Sends a duplicate attempt when the first one is slower than usual.
+
+    The hedge deadline is the `percentile` of recently observed latencies
+    (time to response, or time to first chunk for streams). Until
+    `min_samples` latencies have been seen, `initial_delay` is used instead.
+    Every request earns `budget` hedge credits and every hedge spends one, so
+    hedges never exceed `budget` times the request volume (plus a small burst
+    allowance). Whichever attempt finishes first wins and the other one is
+    cancelled. Sync calls run on the caller's thread unless a hedge credit is
+    available; those that could be hedged run on worker threads instead, as
+    sync attempts cannot be interrupted: a losing one finishes in the
+    background and is discarded.
+
+    Args:
+        percentile (float): Latency percentile used as the hedge deadline.
+        budget (float): Maximum ratio of hedges to requests, at most 1.0.
+        initial_delay (float): Hedge deadline before enough samples exist.
+        min_samples (int): Samples required before the histogram is trusted.
+    """
+
+    def __init__(
+        self,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        budget: float = DEFAULT_HEDGE_BUDGET,
+        initial_delay: float = DEFAULT_HEDGE_INITIAL_DELAY,
+        min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+    ) -> None:
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1.")
+        if not 0 <= budget <= 1:
+            raise ValueError("budget must be between 0 and 1.")
+        self.percentile = percentile
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.latency = LatencyHistogram()
+        self.first_chunk_latency = LatencyHistogram()
+        self.stats = HedgeStats()
+        self._credits = 0.0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def hedge_delay(self, histogram: LatencyHistogram) -> float:
+        """Seconds to wait for the first attempt before hedging."""
+        if histogram.count < self.min_samples:
+            return self.initial_delay
+        delay = histogram.percentile(self.percentile)
+        return self.initial_delay if delay is None else delay
+
+    def _on_request(self) -> None:
+        with self._lock:
+            self.stats.requests += 1
+            self._credits = min(_MAX_BURST_CREDITS, self._credits + self.budget)
+
+    def _try_hedge(self) -> bool:
+        with self._lock:
+            if self._credits < 1:
+                return False
+            self._credits -= 1
+            self.stats.hedges += 1
+            return True
+
+    def _reserve_hedge(self) -> bool:
+        """Set a credit aside for a call that may hedge later."""
+        with self._lock:
+            if self._credits < 1:
+                return False
+            self._credits -= 1
+            return True
+
+    def _settle_hedge(self, hedged: bool) -> None:
+        """Count a reserved credit as spent, or give it back."""
+        with self._lock:
+            if hedged:
+                self.stats.hedges += 1
+            else:
+                self._credits = min(_MAX_BURST_CREDITS, self._credits + 1)
+
+    # -- async --
+
+    async def acall(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        histogram: Optional[LatencyHistogram] = None,
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        """
+        Await `attempt()`, hedging it with a second call when it is slow.
+
+        Args:
+            attempt (Callable[[], Awaitable[T]]): Starts one attempt.
+            histogram (Optional[LatencyHistogram]): Histogram to track the
+                latency in. Defaults to the response latency histogram.
+            discard (Optional[Callable[[T], Awaitable[None]]]): Releases the
+                result of an attempt that finished but lost the race.
+        """
+        histogram = histogram or self.latency
+        self._on_request()
+        started: Dict["asyncio.Future[T]", float] = {}
+
+        def start() -> "asyncio.Future[T]":
+            task = asyncio.ensure_future(attempt())
+            started[task] = time.monotonic()
+            return task
+
+        primary = start()
+        try:
+            delay = self.hedge_delay(histogram)
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done and self._try_hedge():
+                start()
+            pending = set(started)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None:
+                    histogram.record(time.monotonic() - started[winner])
+                    if winner is not primary:
+                        self.stats.hedge_wins += 1
+                    if discard is not None:
+                        for task in done - {winner}:
+                            if task.exception() is None:
+                                await discard(task.result())
+                    return winner.result()
+                error = next(iter(done)).exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for task in started:
+                if not task.done():
+                    task.cancel()
+
+    async def astream(
+        self, open_stream: Callable[[], Awaitable[AsyncIterator[T]]]
+    ) -> AsyncGenerator[T, None]:
+        """Race stream openings on their first chunk and relay the winner."""
+
+        async def first_chunk() -> Tuple[AsyncIterator[T], Any]:
+            stream = await open_stream()
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, _END_OF_STREAM
+            except BaseException:
+                await _aclose(stream)
+                raise
+
+        async def discard(result: Tuple[AsyncIterator[T], Any]) -> None:
+            await _aclose(result[0])
+
+        stream, chunk = await self.acall(
+            first_chunk, self.first_chunk_latency, discard
+        )
+        if chunk is _END_OF_STREAM:
+            return
+        try:
+            yield chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await _aclose(stream)
+
+    # -- sync --
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(thread_name_prefix="asi-hedge")
+            return self._executor
+
+    def call(
+        self,
+        attempt: Callable[[], T],
+        histogram: Optional[LatencyHistogram] = None,
+        discard: Optional[Callable[[T], None]] = None,
+    ) -> T:
+        """
+        Synchronous version of `acall`.
+
+        Without a hedge credit to spend the attempt runs inline. Otherwise a
+        credit is reserved (and returned if no hedge is sent) and attempts
+        run on worker threads, timed from when a worker starts them so that
+        waiting for a thread does not count toward the hedge deadline.
+        """
+        histogram = histogram or self.latency
+        self._on_request()
+        if not self._reserve_hedge():
+            start = time.monotonic()
+            result = attempt()
+            histogram.record(time.monotonic() - start)
+            return result
+
+        executor = self._get_executor()
+        hedged = False
+        try:
+            primary = _Attempt(executor, attempt)
+            primary.running.wait()
+            delay = self.hedge_delay(histogram) - (time.monotonic() - primary.start)
+            done, _ = wait([primary.future], timeout=max(delay, 0.0))
+            attempts = [primary]
+            if not done:
+                hedged = True
+                attempts.append(_Attempt(executor, attempt))
+        finally:
+            self._settle_hedge(hedged)
+        by_future = {a.future: a for a in attempts}
+        pending = set(by_future)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+            if winner is not None:
+                histogram.record(time.monotonic() - by_future[winner].start)
+                if winner is not primary.future:
+                    self.stats.hedge_wins += 1
+                if discard is not None:
+                    for future in done - {winner}:
+                        if future.exception() is None:
+                            discard(future.result())
+                    for future in pending:
+                        future.add_done_callback(_discard_later(discard))
+                return winner.result()
+            error = next(iter(done)).exception()
+        raise error  # type: ignore[misc]
+
+    def stream(
+        self, open_stream: Callable[[], Iterator[T]]
+    ) -> Generator[T, None, None]:
+        """Synchronous version of `astream`."""
+
+        def first_chunk() -> Tuple[Iterator[T], Any]:
+            stream = open_stream()
+            try:
+                return stream, next(stream)
+            except StopIteration:
+                return stream, _END_OF_STREAM
+            except BaseException:
+                _close(stream)
+                raise
+
+        def discard(result: Tuple[Iterator[T], Any]) -> None:
+            _close(result[0])
+
+        stream, chunk = self.call(first_chunk, self.first_chunk_latency, discard)
+        if chunk is _END_OF_STREAM:
+            return
+        try:
+            yield chunk
+            yield from stream
+        finally:
+            _close(stream)
+
+
+class _Attempt:
+    """A sync attempt submitted to a worker, timed from when it starts."""
+
+    def __init__(self, executor: ThreadPoolExecutor, attempt: Callable[[], T]):
+        # Carry context variables (e.g. telemetry) over to the worker.
+        context = contextvars.copy_context()
+        self.start = 0.0
+        self.running = threading.Event()
+
+        def run() -> T:
+            self.start = time.monotonic()
+            self.running.set()
+            return context.run(attempt)
+
+        self.future: "Future[Any]" = executor.submit(run)
+
+
+def _discard_later(discard: Callable[[Any], None]) -> Callable[[Future], None]:
+    def callback(future: Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            discard(future.result())
+
+    return callback
+
+
+def _close(stream: Iterator[Any]) -> None:
+    close = getattr(stream, "close", None)
+    if close is not None:
+        close()
+
+
+async def _aclose(stream: AsyncIterator[Any]) -> None:
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        await aclose()
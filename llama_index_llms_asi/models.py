@@ -0,0 +1,58 @@
+"""Metadata of the models served by the ASI API."""
+
+import threading
+from typing import Dict, Optional
+
+# Fallbacks for models missing from the registry.
+DEFAULT_CONTEXT_WINDOW = 128000
+DEFAULT_NUM_OUTPUT = 4096
+
+
+class ModelInfo:
+    """
+    Static limits of an ASI model.
+
+    Args:
+        context_window (int): Total tokens (prompt and reply) the model accepts.
+        num_output (int): Tokens reserved for the reply when `max_tokens` is not
+            set, used when budgeting prompts.
+        is_function_calling_model (bool): Whether the model accepts `tools`.
+    """
+
+    __slots__ = ("context_window", "num_output", "is_function_calling_model")
+
+    def __init__(
+        self,
+        context_window: int = DEFAULT_CONTEXT_WINDOW,
+        num_output: int = DEFAULT_NUM_OUTPUT,
+        is_function_calling_model: bool = False,
+    ) -> None:
+        self.context_window = context_window
+        self.num_output = num_output
+        self.is_function_calling_model = is_function_calling_model
+
+    def __repr__(self) -> str:
+        return (
+            f"ModelInfo(context_window={self.context_window}, "
+            f"num_output={self.num_output}, "
+            f"is_function_calling_model={self.is_function_calling_model})"
+        )
+
+
+_REGISTRY: Dict[str, ModelInfo] = {
+    "asi1-mini": ModelInfo(
+        context_window=128000, num_output=4096, is_function_calling_model=True
+    ),
+}
+_LOCK = threading.Lock()
+
+
+def register_model(name: str, info: ModelInfo) -> None:
+    """Add or replace the metadata of model `name`."""
+    with _LOCK:
+        _REGISTRY[name] = info
+
+
+def get_model_info(name: str) -> Optional[ModelInfo]:
+    """Get the metadata of model `name`, or None if it is unknown."""
+    return _REGISTRY.get(name)
@@ -0,0 +1,388 @@
+"""Persistent cache of parsed nodes and their embeddings for document indexing."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.ingestion import arun_transformations, run_transformations
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import (
+    BaseNode,
+    Document,
+    MetadataMode,
+    NodeRelationship,
+    TransformComponent,
+)
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from llama_index.core.utils import get_tqdm_iterable
+
+VECTORS_FILE = "vectors.npy"
+NODES_FILE = "nodes.db"
+
+# Rows the vector store starts with; it doubles when full.
+_INITIAL_ROWS = 1024
+# Keys per lookup query, below SQLite's limit on bound parameters.
+_QUERY_KEYS = 500
+
+
+class NodeCacheStats:
+    """Counters of a node cache."""
+
+    def __init__(self) -> None:
+        self.documents_reused = 0
+        self.documents_indexed = 0
+        self.documents_removed = 0
+        self.nodes_embedded = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "documents_reused": self.documents_reused,
+            "documents_indexed": self.documents_indexed,
+            "documents_removed": self.documents_removed,
+            "nodes_embedded": self.nodes_embedded,
+        }
+
+
+def _fingerprint(
+    transformations: Sequence[TransformComponent], embed_model: BaseEmbedding
+) -> str:
+    """Hash of the parsing and embedding settings cached nodes depend on."""
+    parts = []
+    for transform in transformations:
+        try:
+            parts.append(transform.to_json())
+        except Exception:
+            parts.append(type(transform).__name__)
+    parts.append(f"{type(embed_model).__name__}:{embed_model.model_name}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class NodeCache:
+    """
+    Content-addressed store of parsed and embedded documents.
+
+    Every document is keyed by a hash of its text and metadata together with
+    the transformations and embedding model, so a document is split and
+    embedded once and loaded from the cache on every later run until it (or
+    the settings) change. Node JSON lives in an SQLite database and vectors
+    in a memory-mapped float32 `vectors.npy` in `path`, so loading an
+    unchanged corpus reads the mapped rows instead of calling the embedding
+    model.
+
+    Documents are matched by content, not id, so documents created with
+    random ids on every run are still found; their nodes are relinked to the
+    document passed in.
+
+    Args:
+        path (str): Directory persisting the cache.
+        embed_model (BaseEmbedding): Model embedding new nodes.
+        transformations (Optional[Sequence[TransformComponent]]): Steps
+            turning a document into nodes. Defaults to a `SentenceSplitter`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embed_model: BaseEmbedding,
+        transformations: Optional[Sequence[TransformComponent]] = None,
+    ) -> None:
+        self.path = path
+        self.embed_model = embed_model
+        self.transformations = list(transformations or [SentenceSplitter()])
+        self.stats = NodeCacheStats()
+        self._fingerprint = _fingerprint(self.transformations, embed_model)
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._size = 0
+        self._free: List[int] = []
+
+        os.makedirs(path, exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            os.path.join(path, NODES_FILE), check_same_thread=False
+        )
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS asi_node_cache ("
+                "row INTEGER PRIMARY KEY, key TEXT NOT NULL, "
+                "position INTEGER NOT NULL, node TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS asi_node_cache_key "
+                "ON asi_node_cache (key, position)"
+            )
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            self._vectors = np.lib.format.open_memmap(vectors_path, mode="r+")
+            rows = {
+                row for (row,) in self._conn.execute("SELECT row FROM asi_node_cache")
+            }
+            # Rows written by an interrupted run were never committed.
+            self._size = max(rows, default=-1) + 1
+            self._free = [i for i in range(self._size) if i not in rows]
+
+    def __len__(self) -> int:
+        """Number of cached documents."""
+        return len(self._keys())
+
+    def document_key(self, document: Document) -> str:
+        """Cache key of `document` under the current settings."""
+        data = f"{self._fingerprint}\n{document.hash}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    # -- Vector storage --
+
+    def _allocate(self, count: int, dim: int) -> List[int]:
+        """Reserve `count` rows, growing the memory map if needed."""
+        rows = self._free[:count]
+        del self._free[: len(rows)]
+        needed = count - len(rows)
+        start = self._size
+        self._size += needed
+        rows.extend(range(start, self._size))
+        capacity = 0 if self._vectors is None else len(self._vectors)
+        if self._size > capacity:
+            self._grow(max(self._size, 2 * capacity, _INITIAL_ROWS), dim)
+        return rows
+
+    def _grow(self, rows: int, dim: int) -> None:
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        tmp_path = vectors_path + ".tmp"
+        vectors = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(rows, dim)
+        )
+        if self._vectors is not None:
+            vectors[: len(self._vectors)] = self._vectors
+        vectors.flush()
+        # Swap in the larger file atomically, then map it in place of the copy.
+        os.replace(tmp_path, vectors_path)
+        self._vectors = np.lib.format.open_memmap(vectors_path, mode="r+")
+
+    def _keys(self) -> List[str]:
+        assert self._conn is not None, "NodeCache is closed."
+        return [
+            key
+            for (key,) in self._conn.execute("SELECT DISTINCT key FROM asi_node_cache")
+        ]
+
+    # -- Lookup --
+
+    def _load(self, documents: Dict[str, Document]) -> Dict[str, List[BaseNode]]:
+        """Cached nodes of the documents keyed in `documents`, where present."""
+        assert self._conn is not None, "NodeCache is closed."
+        keys = list(documents)
+        found: List[Tuple[str, int, str]] = []
+        for i in range(0, len(keys), _QUERY_KEYS):
+            batch = keys[i : i + _QUERY_KEYS]
+            found.extend(
+                self._conn.execute(
+                    "SELECT key, row, node FROM asi_node_cache WHERE key IN "
+                    f"({', '.join('?' * len(batch))}) ORDER BY key, position",
+                    batch,
+                )
+            )
+        if not found:
+            return {}
+        assert self._vectors is not None
+        # One gather from the memory map and one conversion for all rows.
+        embeddings = self._vectors[[row for _, row, _ in found]].tolist()
+        loaded: Dict[str, List[BaseNode]] = {}
+        sources: Dict[str, Any] = {}
+        for (key, _, data), embedding in zip(found, embeddings):
+            if key not in sources:
+                sources[key] = documents[key].as_related_node_info()
+            node = json_to_doc(json.loads(data))
+            node.embedding = embedding
+            node.relationships[NodeRelationship.SOURCE] = sources[key]
+            loaded.setdefault(key, []).append(node)
+        return loaded
+
+    def _plan(
+        self, documents: Sequence[Document], prune: bool
+    ) -> Tuple[List[Tuple[str, Document]], Dict[str, List[BaseNode]]]:
+        """Split `documents` into new ones and nodes loaded from the cache."""
+        # Identical content yields identical nodes, so keep one of each.
+        unique: Dict[str, Document] = {}
+        for document in documents:
+            unique.setdefault(self.document_key(document), document)
+        cached = self._load(unique)
+        new = [(key, doc) for key, doc in unique.items() if key not in cached]
+        if prune:
+            # Before storing new nodes, so they can take the freed rows.
+            self._prune(set(unique))
+        return new, cached
+
+    def _store(
+        self,
+        new: List[Tuple[str, Document]],
+        parsed: List[List[BaseNode]],
+        embeddings: List[List[float]],
+    ) -> Dict[str, List[BaseNode]]:
+        """Persist the nodes parsed from each new document, in order."""
+        by_key: Dict[str, List[BaseNode]] = {}
+        owners: List[str] = []
+        for (key, _), nodes in zip(new, parsed):
+            by_key[key] = list(nodes)
+            owners.extend([key] * len(nodes))
+        nodes = [node for key_nodes in parsed for node in key_nodes]
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        if not nodes:
+            return by_key
+        assert self._conn is not None, "NodeCache is closed."
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        records = []
+        with self._lock:
+            rows = self._allocate(len(nodes), vectors.shape[1])
+            assert self._vectors is not None
+            if vectors.shape[1] != self._vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"the cache ({self._vectors.shape[1]})."
+                )
+            self._vectors[rows] = vectors
+            # Vectors reach the disk before the rows that point at them.
+            self._vectors.flush()
+            positions: Dict[str, int] = {}
+            for row, node, key in zip(rows, nodes, owners):
+                position = positions.get(key, 0)
+                positions[key] = position + 1
+                data = doc_to_json(node)
+                data["__data__"] = {**data["__data__"], "embedding": None}
+                records.append((row, key, position, json.dumps(data)))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO asi_node_cache (row, key, position, node) "
+                    "VALUES (?, ?, ?, ?)",
+                    records,
+                )
+        return by_key
+
+    def _prune(self, keep: Set[str]) -> None:
+        assert self._conn is not None, "NodeCache is closed."
+        stale = set(self._keys()) - keep
+        if not stale:
+            return
+        with self._lock, self._conn:
+            for key in stale:
+                rows = self._conn.execute(
+                    "SELECT row FROM asi_node_cache WHERE key = ?", (key,)
+                ).fetchall()
+                self._free.extend(row for (row,) in rows)
+                self._conn.execute("DELETE FROM asi_node_cache WHERE key = ?", (key,))
+        self.stats.documents_removed += len(stale)
+
+    def _finish(
+        self,
+        documents: Sequence[Document],
+        new: List[Tuple[str, Document]],
+        cached: Dict[str, List[BaseNode]],
+        stored: Dict[str, List[BaseNode]],
+    ) -> List[BaseNode]:
+        self.stats.documents_reused += len(cached)
+        self.stats.documents_indexed += len(new)
+        by_key = {**cached, **stored}
+        keys = dict.fromkeys(self.document_key(document) for document in documents)
+        nodes: List[BaseNode] = []
+        for key in keys:
+            nodes.extend(by_key[key])
+        return nodes
+
+    def _embed_texts(self, nodes: Sequence[BaseNode]) -> List[str]:
+        return [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+
+    def get_nodes(
+        self,
+        documents: Sequence[Document],
+        prune: bool = True,
+        show_progress: bool = False,
+    ) -> List[BaseNode]:
+        """
+        Get the embedded nodes of `documents`, parsing only uncached ones.
+
+        Args:
+            documents (Sequence[Document]): The corpus.
+            prune (bool): Drop cached documents that are not in `documents`
+                (e.g. old versions of changed documents). Defaults to True.
+            show_progress (bool): Show progress of parsing and embedding.
+
+        Returns:
+            List[BaseNode]: Nodes with embeddings, in document order.
+        """
+        new, cached = self._plan(documents, prune)
+        # Documents are parsed one at a time so every node is attributed to
+        # its document, whatever ids or relationships the nodes carry.
+        parsed = [
+            run_transformations([document], self.transformations)
+            for _, document in get_tqdm_iterable(new, show_progress, "Parsing")
+        ]
+        embeddings: List[List[float]] = []
+        if new:
+            texts = [text for nodes in parsed for text in self._embed_texts(nodes)]
+            embeddings = self.embed_model.get_text_embedding_batch(
+                texts, show_progress=show_progress
+            )
+            self.stats.nodes_embedded += len(texts)
+        stored = self._store(new, parsed, embeddings)
+        return self._finish(documents, new, cached, stored)
+
+    async def aget_nodes(
+        self,
+        documents: Sequence[Document],
+        prune: bool = True,
+        show_progress: bool = False,
+    ) -> List[BaseNode]:
+        """Async version of `get_nodes`."""
+        new, cached = self._plan(documents, prune)
+        parsed = [
+            await arun_transformations([document], self.transformations)
+            for _, document in get_tqdm_iterable(new, show_progress, "Parsing")
+        ]
+        embeddings: List[List[float]] = []
+        if new:
+            texts = [text for nodes in parsed for text in self._embed_texts(nodes)]
+            embeddings = await self.embed_model.aget_text_embedding_batch(
+                texts, show_progress=show_progress
+            )
+            self.stats.nodes_embedded += len(texts)
+        stored = self._store(new, parsed, embeddings)
+        return self._finish(documents, new, cached, stored)
+
+    def build_index(
+        self,
+        documents: Sequence[Document],
+        prune: bool = True,
+        show_progress: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Build a `VectorStoreIndex` of `documents` from cached embeddings.
+
+        Args:
+            documents (Sequence[Document]): The corpus.
+            prune (bool): See `get_nodes`.
+            show_progress (bool): Show progress of parsing and embedding.
+            **kwargs: Passed on to `VectorStoreIndex`.
+
+        Returns:
+            VectorStoreIndex: An index over the nodes of `documents`.
+        """
+        from llama_index.core.indices.vector_store import VectorStoreIndex
+
+        nodes = self.get_nodes(documents, prune=prune, show_progress=show_progress)
+        kwargs.setdefault("embed_model", self.embed_model)
+        return VectorStoreIndex(nodes, show_progress=show_progress, **kwargs)
+
+    def close(self) -> None:
+        """Flush the vectors to disk and close the database."""
+        with self._lock:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,250 @@
+"""Process-wide HTTP connection pooling for ASI clients."""
+
+import asyncio
+import atexit
+import hashlib
+import os
+import threading
+import weakref
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+PoolKey = Tuple[str, str, int, int, float, bool]
+_LoopTransports = Dict[PoolKey, httpx.AsyncHTTPTransport]
+
+# Closers inherited through fork, kept alive so they are never finalized.
+_INHERITED: List[AsyncGenerator[None, None]] = []
+
+
+def make_pool_key(
+    api_base: str,
+    api_key: Optional[str],
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+    http2: bool = False,
+) -> PoolKey:
+    """
+    Build the key under which a pooled transport is shared.
+
+    The API key is hashed so that raw credentials are never kept around as
+    dictionary keys.
+    """
+    key_digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return (
+        api_base.rstrip("/"),
+        key_digest,
+        max_connections,
+        max_keepalive_connections,
+        keepalive_expiry,
+        http2,
+    )
+
+
+class _SharedTransport(httpx.BaseTransport):
+    """Sync transport view that never closes the pooled transport it wraps."""
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._transport.handle_request(request)
+
+    def close(self) -> None:
+        # Closing is owned by the pool, see `ConnectionPool.close`.
+        pass
+
+
+class _SharedAsyncTransport(httpx.AsyncBaseTransport):
+    """Async transport view that never closes the pooled transport it wraps."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def _close_with_loop(transports: _LoopTransports) -> AsyncGenerator[None, None]:
+    """
+    Close a loop's transports when the loop finalizes this generator.
+
+    Started on creation and parked at its `yield`, it is closed by
+    `loop.shutdown_asyncgens()` (which `asyncio.run` calls before closing the
+    loop), or when the pool is closed, so connections are closed on the loop
+    that owns them.
+    """
+    try:
+        yield
+    finally:
+        for transport in list(transports.values()):
+            await transport.aclose()
+        transports.clear()
+
+
+def _start(closer: AsyncGenerator[None, None]) -> None:
+    """Run `closer` to its `yield`, registering it with the running loop."""
+    try:
+        closer.__anext__().send(None)
+    except StopIteration:
+        pass
+
+
+class ConnectionPool:
+    """
+    Registry of keep-alive HTTP transports shared by every ASI instance.
+
+    Sync transports are shared process-wide. Async transports are bound to the
+    event loop they were created on, so they are additionally keyed by the
+    running loop and closed on that loop when it shuts down. A forked child
+    process starts with an empty pool rather than sharing its parent's sockets.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._transports: Dict[PoolKey, httpx.HTTPTransport] = {}
+        self._async_transports: "weakref.WeakKeyDictionary[Any, _LoopTransports]"
+        self._async_transports = weakref.WeakKeyDictionary()
+        self._async_closers: "weakref.WeakKeyDictionary[Any, AsyncGenerator]"
+        self._async_closers = weakref.WeakKeyDictionary()
+
+    def _check_pid(self) -> None:
+        # Inherited connections belong to the parent; they are dropped, not
+        # closed, since closing a TLS connection would end the parent's session.
+        # The lock is replaced too, as a thread of the parent may have held it.
+        if self._pid != os.getpid():
+            # Unfinished closers would be finalized on the parent's loops.
+            _INHERITED.extend(self._async_closers.values())
+            self._reset()
+
+    @staticmethod
+    def _limits(key: PoolKey) -> httpx.Limits:
+        _, _, max_connections, max_keepalive_connections, keepalive_expiry, _ = key
+        return httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+
+    def get_transport(self, key: PoolKey) -> httpx.BaseTransport:
+        """Get a non-closing view of the pooled sync transport for `key`."""
+        self._check_pid()
+        with self._lock:
+            transport = self._transports.get(key)
+            if transport is None:
+                transport = httpx.HTTPTransport(limits=self._limits(key), http2=key[5])
+                self._transports[key] = transport
+        return _SharedTransport(transport)
+
+    def get_async_transport(self, key: PoolKey) -> httpx.AsyncBaseTransport:
+        """Get a non-closing view of the pooled async transport for `key`."""
+        loop = asyncio.get_running_loop()
+        self._check_pid()
+        with self._lock:
+            transports = self._async_transports.get(loop)
+            if transports is None:
+                transports = self._async_transports[loop] = {}
+                closer = self._async_closers[loop] = _close_with_loop(transports)
+                _start(closer)
+            transport = transports.get(key)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(
+                    limits=self._limits(key), http2=key[5]
+                )
+                transports[key] = transport
+        return _SharedAsyncTransport(transport)
+
+    def get_http_client(self, key: PoolKey, **kwargs: Any) -> httpx.Client:
+        """Build a lightweight `httpx.Client` on top of the pooled transport."""
+        kwargs.setdefault("follow_redirects", True)
+        return httpx.Client(transport=self.get_transport(key), **kwargs)
+
+    def get_async_http_client(self, key: PoolKey, **kwargs: Any) -> httpx.AsyncClient:
+        """Build a lightweight `httpx.AsyncClient` on top of the pooled transport."""
+        kwargs.setdefault("follow_redirects", True)
+        return httpx.AsyncClient(transport=self.get_async_transport(key), **kwargs)
+
+    def close(self) -> None:
+        """
+        Close all pooled sync transports and the async ones of live loops.
+
+        Async transports are closed on their own loop: right away if it is
+        idle, and as a task scheduled on it if it is running. Those of closed
+        loops were closed when the loop shut down.
+        """
+        self._check_pid()
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+            closers = list(self._async_closers.items())
+            self._async_transports = weakref.WeakKeyDictionary()
+            self._async_closers = weakref.WeakKeyDictionary()
+        for transport in transports:
+            transport.close()
+        for loop, closer in closers:
+            _close_on(loop, closer)
+
+    async def aclose(self) -> None:
+        """Close all pooled transports, waiting for those of the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._async_transports.pop(loop, None)
+            closer = self._async_closers.pop(loop, None)
+        if closer is not None:
+            await closer.aclose()
+        self.close()
+
+
+def _close_on(loop: asyncio.AbstractEventLoop, closer: AsyncGenerator) -> None:
+    """Finalize `closer` on `loop`, from any thread."""
+    if loop.is_closed():
+        # The loop closed without finalizing its async generators: close the
+        # connection pools as far as possible without it.
+        try:
+            closer.aclose().send(None)
+        except Exception:
+            pass
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        loop.create_task(closer.aclose())
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(closer.aclose(), loop)
+    else:
+        loop.run_until_complete(closer.aclose())
+
+
+_POOL = ConnectionPool()
+
+
+def get_connection_pool() -> ConnectionPool:
+    """Get the process-wide connection pool."""
+    return _POOL
+
+
+def close_connection_pool() -> None:
+    """Close every pooled connection. Safe to call more than once."""
+    _POOL.close()
+
+
+async def aclose_connection_pool() -> None:
+    """Close every pooled connection from within a running event loop."""
+    await _POOL.aclose()
+
+
+atexit.register(close_connection_pool)
@@ -0,0 +1,309 @@
+"""Speculative background prefetching of likely follow-up requests."""
+
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import httpx
+
+from llama_index_llms_asi.balancer import _AsyncReleasingStream, _ReleasingStream
+from llama_index_llms_asi.cache import CacheEntry, InMemoryCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_TTL = 60.0
+DEFAULT_PREFETCH_CACHE_SIZE = 256
+DEFAULT_MAX_PENDING = 64
+
+# Set in prefetch workers, so transports can tell background requests apart.
+_BACKGROUND: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "asi_background", default=False
+)
+
+
+def in_background() -> bool:
+    """Whether the current code runs in a prefetch worker."""
+    return _BACKGROUND.get()
+
+
+class PriorityGate:
+    """
+    Keeps background requests from running alongside foreground ones.
+
+    Foreground requests never wait; background requests wait until no
+    foreground request is in flight. `PriorityTransport` marks foreground
+    requests on the clients ASI builds; `hold`/`stream`/`astream` mark them
+    around calls made through clients it does not control.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._foreground = 0
+
+    @property
+    def foreground(self) -> int:
+        """Number of foreground requests in flight."""
+        return self._foreground
+
+    def begin(self) -> None:
+        with self._condition:
+            self._foreground += 1
+
+    def end(self) -> None:
+        with self._condition:
+            self._foreground -= 1
+            if not self._foreground:
+                self._condition.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no foreground request is in flight."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._foreground, timeout)
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        """Count the block as a foreground request."""
+        self.begin()
+        try:
+            yield
+        finally:
+            self.end()
+
+    def stream(self, stream: Iterator[Any]) -> Generator[Any, None, None]:
+        """Count `stream` as a foreground request from first item to end."""
+        with self.hold():
+            yield from stream
+
+    async def astream(self, stream: AsyncIterator[Any]) -> AsyncGenerator[Any, None]:
+        """Async version of `stream`."""
+        with self.hold():
+            async for item in stream:
+                yield item
+
+
+class PriorityTransport(httpx.BaseTransport):
+    """
+    Holds background requests back while foreground requests are in flight.
+
+    A foreground request counts as in flight until its response is closed,
+    so streamed replies keep background traffic off the connection pool
+    until their last chunk.
+
+    Args:
+        transport (httpx.BaseTransport): The transport sending requests.
+        gate (PriorityGate): The gate shared by all clients of an ASI instance.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, gate: PriorityGate) -> None:
+        self._transport = transport
+        self._gate = gate
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if _BACKGROUND.get():
+            self._gate.wait_idle()
+            return self._transport.handle_request(request)
+        self._gate.begin()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._gate.end()
+            raise
+        if response.is_closed:
+            self._gate.end()
+        else:
+            response.stream = _ReleasingStream(response.stream, self._gate.end)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncPriorityTransport(httpx.AsyncBaseTransport):
+    """
+    Async version of `PriorityTransport`.
+
+    Prefetches run on worker threads with the sync client, so async requests
+    are always foreground and only mark the gate busy.
+    """
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, gate: PriorityGate
+    ) -> None:
+        self._transport = transport
+        self._gate = gate
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._gate.begin()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._gate.end()
+            raise
+        if response.is_closed:
+            self._gate.end()
+        else:
+            response.stream = _AsyncReleasingStream(response.stream, self._gate.end)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class PrefetchStats:
+    """Thread-safe counters of a prefetcher."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def record(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+# (priority, -sequence, deadline, key, fn): lower priorities run first and,
+# within a priority, the newest job, whose conversation is most likely to
+# continue.
+_Job = Tuple[int, int, float, str, Callable[[], CacheEntry]]
+
+
+class Prefetcher:
+    """
+    Runs speculative requests on background threads, caching their results.
+
+    Jobs wait in a priority queue and each runs only once no foreground
+    request is in flight (see `PriorityTransport`). Jobs not started within
+    `ttl` are dropped, as are the lowest-priority jobs beyond `max_pending`.
+
+    Args:
+        ttl (float): Seconds a prefetched result (or a queued job) stays valid.
+        max_size (int): Maximum number of prefetched results kept.
+        max_workers (int): Number of background threads.
+        max_pending (int): Maximum number of queued jobs.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_PREFETCH_TTL,
+        max_size: int = DEFAULT_PREFETCH_CACHE_SIZE,
+        max_workers: int = 1,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.cache = InMemoryCache(max_size=max_size, ttl=ttl)
+        self.gate = PriorityGate()
+        self.stats = PrefetchStats()
+        self._condition = threading.Condition()
+        self._queue: List[_Job] = []
+        self._keys: Set[str] = set()
+        self._sequence = itertools.count()
+        self._workers: List[threading.Thread] = []
+        self._closed = False
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Look up a prefetched result, recording a hit or a miss."""
+        return self.cache.get(key)
+
+    def schedule(
+        self, key: str, fn: Callable[[], CacheEntry], priority: int = 0
+    ) -> bool:
+        """
+        Queue `fn` to compute the entry of `key` in the background.
+
+        Returns False if `key` is already prefetched or queued.
+        """
+        with self._condition:
+            if self._closed or key in self._keys or self.cache._get(key) is not None:
+                return False
+            job = (priority, -next(self._sequence), time.monotonic() + self.ttl)
+            heapq.heappush(self._queue, (*job, key, fn))
+            self._keys.add(key)
+            if len(self._queue) > self.max_pending:
+                worst = max(self._queue)
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                self._keys.discard(worst[3])
+                self.stats.record("dropped")
+            self._ensure_workers()
+            self._condition.notify()
+        self.stats.record("scheduled")
+        return True
+
+    def _ensure_workers(self) -> None:
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._work, name="asi-prefetch", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_job(self) -> Optional[_Job]:
+        with self._condition:
+            while True:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return None
+                job = heapq.heappop(self._queue)
+                if job[2] >= time.monotonic():
+                    return job
+                self._keys.discard(job[3])
+                self.stats.record("dropped")
+
+    def _work(self) -> None:
+        _BACKGROUND.set(True)
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            key, fn = job[3], job[4]
+            # Yield to foreground traffic before spending a request.
+            self.gate.wait_idle()
+            try:
+                self.cache.set(key, fn())
+                self.stats.record("completed")
+            except Exception:
+                logger.debug("Prefetch failed.", exc_info=True)
+                self.stats.record("failed")
+            finally:
+                with self._condition:
+                    self._keys.discard(key)
+
+    def close(self) -> None:
+        """Drop queued jobs and stop the workers once their current job ends."""
+        with self._condition:
+            self._closed = True
+            self._queue.clear()
+            self._keys.clear()
+            self._condition.notify_all()
@@ -0,0 +1,162 @@
+"""Running ASI requests from a pool of worker processes."""
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional, Sequence
+
+from llama_index.core.base.llms.types import ChatMessage
+
+from llama_index_llms_asi.batch import DEFAULT_BATCH_CONCURRENCY, BatchResult
+
+if TYPE_CHECKING:
+    from llama_index_llms_asi.asi import ASI
+
+DEFAULT_CHUNK_SIZE = 16
+
+# The ASI instance of a worker process. It is unpickled once per worker and
+# reused by every chunk, so its connection pool stays warm.
+_WORKER_LLM: Optional["ASI"] = None
+
+
+def _init_worker(llm: "ASI") -> None:
+    global _WORKER_LLM
+    _WORKER_LLM = llm
+
+
+def _portable(result: BatchResult) -> BatchResult:
+    # SDK exceptions often cannot be rebuilt from their pickle.
+    if result.error is not None:
+        try:
+            pickle.loads(pickle.dumps(result.error))
+        except Exception:
+            result.error = RuntimeError(
+                f"{type(result.error).__name__}: {result.error}"
+            )
+    return result
+
+
+def _run_chunk(
+    method: str, start: int, items: List[Any], max_concurrency: int, kwargs: Any
+) -> List[BatchResult]:
+    assert _WORKER_LLM is not None, "Worker was not initialized."
+    results = getattr(_WORKER_LLM, method)(items, max_concurrency, **kwargs)
+    for result in results:
+        result.index += start
+    return [_portable(result) for result in results]
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map(
+    method: str,
+    llm: "ASI",
+    items: Iterable[Any],
+    processes: Optional[int],
+    chunk_size: int,
+    max_concurrency: int,
+    mp_context: Any,
+    kwargs: Any,
+) -> Iterator[BatchResult]:
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(llm,),
+    ) as executor:
+        chunks = _chunks(items, chunk_size)
+        futures = [
+            executor.submit(
+                _run_chunk, method, i * chunk_size, chunk, max_concurrency, kwargs
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+        for future in futures:
+            yield from future.result()
+
+
+def map_complete(
+    llm: "ASI",
+    prompts: Iterable[str],
+    processes: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    mp_context: Any = None,
+    **kwargs: Any,
+) -> List[BatchResult]:
+    """
+    Complete `prompts` across a pool of worker processes.
+
+    `llm` is pickled once per worker as its configuration, and every worker
+    sends its chunks of prompts concurrently through one rebuilt instance,
+    reusing that process's keep-alive connections. Rate limits apply per
+    process, so divide `requests_per_minute` by the number of processes.
+    The workers run without the `scheduler`, `telemetry` and `rate_limiter`
+    of `llm`, which hold per-process state and are not pickled (a warning
+    is logged). Caches are shared through their `path`; in-memory caches
+    start empty in each worker.
+
+    Args:
+        llm (ASI): The LLM to replicate into the workers.
+        prompts (Iterable[str]): The prompts.
+        processes (Optional[int]): Number of worker processes. Defaults to the
+            number of CPUs.
+        chunk_size (int): Prompts handed to a worker at a time.
+        max_concurrency (int): Requests in flight per worker.
+        mp_context (Any): A `multiprocessing` context, e.g. to use "spawn".
+        **kwargs (Any): Passed on to `complete`.
+
+    Returns:
+        List[BatchResult]: One result per prompt, in input order. Errors that
+        cannot cross processes are reported as `RuntimeError`s.
+    """
+    return list(
+        _map(
+            "batch_complete",
+            llm,
+            prompts,
+            processes,
+            chunk_size,
+            max_concurrency,
+            mp_context,
+            kwargs,
+        )
+    )
+
+
+def map_chat(
+    llm: "ASI",
+    message_lists: Iterable[Sequence[ChatMessage]],
+    processes: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    mp_context: Any = None,
+    **kwargs: Any,
+) -> List[BatchResult]:
+    """
+    Chat version of `map_complete`, taking one message list per request.
+
+    As with `map_complete`, the `scheduler`, `telemetry` and `rate_limiter`
+    of `llm` are not carried into the workers.
+    """
+    return list(
+        _map(
+            "batch_chat",
+            llm,
+            message_lists,
+            processes,
+            chunk_size,
+            max_concurrency,
+            mp_context,
+            kwargs,
+        )
+    )
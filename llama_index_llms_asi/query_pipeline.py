@@ -0,0 +1,319 @@
+"""
+Pipelined async RAG queries over an ASI model.
+
+Running a list of queries through a query engine one at a time leaves the
+network idle twice per query: while the retriever embeds and searches, no
+tokens are generated, and while the answer streams in, nothing is
+retrieved. Here retrieval and generation are separate stages connected by a
+bounded queue, so retrieval for the next queries runs while earlier answers
+are still streaming, and up to `max_concurrency` answers stream at once.
+"""
+
+import asyncio
+import time
+from typing import (
+    TYPE_CHECKING,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.llms.types import ChatMessage
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.prompts import BasePromptTemplate
+from llama_index.core.prompts.default_prompts import DEFAULT_TEXT_QA_PROMPT
+from llama_index.core.schema import MetadataMode, NodeWithScore
+
+if TYPE_CHECKING:
+    from llama_index_llms_asi.asi import ASI
+
+DEFAULT_QUERY_CONCURRENCY = 4
+
+
+class QueryResult:
+    """
+    Answer to one query of a pipelined run, with per-stage timings.
+
+    Args:
+        index (int): Position of the query in the input.
+        query (str): The query.
+        response (str): The generated answer ("" if the query failed).
+        source_nodes (List[NodeWithScore]): Nodes the answer was based on.
+        error (Optional[BaseException]): The exception raised by retrieval
+            or generation, if either failed.
+        queue_time (float): Seconds between the start of the run and the
+            start of retrieval.
+        retrieve_time (float): Seconds spent retrieving and postprocessing.
+        wait_time (float): Seconds the retrieved nodes waited for a
+            generation slot.
+        first_token_time (Optional[float]): Seconds from the start of
+            generation to the first streamed token.
+        generate_time (float): Seconds spent generating the answer.
+    """
+
+    __slots__ = (
+        "index",
+        "query",
+        "response",
+        "source_nodes",
+        "error",
+        "queue_time",
+        "retrieve_time",
+        "wait_time",
+        "first_token_time",
+        "generate_time",
+    )
+
+    def __init__(self, index: int, query: str) -> None:
+        self.index = index
+        self.query = query
+        self.response = ""
+        self.source_nodes: List[NodeWithScore] = []
+        self.error: Optional[BaseException] = None
+        self.queue_time = 0.0
+        self.retrieve_time = 0.0
+        self.wait_time = 0.0
+        self.first_token_time: Optional[float] = None
+        self.generate_time = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """Whether the query was answered."""
+        return self.error is None
+
+    @property
+    def total_time(self) -> float:
+        """Seconds from the start of the run until the answer was complete."""
+        return (
+            self.queue_time + self.retrieve_time + self.wait_time + self.generate_time
+        )
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        """Per-stage timings, e.g. for logging."""
+        return {
+            "queue": self.queue_time,
+            "retrieve": self.retrieve_time,
+            "wait": self.wait_time,
+            "first_token": self.first_token_time,
+            "generate": self.generate_time,
+            "total": self.total_time,
+        }
+
+    def __str__(self) -> str:
+        return self.response
+
+    def __repr__(self) -> str:
+        if self.error is not None:
+            return f"QueryResult(index={self.index}, error={self.error!r})"
+        return f"QueryResult(index={self.index}, response={self.response!r})"
+
+
+def _context_str(nodes: Sequence[NodeWithScore]) -> str:
+    return "\n\n".join(
+        node.node.get_content(metadata_mode=MetadataMode.LLM) for node in nodes
+    )
+
+
+async def aiter_queries(
+    llm: "ASI",
+    retriever: BaseRetriever,
+    queries: Iterable[str],
+    max_concurrency: int = DEFAULT_QUERY_CONCURRENCY,
+    retrieval_concurrency: Optional[int] = None,
+    ordered: bool = False,
+    node_postprocessors: Sequence[BaseNodePostprocessor] = (),
+    text_qa_template: Optional[BasePromptTemplate] = None,
+    on_delta: Optional[Callable[[int, str], None]] = None,
+) -> AsyncGenerator[QueryResult, None]:
+    """
+    Answer `queries` from `retriever`, overlapping retrieval and generation.
+
+    Retrieved nodes are postprocessed, packed into the prompt budget of
+    `llm` with `pack_nodes`, and answered with `astream_chat`. At most
+    `max_concurrency` answers stream at once, and retrieval runs at most
+    `max_concurrency` queries ahead of generation, so a slow model never
+    builds up an unbounded backlog of retrieved nodes.
+
+    Args:
+        llm (ASI): The model answering the queries.
+        retriever (BaseRetriever): Retriever queried with `aretrieve`.
+        queries (Iterable[str]): Queries, pulled lazily.
+        max_concurrency (int): Maximum answers generated at once.
+        retrieval_concurrency (Optional[int]): Maximum retrievals at once.
+            Defaults to `max_concurrency`.
+        ordered (bool): Yield results in input order instead of as they
+            finish.
+        node_postprocessors (Sequence[BaseNodePostprocessor]): Applied to
+            the retrieved nodes, in order.
+        text_qa_template (Optional[BasePromptTemplate]): Prompt with
+            `context_str` and `query_str` variables. Defaults to the
+            LlamaIndex question-answering prompt.
+        on_delta (Optional[Callable[[int, str], None]]): Called with the
+            query index and each streamed text delta.
+
+    Yields:
+        QueryResult: One per query. Failures are reported on the result
+        instead of aborting the run.
+    """
+    if max_concurrency <= 0:
+        raise ValueError("max_concurrency must be positive.")
+    retrieval_concurrency = retrieval_concurrency or max_concurrency
+    template = text_qa_template or DEFAULT_TEXT_QA_PROMPT
+    start = time.perf_counter()
+    pending = enumerate(queries)
+    # Bounded, so retrieval stays at most `max_concurrency` queries ahead.
+    retrieved: "asyncio.Queue[Optional[Tuple[QueryResult, float]]]" = asyncio.Queue(
+        max_concurrency
+    )
+    done: "asyncio.Queue[Optional[QueryResult]]" = asyncio.Queue()
+
+    async def retrieve_worker() -> None:
+        # The enumerate iterator is shared, so each query is taken exactly once.
+        for index, query in pending:
+            result = QueryResult(index, query)
+            began = time.perf_counter()
+            result.queue_time = began - start
+            try:
+                nodes = await retriever.aretrieve(query)
+                for postprocessor in node_postprocessors:
+                    nodes = postprocessor.postprocess_nodes(nodes, query_str=query)
+                result.source_nodes = nodes
+            except Exception as e:
+                result.error = e
+            finished = time.perf_counter()
+            result.retrieve_time = finished - began
+            if result.error is not None:
+                done.put_nowait(result)
+            else:
+                await retrieved.put((result, finished))
+
+    async def generate(result: QueryResult) -> None:
+        prompt = template.format_messages(context_str="", query_str=result.query)
+        result.source_nodes = llm.pack_nodes(result.source_nodes, prompt)
+        messages: List[ChatMessage] = template.format_messages(
+            context_str=_context_str(result.source_nodes), query_str=result.query
+        )
+        began = time.perf_counter()
+        parts = []
+        async for chunk in await llm.astream_chat(messages):
+            delta = chunk.delta or ""
+            if delta and result.first_token_time is None:
+                result.first_token_time = time.perf_counter() - began
+            parts.append(delta)
+            if on_delta is not None and delta:
+                on_delta(result.index, delta)
+        result.response = "".join(parts)
+
+    async def generate_worker() -> None:
+        while True:
+            item = await retrieved.get()
+            if item is None:
+                break
+            result, retrieved_at = item
+            began = time.perf_counter()
+            result.wait_time = began - retrieved_at
+            try:
+                await generate(result)
+            except Exception as e:
+                result.error = e
+            result.generate_time = time.perf_counter() - began
+            done.put_nowait(result)
+
+    async def retrieve_stage() -> None:
+        try:
+            await asyncio.gather(
+                *(retrieve_worker() for _ in range(retrieval_concurrency))
+            )
+        finally:
+            for _ in range(max_concurrency):
+                await retrieved.put(None)
+
+    async def run() -> None:
+        try:
+            await asyncio.gather(
+                retrieve_stage(),
+                *(generate_worker() for _ in range(max_concurrency)),
+            )
+        finally:
+            done.put_nowait(None)
+
+    runner = asyncio.ensure_future(run())
+    buffered: Dict[int, QueryResult] = {}
+    next_index = 0
+    try:
+        while True:
+            result = await done.get()
+            if result is None:
+                break
+            if not ordered:
+                yield result
+                continue
+            buffered[result.index] = result
+            while next_index in buffered:
+                yield buffered.pop(next_index)
+                next_index += 1
+        # Surface unexpected failures of the pipeline itself.
+        await runner
+    finally:
+        if not runner.done():
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+
+
+async def arun_queries(
+    llm: "ASI",
+    retriever: BaseRetriever,
+    queries: Iterable[str],
+    max_concurrency: int = DEFAULT_QUERY_CONCURRENCY,
+    retrieval_concurrency: Optional[int] = None,
+    node_postprocessors: Sequence[BaseNodePostprocessor] = (),
+    text_qa_template: Optional[BasePromptTemplate] = None,
+    on_delta: Optional[Callable[[int, str], None]] = None,
+) -> List[QueryResult]:
+    """Run `aiter_queries` and return the results in input order."""
+    return [
+        result
+        async for result in aiter_queries(
+            llm,
+            retriever,
+            queries,
+            max_concurrency,
+            retrieval_concurrency,
+            True,
+            node_postprocessors,
+            text_qa_template,
+            on_delta,
+        )
+    ]
+
+
+def run_queries(
+    llm: "ASI",
+    retriever: BaseRetriever,
+    queries: Iterable[str],
+    max_concurrency: int = DEFAULT_QUERY_CONCURRENCY,
+    retrieval_concurrency: Optional[int] = None,
+    node_postprocessors: Sequence[BaseNodePostprocessor] = (),
+    text_qa_template: Optional[BasePromptTemplate] = None,
+    on_delta: Optional[Callable[[int, str], None]] = None,
+) -> List[QueryResult]:
+    """Synchronous version of `arun_queries`."""
+    return asyncio_run(
+        arun_queries(
+            llm,
+            retriever,
+            queries,
+            max_concurrency,
+            retrieval_concurrency,
+            node_postprocessors,
+            text_qa_template,
+            on_delta,
+        )
+    )
@@ -0,0 +1,371 @@
+"""Client-side adaptive rate limiting for ASI requests."""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Hashable, Optional
+
+import httpx
+from llama_index.core.rate_limiter import BaseRateLimiter
+
+from llama_index_llms_asi.wire import request_body
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPLETION_TOKENS_ESTIMATE = 256
+DEFAULT_BACKOFF = 1.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a rate-limit duration header into seconds.
+
+    Accepts plain seconds ("1.5") as well as the "6m0s"/"20ms" format used by
+    OpenAI-compatible `x-ratelimit-reset-*` headers.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: httpx.Headers) -> Optional[float]:
+    """Get the server requested back-off in seconds, if any."""
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+def estimate_request_tokens(content: bytes) -> int:
+    """
+    Estimate the tokens a chat/completion request will consume.
+
+    Uses roughly four bytes per prompt token plus the requested completion
+    budget, which errs on the side of over-reserving.
+    """
+    completion_tokens = DEFAULT_COMPLETION_TOKENS_ESTIMATE
+    try:
+        body = json.loads(content)
+    except ValueError:
+        body = None
+    if isinstance(body, dict):
+        completion_tokens = (
+            body.get("max_completion_tokens")
+            or body.get("max_tokens")
+            or completion_tokens
+        )
+    return len(content) // 4 + int(completion_tokens)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of blocking.
+
+    Reservations may drive the level negative; the caller then waits until
+    the debt has been refilled. This keeps the lock short and works the same
+    for threads and coroutines.
+    """
+
+    def __init__(self, rate_per_minute: float) -> None:
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive.")
+        self.rate_per_minute = rate_per_minute
+        self._level = rate_per_minute
+        self._updated_at = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return self.rate_per_minute
+
+    def _refill(self, now: float, scale: float) -> None:
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        rate_per_second = self.rate_per_minute * scale / 60.0
+        self._level = min(self.capacity, self._level + elapsed * rate_per_second)
+
+    def reserve(self, amount: float, now: float, scale: float = 1.0) -> float:
+        """Take `amount` and return the seconds to wait before using it."""
+        self._refill(now, scale)
+        self._level -= amount
+        if self._level >= 0:
+            return 0.0
+        return -self._level / (self.rate_per_minute * scale / 60.0)
+
+    def set_rate(self, rate_per_minute: float, now: float, scale: float = 1.0) -> None:
+        """Change the rate, keeping the current level (capped to the new rate)."""
+        self._refill(now, scale)
+        self.rate_per_minute = rate_per_minute
+        self._level = min(self._level, self.capacity)
+
+    def clamp(self, remaining: float, now: float, scale: float = 1.0) -> None:
+        """Never hold more than the server reports as remaining."""
+        self._refill(now, scale)
+        self._level = min(self._level, remaining)
+
+
+class AdaptiveRateLimiter(BaseRateLimiter):
+    """
+    Adaptive limiter for requests and tokens per minute.
+
+    Refill rates are scaled with AIMD: every successful response raises the
+    scale additively, every rate-limited response cuts it multiplicatively and
+    pauses all callers until the server's `Retry-After` (plus jitter) has
+    passed. `x-ratelimit-remaining-*` headers clamp the local buckets so the
+    client never believes it has more quota than the server.
+
+    ASI applies the limiter per HTTP attempt, which also covers the retries of
+    the OpenAI client, so it should not be passed as the LLM's `rate_limiter`
+    as well.
+
+    Args:
+        requests_per_minute (Optional[float]): Request quota. None disables
+            request limiting.
+        tokens_per_minute (Optional[float]): Token quota. None disables token
+            limiting.
+        min_scale (float): Lowest fraction of the quota the limiter backs off
+            to. Defaults to 0.1.
+        increase_step (float): Additive scale increase per success.
+            Defaults to 0.02.
+        decrease_factor (float): Multiplicative scale decrease per throttle.
+            Defaults to 0.5.
+        jitter (float): Maximum relative jitter added to back-off pauses.
+            Defaults to 0.2.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        min_scale: float = 0.1,
+        increase_step: float = 0.02,
+        decrease_factor: float = 0.5,
+        jitter: float = 0.2,
+    ) -> None:
+        self._lock = threading.Lock()
+        self.min_scale = min_scale
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.jitter = jitter
+        self.scale = 1.0
+        self.throttled = 0
+        self._requests: Optional[TokenBucket] = None
+        self._tokens: Optional[TokenBucket] = None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.restrict(requests_per_minute, tokens_per_minute)
+
+    def restrict(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> bool:
+        """
+        Apply quotas, keeping the stricter of each current and new limit.
+
+        None leaves a limit as it is, and a lowered rate keeps the level of
+        its bucket rather than refilling it.
+
+        Returns:
+            bool: Whether a limit was added or lowered.
+        """
+        now = time.monotonic()
+        changed = False
+        with self._lock:
+            if requests_per_minute is not None:
+                if self._requests is None:
+                    self._requests = TokenBucket(requests_per_minute)
+                    changed = True
+                elif requests_per_minute < self._requests.rate_per_minute:
+                    self._requests.set_rate(requests_per_minute, now, self.scale)
+                    changed = True
+            if tokens_per_minute is not None:
+                if self._tokens is None:
+                    self._tokens = TokenBucket(tokens_per_minute)
+                    changed = True
+                elif tokens_per_minute < self._tokens.rate_per_minute:
+                    self._tokens.set_rate(tokens_per_minute, now, self.scale)
+                    changed = True
+        return changed
+
+    @property
+    def requests_per_minute(self) -> Optional[float]:
+        return None if self._requests is None else self._requests.rate_per_minute
+
+    @property
+    def tokens_per_minute(self) -> Optional[float]:
+        return None if self._tokens is None else self._tokens.rate_per_minute
+
+    @property
+    def limits_tokens(self) -> bool:
+        return self._tokens is not None
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserve one request and `tokens` tokens; return the delay to honor."""
+        now = time.monotonic()
+        with self._lock:
+            delay = max(0.0, self._paused_until - now)
+            if self._requests is not None:
+                delay = max(delay, self._requests.reserve(1, now, self.scale))
+            if self._tokens is not None and tokens:
+                delay = max(delay, self._tokens.reserve(tokens, now, self.scale))
+        return delay
+
+    def acquire(self, num_tokens: int = 0) -> None:
+        """Block the calling thread until the request may be sent."""
+        delay = self.reserve(num_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def async_acquire(self, num_tokens: int = 0) -> None:
+        """Wait in the event loop until the request may be sent."""
+        delay = self.reserve(num_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_response(self, status_code: int, headers: httpx.Headers) -> None:
+        """Adapt to the outcome and rate-limit headers of a response."""
+        now = time.monotonic()
+        with self._lock:
+            self._observe_headers(headers, now)
+            if status_code == 429:
+                self._on_throttled(parse_retry_after(headers), now)
+            elif status_code < 500:
+                self.scale = min(1.0, self.scale + self.increase_step)
+
+    def _observe_headers(self, headers: httpx.Headers, now: float) -> None:
+        for kind, bucket in (("requests", self._requests), ("tokens", self._tokens)):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining_value = float(remaining)
+            except ValueError:
+                continue
+            if bucket is not None:
+                bucket.clamp(remaining_value, now, self.scale)
+            if remaining_value <= 0:
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset is not None:
+                    self._paused_until = max(self._paused_until, now + reset)
+
+    def _on_throttled(self, retry_after: Optional[float], now: float) -> None:
+        self.throttled += 1
+        pause = retry_after if retry_after is not None else DEFAULT_BACKOFF
+        pause *= 1 + random.uniform(0, self.jitter)
+        self._paused_until = max(self._paused_until, now + pause)
+        # A burst of 429s for requests that were already in flight counts once.
+        if now >= self._last_decrease + pause:
+            self.scale = max(self.min_scale, self.scale * self.decrease_factor)
+            self._last_decrease = now
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync transport that routes every HTTP attempt through a limiter."""
+
+    def __init__(
+        self, transport: httpx.BaseTransport, limiter: AdaptiveRateLimiter
+    ) -> None:
+        self._transport = transport
+        self._limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = (
+            estimate_request_tokens(request_body(request))
+            if self._limiter.limits_tokens
+            else 0
+        )
+        self._limiter.acquire(tokens)
+        response = self._transport.handle_request(request)
+        self._limiter.on_response(response.status_code, response.headers)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async transport that routes every HTTP attempt through a limiter."""
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, limiter: AdaptiveRateLimiter
+    ) -> None:
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = (
+            estimate_request_tokens(request_body(request))
+            if self._limiter.limits_tokens
+            else 0
+        )
+        await self._limiter.async_acquire(tokens)
+        response = await self._transport.handle_async_request(request)
+        self._limiter.on_response(response.status_code, response.headers)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_LIMITERS: Dict[Hashable, AdaptiveRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+_LIMITERS_PID = os.getpid()
+
+
+def get_rate_limiter(
+    key: Hashable,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+) -> AdaptiveRateLimiter:
+    """
+    Get the process-wide limiter for `key`, creating it on first use.
+
+    All ASI instances sharing an endpoint and API key share one limiter, so
+    the quota is enforced across instances and threads. When an instance
+    asks for different quotas than the limiter has, a warning is logged and
+    the stricter of each limit applies; limits are never raised or removed.
+    Limiters are not shared across processes: a forked child starts with
+    fresh limiters.
+    """
+    global _LIMITERS, _LIMITERS_LOCK, _LIMITERS_PID
+    if _LIMITERS_PID != os.getpid():
+        _LIMITERS, _LIMITERS_LOCK, _LIMITERS_PID = {}, threading.Lock(), os.getpid()
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(requests_per_minute, tokens_per_minute)
+            _LIMITERS[key] = limiter
+            return limiter
+    current = (limiter.requests_per_minute, limiter.tokens_per_minute)
+    if current != (requests_per_minute, tokens_per_minute):
+        limiter.restrict(requests_per_minute, tokens_per_minute)
+        logger.warning(
+            "Conflicting rate limits for a shared ASI endpoint and key: "
+            "requests_per_minute=%s, tokens_per_minute=%s were requested while "
+            "the shared limiter has %s and %s; now enforcing %s and %s.",
+            requests_per_minute,
+            tokens_per_minute,
+            *current,
+            limiter.requests_per_minute,
+            limiter.tokens_per_minute,
+        )
+    return limiter
@@ -0,0 +1,417 @@
+"""
+Recording of ASI HTTP exchanges and their deterministic replay.
+
+A recording file is append-only JSON Lines, one exchange per line:
+
+    {"key": "...", "status": 200, "headers": [["content-type", "..."]],
+     "ttfb": 0.41, "chunks": [[0.0, "data: ..."], [0.032, "data: ..."]]}
+
+`key` identifies the request (method, path and canonical JSON body),
+`ttfb` is the time from sending the request to the response headers and
+every chunk carries its offset from the headers, so streamed replies keep
+their original pacing. Bodies that are not UTF-8 are stored base64-encoded
+with `"b64": true`. A line torn by a crash is skipped on load.
+"""
+
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from llama_index_llms_asi.wire import request_body
+
+# Response headers not worth replaying.
+_SKIPPED_HEADERS = frozenset({"date", "set-cookie", "content-length"})
+
+EXACT = "exact"
+ANY = "any"
+
+
+def request_key(request: httpx.Request) -> str:
+    """Identify a request by its method, path and canonical JSON body."""
+    body = request_body(request)
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.url.path}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _encode(chunk: bytes, binary: bool) -> str:
+    return base64.b64encode(chunk).decode("ascii") if binary else chunk.decode()
+
+
+def _decode(chunk: str, binary: bool) -> bytes:
+    return base64.b64decode(chunk) if binary else chunk.encode("utf-8")
+
+
+class Recorder:
+    """
+    Appends exchanges to a recording file, safely from many threads.
+
+    Each exchange is written as one line and flushed, so a crash loses at
+    most the exchanges still in flight. The file is reopened in a forked
+    child, so parent and child append whole lines independently.
+
+    Args:
+        path (str): The recording file. It is created or appended to.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._file = open(self.path, "a", encoding="utf-8")
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["path"])  # type: ignore[misc]
+
+
+class _Capture:
+    """Collects the chunks of one response and writes them once it closes."""
+
+    def __init__(
+        self,
+        recorder: Recorder,
+        key: str,
+        response: httpx.Response,
+        started: float,
+    ) -> None:
+        now = time.perf_counter()
+        self._recorder = recorder
+        self._key = key
+        self._response = response
+        self._ttfb = now - started
+        self._headers_at = now
+        self._chunks: List[Tuple[float, bytes]] = []
+        self._written = False
+
+    def add(self, chunk: bytes) -> None:
+        if chunk:
+            self._chunks.append((time.perf_counter() - self._headers_at, chunk))
+
+    def write(self) -> None:
+        if self._written:
+            return
+        self._written = True
+        binary = False
+        for _, chunk in self._chunks:
+            try:
+                chunk.decode("utf-8")
+            except UnicodeDecodeError:
+                binary = True
+                break
+        record: Dict[str, Any] = {
+            "key": self._key,
+            "status": self._response.status_code,
+            "headers": [
+                [name, value]
+                for name, value in self._response.headers.items()
+                if name.lower() not in _SKIPPED_HEADERS
+            ],
+            "ttfb": round(self._ttfb, 4),
+            "chunks": [
+                [round(offset, 4), _encode(chunk, binary)]
+                for offset, chunk in self._chunks
+            ],
+        }
+        if binary:
+            record["b64"] = True
+        self._recorder.write(record)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream: Any, capture: _Capture) -> None:
+        self._stream = stream
+        self._capture = capture
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._capture.add(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._capture.write()
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any, capture: _Capture) -> None:
+        self._stream = stream
+        self._capture = capture
+
+    async def __aiter__(self) -> Any:
+        async for chunk in self._stream:
+            self._capture.add(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._capture.write()
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """
+    Forwards requests and records every exchange with its chunk timings.
+
+    An exchange is written once its response is closed, i.e. after its last
+    chunk was read. Requests that fail without a response are not recorded.
+
+    Args:
+        transport (httpx.BaseTransport): The transport sending requests.
+        recorder (Recorder): Where exchanges are written.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, recorder: Recorder) -> None:
+        self._transport = transport
+        self._recorder = recorder
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        key = request_key(request)
+        started = time.perf_counter()
+        response = self._transport.handle_request(request)
+        capture = _Capture(self._recorder, key, response, started)
+        if response.is_closed:
+            capture.add(response.content)
+            capture.write()
+        else:
+            response.stream = _RecordingStream(response.stream, capture)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Async version of `RecordingTransport`."""
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, recorder: Recorder
+    ) -> None:
+        self._transport = transport
+        self._recorder = recorder
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = request_key(request)
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        capture = _Capture(self._recorder, key, response, started)
+        if response.is_closed:
+            capture.add(response.content)
+            capture.write()
+        else:
+            response.stream = _AsyncRecordingStream(response.stream, capture)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class _Exchange:
+    __slots__ = ("status", "headers", "ttfb", "chunks")
+
+    def __init__(self, record: Dict[str, Any]) -> None:
+        binary = bool(record.get("b64"))
+        self.status: int = record["status"]
+        self.headers: List[Tuple[str, str]] = [tuple(h) for h in record["headers"]]
+        self.ttfb: float = record["ttfb"]
+        self.chunks: List[Tuple[float, bytes]] = [
+            (offset, _decode(chunk, binary)) for offset, chunk in record["chunks"]
+        ]
+
+
+class Recording:
+    """
+    The exchanges of a recording file, indexed for replay.
+
+    Requests recorded several times are answered with each recording in turn.
+
+    Args:
+        path (str): The recording file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._by_key: Dict[str, List[_Exchange]] = {}
+        self._exchanges: List[_Exchange] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    exchange = _Exchange(record)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._by_key.setdefault(record["key"], []).append(exchange)
+                self._exchanges.append(exchange)
+        self._lock = threading.Lock()
+        self._turns: Dict[Optional[str], Iterator[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._exchanges)
+
+    def match(self, key: str, mode: str = EXACT) -> Optional[_Exchange]:
+        """
+        Pick the exchange answering the request identified by `key`.
+
+        With `mode="any"`, requests without a recording of their own are
+        answered by all exchanges in turn, so traffic with fresh prompts can
+        be replayed at the recorded pacing.
+        """
+        exchanges = self._by_key.get(key)
+        turn: Optional[str] = key
+        if exchanges is None:
+            if mode != ANY or not self._exchanges:
+                return None
+            exchanges, turn = self._exchanges, None
+        with self._lock:
+            counter = self._turns.setdefault(turn, itertools.count())
+            index = next(counter)
+        return exchanges[index % len(exchanges)]
+
+
+def _not_recorded(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        404,
+        json={"error": {"message": "No recorded response for this request."}},
+        request=request,
+    )
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, exchange: _Exchange, speed: float) -> None:
+        self._exchange = exchange
+        self._speed = speed
+
+    def __iter__(self) -> Iterator[bytes]:
+        start = time.perf_counter()
+        for offset, chunk in self._exchange.chunks:
+            if self._speed:
+                delay = offset / self._speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            yield chunk
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, exchange: _Exchange, speed: float) -> None:
+        self._exchange = exchange
+        self._speed = speed
+
+    async def __aiter__(self) -> Any:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for offset, chunk in self._exchange.chunks:
+            if self._speed:
+                delay = offset / self._speed - (loop.time() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield chunk
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """
+    Answers requests from a `Recording` without touching the network.
+
+    Responses arrive after the recorded time to first byte and stream their
+    chunks at the recorded offsets, divided by `speed`. Requests without a
+    recording get a 404 response.
+
+    Args:
+        recording (Recording): The recorded exchanges.
+        speed (float): Playback speed: 1.0 is real time, 2.0 twice as fast and
+            0 replays without any delay.
+        mode (str): "exact" answers only recorded requests; "any" answers
+            other requests with all recordings in turn.
+    """
+
+    def __init__(
+        self, recording: Recording, speed: float = 1.0, mode: str = EXACT
+    ) -> None:
+        if speed < 0:
+            raise ValueError("speed must not be negative.")
+        if mode not in (EXACT, ANY):
+            raise ValueError(f"mode must be {EXACT!r} or {ANY!r}.")
+        self.recording = recording
+        self.speed = speed
+        self.mode = mode
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        exchange = self.recording.match(request_key(request), self.mode)
+        if exchange is None:
+            return _not_recorded(request)
+        if self.speed:
+            time.sleep(exchange.ttfb / self.speed)
+        return httpx.Response(
+            exchange.status,
+            headers=exchange.headers,
+            stream=_ReplayStream(exchange, self.speed),
+            request=request,
+        )
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Async version of `ReplayTransport`.
+
+    Delays are `asyncio.sleep`s, so thousands of concurrent replayed
+    requests cost no threads.
+    """
+
+    def __init__(
+        self, recording: Recording, speed: float = 1.0, mode: str = EXACT
+    ) -> None:
+        if speed < 0:
+            raise ValueError("speed must not be negative.")
+        if mode not in (EXACT, ANY):
+            raise ValueError(f"mode must be {EXACT!r} or {ANY!r}.")
+        self.recording = recording
+        self.speed = speed
+        self.mode = mode
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        exchange = self.recording.match(request_key(request), self.mode)
+        if exchange is None:
+            return _not_recorded(request)
+        if self.speed:
+            await asyncio.sleep(exchange.ttfb / self.speed)
+        return httpx.Response(
+            exchange.status,
+            headers=exchange.headers,
+            stream=_AsyncReplayStream(exchange, self.speed),
+            request=request,
+        )
@@ -0,0 +1,503 @@
+"""Weighted fair scheduling of ASI requests across tenants and priorities."""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+from llama_index_llms_asi.ratelimit import TokenBucket
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# In dispatch order: batch requests only get capacity interactive ones leave.
+PRIORITIES = (INTERACTIVE, BATCH)
+
+DEFAULT_TENANT = "default"
+DEFAULT_SCHEDULER_CONCURRENCY = 16
+
+_QUEUED = 0
+_GRANTED = 1
+_DROPPED = 2
+
+
+class DeadlineExceededError(TimeoutError):
+    """A request was dropped because it could not start before its deadline."""
+
+
+class Tenant:
+    """
+    Scheduling settings of one tenant.
+
+    Args:
+        name (str): Tenant name, as passed to `tenant_context`.
+        weight (float): Relative share of capacity when tenants compete.
+        max_concurrency (Optional[int]): Maximum requests of the tenant in
+            flight at once.
+        tokens_per_minute (Optional[float]): Token budget of the tenant.
+    """
+
+    __slots__ = ("name", "weight", "max_concurrency", "tokens_per_minute")
+
+    def __init__(
+        self,
+        name: str,
+        weight: float = 1.0,
+        max_concurrency: Optional[int] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> None:
+        if weight <= 0:
+            raise ValueError("Tenant weight must be positive.")
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+
+    def __repr__(self) -> str:
+        return f"Tenant({self.name!r}, weight={self.weight})"
+
+
+class _Context:
+    __slots__ = ("tenant", "priority", "deadline")
+
+    def __init__(self, tenant: str, priority: str, deadline: Optional[float]) -> None:
+        self.tenant = tenant
+        self.priority = priority
+        self.deadline = deadline
+
+
+_CURRENT: contextvars.ContextVar[Optional[_Context]] = contextvars.ContextVar(
+    "asi_tenant", default=None
+)
+
+
+@contextmanager
+def tenant_context(
+    tenant: str, priority: str = INTERACTIVE, timeout: Optional[float] = None
+) -> Iterator[None]:
+    """
+    Attribute the ASI calls made inside the block to `tenant`.
+
+    The context follows threads' and tasks' context variables, so it covers
+    sync and async calls alike.
+
+    Args:
+        tenant (str): The tenant name.
+        priority (str): "interactive" or "batch".
+        timeout (Optional[float]): Seconds from entering the block after which
+            calls still waiting to start are dropped with
+            `DeadlineExceededError`.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {PRIORITIES}.")
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    token = _CURRENT.set(_Context(tenant, priority, deadline))
+    try:
+        yield
+    finally:
+        _CURRENT.reset(token)
+
+
+def current_tenant() -> str:
+    """Name of the tenant ASI calls are attributed to here."""
+    context = _CURRENT.get()
+    return context.tenant if context is not None else DEFAULT_TENANT
+
+
+class Ticket:
+    """A request's place in the scheduler, released once the request ends."""
+
+    __slots__ = (
+        "tenant",
+        "priority",
+        "cost",
+        "start",
+        "finish",
+        "deadline",
+        "state",
+        "event",
+        "future",
+    )
+
+    def __init__(
+        self,
+        tenant: "_TenantState",
+        priority: str,
+        cost: float,
+        deadline: Optional[float],
+    ) -> None:
+        self.tenant = tenant
+        self.priority = priority
+        self.cost = cost
+        self.start = 0.0
+        self.finish = 0.0
+        self.deadline = deadline
+        self.state = _QUEUED
+        self.event: Optional[threading.Event] = None
+        self.future: Optional["asyncio.Future[None]"] = None
+
+
+class _TenantState:
+    def __init__(self, config: Tenant) -> None:
+        self.config = config
+        self.in_flight = 0
+        self.completed = 0
+        self.dropped = 0
+        self.tokens = 0.0
+        self.bucket = (
+            TokenBucket(config.tokens_per_minute)
+            if config.tokens_per_minute
+            else None
+        )
+        self.last_finish = {priority: 0.0 for priority in PRIORITIES}
+        self.queues: Dict[str, Deque[Ticket]] = {p: deque() for p in PRIORITIES}
+
+    def blocked_for(self, now: float) -> float:
+        """Seconds until the tenant may start another request (0 if it may)."""
+        limit = self.config.max_concurrency
+        if limit is not None and self.in_flight >= limit:
+            return float("inf")
+        if self.bucket is None:
+            return 0.0
+        return self.bucket.reserve(0, now)
+
+
+class FairScheduler:
+    """
+    Orders ASI requests by weighted fair queuing across tenants.
+
+    Up to `max_concurrency` requests run at once. When a slot frees up,
+    queued interactive requests go first and batch requests get whatever
+    capacity is left. Within a priority class, tenants share slots in
+    proportion to their weights: each request is tagged with a virtual finish
+    time that grows by its token cost divided by the tenant's weight, and the
+    request with the earliest tag starts next. Tenants at their
+    `max_concurrency` or out of token budget are skipped until they have
+    capacity again, and requests that reach their deadline while queued are
+    dropped with `DeadlineExceededError`.
+
+    Tenants not registered up front are created with weight 1 on first use.
+
+    Args:
+        max_concurrency (int): Requests in flight across all tenants.
+        tenants (Optional[Sequence[Tenant]]): Tenant settings.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_SCHEDULER_CONCURRENCY,
+        tenants: Optional[Sequence[Tenant]] = None,
+    ) -> None:
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive.")
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, _TenantState] = {}
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._in_flight = 0
+        self._timer: Optional[threading.Timer] = None
+        for tenant in tenants or ():
+            self.register(tenant)
+
+    def register(self, tenant: Tenant) -> None:
+        """Add a tenant, or replace the settings of an idle one."""
+        with self._lock:
+            self._tenants[tenant.name] = _TenantState(tenant)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(
+            len(queue)
+            for state in self._tenants.values()
+            for queue in state.queues.values()
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-tenant occupancy, queue lengths, completions and drops."""
+        with self._lock:
+            return {
+                name: {
+                    "in_flight": state.in_flight,
+                    "queued": {p: len(q) for p, q in state.queues.items()},
+                    "completed": state.completed,
+                    "dropped": state.dropped,
+                    "tokens": state.tokens,
+                }
+                for name, state in self._tenants.items()
+            }
+
+    # -- Queueing --
+
+    def _enqueue(self, cost: float, context: Optional[_Context]) -> Ticket:
+        context = context or _Context(DEFAULT_TENANT, INTERACTIVE, None)
+        state = self._tenants.get(context.tenant)
+        if state is None:
+            state = self._tenants[context.tenant] = _TenantState(
+                Tenant(context.tenant)
+            )
+        ticket = Ticket(state, context.priority, max(cost, 1.0), context.deadline)
+        priority = context.priority
+        ticket.start = max(self._virtual_time[priority], state.last_finish[priority])
+        ticket.finish = ticket.start + ticket.cost / state.config.weight
+        state.last_finish[priority] = ticket.finish
+        state.queues[priority].append(ticket)
+        return ticket
+
+    def _drop(self, ticket: Ticket) -> None:
+        """Take a queued ticket out of its queue. Must hold the lock."""
+        ticket.state = _DROPPED
+        ticket.tenant.queues[ticket.priority].remove(ticket)
+        ticket.tenant.dropped += 1
+
+    def _dispatch(self) -> None:
+        """Start as many queued requests as capacity allows. Must hold the lock."""
+        now = time.monotonic()
+        retry_in = float("inf")
+        while self._in_flight < self.max_concurrency:
+            best: Optional[Ticket] = None
+            for priority in PRIORITIES:
+                for state in self._tenants.values():
+                    queue = state.queues[priority]
+                    while queue and queue[0].deadline is not None:
+                        if queue[0].deadline > now:
+                            break
+                        expired = queue[0]
+                        self._drop(expired)
+                        self._notify(expired)
+                    if not queue:
+                        continue
+                    blocked_for = state.blocked_for(now)
+                    if blocked_for > 0:
+                        retry_in = min(retry_in, blocked_for)
+                        continue
+                    if best is None or queue[0].finish < best.finish:
+                        best = queue[0]
+                if best is not None:
+                    break
+            if best is None:
+                break
+            state = best.tenant
+            state.queues[best.priority].popleft()
+            self._virtual_time[best.priority] = best.start
+            best.state = _GRANTED
+            state.in_flight += 1
+            self._in_flight += 1
+            if state.bucket is not None:
+                state.bucket.reserve(best.cost, now)
+            self._notify(best)
+        if retry_in != float("inf") and self.queue_depth:
+            self._schedule_retry(retry_in)
+
+    def _schedule_retry(self, delay: float) -> None:
+        """Dispatch again once a tenant's token budget has refilled."""
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(delay + 0.001, self._redispatch)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _redispatch(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _notify(self, ticket: Ticket) -> None:
+        if ticket.event is not None:
+            ticket.event.set()
+        elif ticket.future is not None:
+            ticket.future.get_loop().call_soon_threadsafe(self._resolve, ticket)
+
+    def _resolve(self, ticket: Ticket) -> None:
+        future = ticket.future
+        assert future is not None
+        if future.done():
+            # The waiter was cancelled after its slot was assigned.
+            if ticket.state == _GRANTED:
+                self.release(ticket)
+        elif ticket.state == _GRANTED:
+            future.set_result(None)
+        else:
+            future.set_exception(self._deadline_error(ticket))
+
+    @staticmethod
+    def _deadline_error(ticket: Ticket) -> DeadlineExceededError:
+        return DeadlineExceededError(
+            f"ASI request of tenant {ticket.tenant.config.name!r} "
+            f"({ticket.priority}) missed its deadline while queued."
+        )
+
+    def _wait_time(self, ticket: Ticket) -> Optional[float]:
+        if ticket.deadline is None:
+            return None
+        return max(0.0, ticket.deadline - time.monotonic())
+
+    # -- Acquiring and releasing --
+
+    def acquire(self, cost: float = 1.0) -> Ticket:
+        """
+        Wait for a slot for a request of the current tenant (see
+        `tenant_context`), costing about `cost` tokens.
+        """
+        return self._acquire(cost, _CURRENT.get())
+
+    def _acquire(self, cost: float, context: Optional[_Context]) -> Ticket:
+        with self._lock:
+            ticket = self._enqueue(cost, context)
+            ticket.event = threading.Event()
+            self._dispatch()
+        if not ticket.event.wait(self._wait_time(ticket)):
+            with self._lock:
+                if ticket.state == _QUEUED:
+                    self._drop(ticket)
+        if ticket.state != _GRANTED:
+            raise self._deadline_error(ticket)
+        return ticket
+
+    async def aacquire(self, cost: float = 1.0) -> Ticket:
+        """Async version of `acquire`."""
+        return await self._aacquire(cost, _CURRENT.get())
+
+    async def _aacquire(self, cost: float, context: Optional[_Context]) -> Ticket:
+        with self._lock:
+            ticket = self._enqueue(cost, context)
+            ticket.future = asyncio.get_running_loop().create_future()
+            self._dispatch()
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(ticket.future), self._wait_time(ticket)
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                if ticket.state == _QUEUED:
+                    self._drop(ticket)
+                    ticket.future.cancel()
+            if ticket.state != _GRANTED:
+                raise self._deadline_error(ticket)
+            # Granted just as the deadline passed.
+            await ticket.future
+        except BaseException:
+            with self._lock:
+                if ticket.state == _QUEUED:
+                    self._drop(ticket)
+            future = ticket.future
+            if ticket.state == _GRANTED and future.done():
+                # Cancelled after the slot was handed over.
+                self.release(ticket)
+            # Otherwise a pending grant sees the cancelled future and releases.
+            future.cancel()
+            raise
+        return ticket
+
+    def release(self, ticket: Ticket, tokens: Optional[float] = None) -> None:
+        """
+        Free the slot of a finished request.
+
+        Args:
+            ticket (Ticket): The ticket returned by `acquire`.
+            tokens (Optional[float]): Tokens the request actually used, to
+                correct the tenant's budget for the estimated `cost`.
+        """
+        with self._lock:
+            state = ticket.tenant
+            state.in_flight -= 1
+            state.completed += 1
+            self._in_flight -= 1
+            used = ticket.cost if tokens is None else tokens
+            state.tokens += used
+            if state.bucket is not None and tokens is not None:
+                state.bucket.reserve(tokens - ticket.cost, time.monotonic())
+            self._dispatch()
+
+    # -- Scheduled calls --
+
+    def call(self, fn: Callable[[], T], cost: float = 1.0) -> T:
+        """Run `fn()` in a slot of the current tenant, charging its usage."""
+        ticket = self.acquire(cost)
+        result = None
+        try:
+            result = fn()
+        finally:
+            self.release(ticket, _used_tokens(result))
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], cost: float = 1.0) -> T:
+        """Async version of `call`."""
+        ticket = await self.aacquire(cost)
+        result = None
+        try:
+            result = await fn()
+        finally:
+            self.release(ticket, _used_tokens(result))
+        return result
+
+    def stream(
+        self, fn: Callable[[], Iterator[T]], cost: float = 1.0
+    ) -> Generator[T, None, None]:
+        """
+        Like `call`, holding the slot until the stream returned by `fn` ends.
+
+        The slot is only taken when the stream is first iterated, for the
+        tenant current when `stream` was called, so a stream that is dropped
+        without being iterated holds nothing.
+        """
+        return self._hold(fn, cost, _CURRENT.get())
+
+    def _hold(
+        self, fn: Callable[[], Iterator[T]], cost: float, context: Optional[_Context]
+    ) -> Generator[T, None, None]:
+        ticket = self._acquire(cost, context)
+        last = None
+        try:
+            for last in fn():
+                yield last
+        finally:
+            self.release(ticket, _used_tokens(last))
+
+    async def astream(
+        self, fn: Callable[[], Awaitable[AsyncIterator[T]]], cost: float = 1.0
+    ) -> AsyncGenerator[T, None]:
+        """Async version of `stream`."""
+        return self._ahold(fn, cost, _CURRENT.get())
+
+    async def _ahold(
+        self,
+        fn: Callable[[], Awaitable[AsyncIterator[T]]],
+        cost: float,
+        context: Optional[_Context],
+    ) -> AsyncGenerator[T, None]:
+        ticket = await self._aacquire(cost, context)
+        last = None
+        try:
+            async for last in await fn():
+                yield last
+        finally:
+            self.release(ticket, _used_tokens(last))
+
+
+def _used_tokens(response: Any) -> Optional[float]:
+    """Total tokens reported in a response's usage, if any."""
+    usage = getattr(response, "additional_kwargs", None) or {}
+    if "prompt_tokens" not in usage and "completion_tokens" not in usage:
+        return None
+    return usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
@@ -0,0 +1,412 @@
+"""Semantic response cache matching paraphrased prompts by embedding similarity."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from llama_index_llms_asi.cache import CacheEntry, CacheStats
+
+DEFAULT_NAMESPACE = "default"
+DEFAULT_THRESHOLD = 0.95
+
+VECTORS_FILE = "vectors.npy"
+ENTRIES_FILE = "entries.db"
+
+# Embeddings of recently seen prompts, so storing the answer of a missed
+# lookup does not embed the prompt a second time.
+_EMBEDDING_MEMO_SIZE = 256
+# Similarity above which a stored prompt is replaced rather than duplicated.
+_SAME_PROMPT = 0.9999
+_FREE = -1
+
+
+class SemanticCache:
+    """
+    Response cache returning the answer of the most similar earlier prompt.
+
+    Prompts are embedded with `embed_model` and compared by cosine similarity
+    with every stored prompt of the same namespace and request parameters in a
+    single NumPy matrix-vector product. The stored answer of the best match is
+    returned when its similarity reaches `threshold`.
+
+    With a `path`, vectors live in a memory-mapped `vectors.npy` and answers
+    in an SQLite database in that directory, so the cache survives restarts
+    and is paged in by the OS as it is searched. Only the process that opened
+    the directory writes to it: forked and unpickled copies start from its
+    entries but keep new ones in private memory.
+
+    Args:
+        embed_model (Any): A LlamaIndex embedding model (`get_text_embedding`
+            and optionally `aget_text_embedding`) or a callable mapping a text
+            to its vector.
+        threshold (float): Minimum cosine similarity of a hit. Defaults to 0.95.
+        max_size (int): Maximum number of entries before the least recently
+            used one is evicted. A persisted cache keeps the capacity it was
+            created with. Defaults to 10000.
+        ttl (Optional[float]): Seconds after which an entry expires. None keeps
+            entries until they are evicted. Defaults to None.
+        path (Optional[str]): Directory persisting the cache. None keeps it in
+            memory. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        embed_model: Any,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_size: int = 10000,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+    ) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size must be positive.")
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        # Row i of `_vectors` belongs to partition `_partition[i]` (a namespace
+        # and parameter scope), or is free. Rows past `_size` were never used.
+        self._vectors: Optional[np.ndarray] = None
+        self._partition = np.full(0, _FREE, dtype=np.int32)
+        self._used_at = np.zeros(0)
+        self._created_at = np.zeros(0)
+        self._size = 0
+        self._free: List[int] = []
+        self._entries: Dict[int, CacheEntry] = {}
+        self._partitions: Dict[Tuple[str, str], int] = {}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = os.getpid()
+        if path is not None:
+            self._open(path)
+
+    # -- Persistence --
+
+    def _open(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(path, ENTRIES_FILE), check_same_thread=False
+        )
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS asi_semantic_cache ("
+                "slot INTEGER PRIMARY KEY, namespace TEXT NOT NULL, "
+                "scope TEXT NOT NULL, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if not os.path.exists(vectors_path):
+            return
+        vectors = np.lib.format.open_memmap(vectors_path, mode="r+")
+        self._resize(vectors)
+        rows = self._conn.execute(
+            "SELECT slot, namespace, scope, value, created_at, used_at "
+            "FROM asi_semantic_cache"
+        ).fetchall()
+        for slot, namespace, scope, value, created_at, used_at in rows:
+            if slot >= len(vectors):
+                continue
+            self._partition[slot] = self._partition_id(namespace, scope)
+            self._entries[slot] = json.loads(value)
+            self._created_at[slot] = created_at
+            self._used_at[slot] = used_at
+        self._size = max(self._entries, default=-1) + 1
+        self._free = [i for i in range(self._size) if i not in self._entries]
+
+    def _allocate(self, dim: int) -> None:
+        if self.path is not None:
+            vectors = np.lib.format.open_memmap(
+                os.path.join(self.path, VECTORS_FILE),
+                mode="w+",
+                dtype=np.float32,
+                shape=(self.max_size, dim),
+            )
+        else:
+            vectors = np.zeros((min(self.max_size, 64), dim), dtype=np.float32)
+        self._resize(vectors)
+
+    def _resize(self, vectors: np.ndarray) -> None:
+        rows = len(vectors)
+        old = len(self._partition)
+        self._vectors = vectors
+        self._partition = np.concatenate(
+            [self._partition, np.full(rows - old, _FREE, dtype=np.int32)]
+        )
+        self._used_at = np.concatenate([self._used_at, np.zeros(rows - old)])
+        self._created_at = np.concatenate([self._created_at, np.zeros(rows - old)])
+
+    def _grow(self) -> None:
+        # In-memory vectors double up to `max_size`; memory maps are
+        # allocated at full capacity since untouched pages cost nothing.
+        assert self._vectors is not None
+        rows = min(self.max_size, 2 * len(self._vectors))
+        vectors = np.zeros((rows, self._vectors.shape[1]), dtype=np.float32)
+        vectors[: len(self._vectors)] = self._vectors
+        self._resize(vectors)
+
+    def _detach(self) -> None:
+        """Keep the entries in private memory and stop writing to `path`."""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        if self._vectors is not None:
+            self._vectors = np.array(self._vectors)
+        self._conn = None
+        self.path = None
+
+    def _check_pid(self) -> None:
+        # Processes writing the same files would claim the same slots, so a
+        # forked child continues with a private copy.
+        if self._pid != os.getpid():
+            self._detach()
+
+    def _write(self, sql: str, params: Tuple[Any, ...] = ()) -> None:
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute(sql, params)
+
+    def close(self) -> None:
+        """Flush the vectors to disk and close the database, if persisted."""
+        with self._lock:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- Embedding --
+
+    def _normalize(self, text: str, embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector = vector / norm
+        with self._lock:
+            self._memo[text] = vector
+            if len(self._memo) > _EMBEDDING_MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return vector
+
+    def _memoized(self, text: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._memo.get(text)
+            if vector is not None:
+                self._memo.move_to_end(text)
+            return vector
+
+    def embed(self, text: str) -> np.ndarray:
+        """Get the unit-length embedding of `text`."""
+        vector = self._memoized(text)
+        if vector is not None:
+            return vector
+        if hasattr(self.embed_model, "get_text_embedding"):
+            embedding = self.embed_model.get_text_embedding(text)
+        else:
+            embedding = self.embed_model(text)
+        return self._normalize(text, embedding)
+
+    async def aembed(self, text: str) -> np.ndarray:
+        """Async version of `embed`."""
+        vector = self._memoized(text)
+        if vector is not None:
+            return vector
+        if hasattr(self.embed_model, "aget_text_embedding"):
+            embedding = await self.embed_model.aget_text_embedding(text)
+        elif hasattr(self.embed_model, "get_text_embedding"):
+            embedding = self.embed_model.get_text_embedding(text)
+        else:
+            embedding = self.embed_model(text)
+        return self._normalize(text, embedding)
+
+    # -- Lookup and storage --
+
+    def _partition_id(self, namespace: str, scope: str) -> int:
+        return self._partitions.setdefault((namespace, scope), len(self._partitions))
+
+    def _best_match(self, vector: np.ndarray, partition: int) -> Tuple[int, float]:
+        # Caller holds the lock and has checked that vectors exist.
+        assert self._vectors is not None
+        if vector.shape[0] != self._vectors.shape[1]:
+            raise ValueError(
+                f"Embedding has {vector.shape[0]} dimensions, the cache stores "
+                f"{self._vectors.shape[1]}."
+            )
+        size = self._size
+        scores = self._vectors[:size] @ vector
+        scores[self._partition[:size] != partition] = -np.inf
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def _release(self, slots: Any) -> None:
+        for slot in slots:
+            slot = int(slot)
+            self._partition[slot] = _FREE
+            self._entries.pop(slot, None)
+            self._free.append(slot)
+
+    def _search(
+        self, vector: np.ndarray, namespace: str, scope: str
+    ) -> Optional[CacheEntry]:
+        self._check_pid()
+        now = time.time()
+        with self._lock:
+            partition = self._partitions.get((namespace, scope))
+            if partition is None or self._vectors is None or not self._entries:
+                return None
+            slot, score = self._best_match(vector, partition)
+            if score < self.threshold:
+                return None
+            if self.ttl is not None and now - self._created_at[slot] > self.ttl:
+                self._release([slot])
+                self._write("DELETE FROM asi_semantic_cache WHERE slot = ?", (slot,))
+                return None
+            self._used_at[slot] = now
+            self._write(
+                "UPDATE asi_semantic_cache SET used_at = ? WHERE slot = ?",
+                (now, slot),
+            )
+            return self._entries[slot]
+
+    def _record(self, entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        if entry is None:
+            self.stats.record_miss()
+        else:
+            self.stats.record_hit()
+        return entry
+
+    def get(
+        self, text: str, namespace: str = DEFAULT_NAMESPACE, scope: str = ""
+    ) -> Optional[CacheEntry]:
+        """
+        Look up the answer of the prompt most similar to `text`.
+
+        Args:
+            text (str): The prompt.
+            namespace (str): Namespace to search, see `invalidate`.
+            scope (str): Opaque key of the request parameters (model,
+                temperature, ...); only prompts sent with the same parameters
+                match.
+        """
+        return self._record(self._search(self.embed(text), namespace, scope))
+
+    async def aget(
+        self, text: str, namespace: str = DEFAULT_NAMESPACE, scope: str = ""
+    ) -> Optional[CacheEntry]:
+        """Async version of `get`."""
+        vector = await self.aembed(text)
+        return self._record(self._search(vector, namespace, scope))
+
+    def _store(
+        self, vector: np.ndarray, entry: CacheEntry, namespace: str, scope: str
+    ) -> None:
+        self._check_pid()
+        now = time.time()
+        evicted = 0
+        with self._lock:
+            if self._vectors is None:
+                self._allocate(vector.shape[0])
+            partition = self._partition_id(namespace, scope)
+            slot = None
+            if self._entries:
+                best, score = self._best_match(vector, partition)
+                if score >= _SAME_PROMPT:
+                    slot = best
+            if slot is None and self._free:
+                slot = self._free.pop()
+            if slot is None and self._size == len(self._vectors):
+                if self._size < self.max_size:
+                    self._grow()
+                else:
+                    used_at = np.where(
+                        self._partition == _FREE, np.inf, self._used_at
+                    )
+                    slot = int(np.argmin(used_at))
+                    self._entries.pop(slot, None)
+                    evicted = 1
+            if slot is None:
+                slot = self._size
+                self._size += 1
+            assert self._vectors is not None
+            self._vectors[slot] = vector
+            self._partition[slot] = partition
+            self._created_at[slot] = now
+            self._used_at[slot] = now
+            self._entries[slot] = entry
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            self._write(
+                "INSERT OR REPLACE INTO asi_semantic_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (slot, namespace, scope, json.dumps(entry), now, now),
+            )
+        if evicted:
+            self.stats.record_evictions(evicted)
+
+    def set(
+        self,
+        text: str,
+        entry: CacheEntry,
+        namespace: str = DEFAULT_NAMESPACE,
+        scope: str = "",
+    ) -> None:
+        """Store `entry` as the answer of prompt `text`."""
+        self._store(self.embed(text), entry, namespace, scope)
+
+    async def aset(
+        self,
+        text: str,
+        entry: CacheEntry,
+        namespace: str = DEFAULT_NAMESPACE,
+        scope: str = "",
+    ) -> None:
+        """Async version of `set`."""
+        self._store(await self.aembed(text), entry, namespace, scope)
+
+    # -- Invalidation --
+
+    def invalidate(self, namespace: str) -> int:
+        """Remove every entry of `namespace`, returning how many were removed."""
+        with self._lock:
+            partitions = [
+                p for (ns, _), p in self._partitions.items() if ns == namespace
+            ]
+            slots = np.flatnonzero(np.isin(self._partition[: self._size], partitions))
+            self._release(slots)
+            self._write(
+                "DELETE FROM asi_semantic_cache WHERE namespace = ?", (namespace,)
+            )
+        return len(slots)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._release(np.flatnonzero(self._partition[: self._size] != _FREE))
+            self._write("DELETE FROM asi_semantic_cache")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Unpickled copies load the persisted entries, then stay private like
+        # forked ones; an in-memory cache arrives empty.
+        return {
+            "embed_model": self.embed_model,
+            "threshold": self.threshold,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "path": self.path,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
+        if self.path is not None:
+            self._detach()
@@ -0,0 +1,380 @@
+"""
+Client-side early stopping of ASI streams.
+
+A `StopCondition` ends a streamed generation as soon as the text received
+so far satisfies it: a stop sequence (matched across chunk boundaries), a
+regular expression, a token or wall-clock budget, or a predicate. The
+stream is then closed, which closes its HTTP response, so the server stops
+generating and the connection goes back to the pool.
+"""
+
+import asyncio
+import contextvars
+import queue
+import re
+import threading
+import time
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Generator,
+    Iterator,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+    MessageRole,
+)
+
+from llama_index_llms_asi.tokens import TokenCounter, get_token_counter
+
+# Stop reasons, reported as `additional_kwargs["stop_reason"]` of the last
+# response of a stopped stream.
+STOP_SEQUENCE = "stop_sequence"
+PATTERN = "pattern"
+MAX_TOKENS = "max_tokens"
+MAX_TIME = "max_time"
+PREDICATE = "predicate"
+
+_END = object()
+
+Response = Union[ChatResponse, CompletionResponse]
+
+
+class StopCondition:
+    """
+    When to stop a streamed generation on the client.
+
+    Every criterion is optional and the first one met stops the stream.
+
+    Args:
+        stop (Union[str, Sequence[str], None]): Stop sequences. Text that
+            could be the start of one is held back until it is resolved, so a
+            sequence split across chunks is still found; the output ends
+            before it, as with the API's `stop` parameter.
+        pattern (Union[str, Pattern[str], None]): Regular expression searched
+            in the text received so far. The output ends with the first match.
+        max_tokens (Optional[int]): Budget of generated tokens, counted
+            locally with the LLM's token counter. The output is truncated to it.
+        max_time (Optional[float]): Seconds from when the stream is opened
+            (or, for sync streams, first iterated) to its end, however slowly
+            chunks arrive.
+        predicate (Optional[Callable[[str], bool]]): Called with the text
+            received so far after every chunk; returning True stops the stream.
+    """
+
+    def __init__(
+        self,
+        stop: Union[str, Sequence[str], None] = None,
+        pattern: Union[str, Pattern[str], None] = None,
+        max_tokens: Optional[int] = None,
+        max_time: Optional[float] = None,
+        predicate: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        if isinstance(stop, str):
+            stop = [stop]
+        self.stop: Tuple[str, ...] = tuple(s for s in stop or () if s)
+        self.pattern: Optional[Pattern[str]] = (
+            re.compile(pattern) if isinstance(pattern, str) else pattern
+        )
+        self.max_tokens = max_tokens
+        self.max_time = max_time
+        self.predicate = predicate
+
+    def __repr__(self) -> str:
+        fields = {
+            "stop": self.stop or None,
+            "pattern": self.pattern and self.pattern.pattern,
+            "max_tokens": self.max_tokens,
+            "max_time": self.max_time,
+            "predicate": self.predicate,
+        }
+        args = ", ".join(f"{k}={v!r}" for k, v in fields.items() if v is not None)
+        return f"StopCondition({args})"
+
+
+def _held_back(text: str, stops: Sequence[str]) -> int:
+    """Length of the longest suffix of `text` that starts a stop sequence."""
+    held = 0
+    for stop in stops:
+        for size in range(min(len(stop) - 1, len(text)), held, -1):
+            if text.endswith(stop[:size]):
+                held = size
+                break
+    return held
+
+
+class StopMonitor:
+    """
+    Applies a `StopCondition` to the deltas of one stream.
+
+    `feed` takes each delta and returns the text that may be passed on;
+    once a criterion is met `reason` is set and nothing more is returned.
+    `flush` releases the text held back for stop sequences at the end of a
+    stream that was not stopped.
+    """
+
+    def __init__(
+        self, condition: StopCondition, token_counter: Optional[TokenCounter] = None
+    ) -> None:
+        self.condition = condition
+        self.reason: Optional[str] = None
+        self.text = ""
+        self.tokens = 0
+        self._held = ""
+        self._token_counter = token_counter
+
+    def feed(self, delta: str) -> str:
+        """Add `delta` and return the text that can be emitted."""
+        if self.reason is not None:
+            return ""
+        text = self._held + delta
+        self._held = ""
+        stops = self.condition.stop
+        if stops:
+            found = [i for i in (text.find(s) for s in stops) if i >= 0]
+            if found:
+                return self._emit(text[: min(found)], STOP_SEQUENCE)
+            held = _held_back(text, stops)
+            if held:
+                text, self._held = text[:-held], text[-held:]
+        return self._emit(text, None)
+
+    def flush(self) -> str:
+        """Return the held-back text once the stream has ended."""
+        text, self._held = self._held, ""
+        if self.reason is not None:
+            return ""
+        return self._emit(text, None)
+
+    def stop(self, reason: str) -> None:
+        """Stop for a reason decided outside the text, such as a deadline."""
+        if self.reason is None:
+            self.reason = reason
+            self._held = ""
+
+    def _emit(self, text: str, reason: Optional[str]) -> str:
+        condition = self.condition
+        if condition.pattern is not None and text:
+            match = condition.pattern.search(self.text + text)
+            if match is not None:
+                text = text[: max(match.end() - len(self.text), 0)]
+                reason = PATTERN
+        if condition.max_tokens is not None and text:
+            counter = self._token_counter or get_token_counter()
+            remaining = condition.max_tokens - self.tokens
+            tokens = counter.count(text)
+            if tokens >= remaining:
+                if tokens > remaining:
+                    text = counter.truncate(text, remaining)
+                tokens = remaining
+                reason = reason or MAX_TOKENS
+            self.tokens += tokens
+        self.text += text
+        if reason is None and condition.predicate is not None and text:
+            if condition.predicate(self.text):
+                reason = PREDICATE
+        if reason is not None:
+            self.stop(reason)
+        return text
+
+
+def _content(response: Response) -> Optional[str]:
+    if isinstance(response, ChatResponse):
+        return response.message.content
+    return response.text
+
+
+def _rebuild(
+    response: Optional[Response], monitor: StopMonitor, delta: str, chat: bool
+) -> Response:
+    """A copy of `response` carrying the monitor's text, delta and reason."""
+    additional_kwargs = dict(response.additional_kwargs) if response else {}
+    if monitor.reason is not None:
+        additional_kwargs["stop_reason"] = monitor.reason
+    raw = response.raw if response else None
+    if chat:
+        message = response.message if isinstance(response, ChatResponse) else None
+        return ChatResponse(
+            message=ChatMessage(
+                role=message.role if message else MessageRole.ASSISTANT,
+                content=monitor.text,
+                additional_kwargs=dict(message.additional_kwargs) if message else {},
+            ),
+            delta=delta,
+            raw=raw,
+            additional_kwargs=additional_kwargs,
+        )
+    return CompletionResponse(
+        text=monitor.text, delta=delta, raw=raw, additional_kwargs=additional_kwargs
+    )
+
+
+def _apply(
+    monitor: StopMonitor, response: Response, chat: bool
+) -> Optional[Response]:
+    """The response to pass on for one upstream chunk, if any."""
+    delta = response.delta or ""
+    text = monitor.feed(delta)
+    if (
+        monitor.reason is None
+        and text == delta
+        and (_content(response) or "") == monitor.text
+    ):
+        return response
+    if text or not delta or monitor.reason is not None:
+        return _rebuild(response, monitor, text, chat)
+    # All of the delta is held back.
+    return None
+
+
+class _Pump:
+    """Reads a stream on a thread, so its consumer can wait with a timeout."""
+
+    def __init__(self, stream: Iterator[Any]) -> None:
+        self._stream = stream
+        self._queue: "queue.Queue[Tuple[Any, Optional[BaseException]]]" = (
+            queue.Queue()
+        )
+        self._closed = threading.Event()
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run, args=(self._run,), name="asi-stop", daemon=True
+        ).start()
+
+    def _run(self) -> None:
+        try:
+            for item in self._stream:
+                if self._closed.is_set():
+                    return
+                self._queue.put((item, None))
+            self._queue.put((_END, None))
+        except BaseException as exc:
+            self._queue.put((_END, exc))
+        finally:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+
+    def get(self, timeout: float) -> Any:
+        """The next item, `_END`, or `queue.Empty` after `timeout` seconds."""
+        item, exc = self._queue.get(timeout=max(timeout, 0.0))
+        if exc is not None:
+            raise exc
+        return item
+
+    def close(self) -> None:
+        # A read in progress cannot be interrupted from this thread: the
+        # stream is closed by the pump as soon as that read returns.
+        self._closed.set()
+
+
+def stop_stream(
+    stream: Iterator[Response],
+    condition: StopCondition,
+    token_counter: Optional[TokenCounter] = None,
+    chat: bool = True,
+) -> Generator[Response, None, None]:
+    """
+    Apply `condition` to a stream of chat or completion responses.
+
+    Responses are passed through untouched until text has to be held back
+    or cut; the last response of a stopped stream carries
+    `additional_kwargs["stop_reason"]`. `stream` is closed when the
+    condition is met. With `max_time`, `stream` is read on a helper thread
+    so a stalled stream cannot overrun the deadline.
+
+    Args:
+        stream (Iterator[Response]): The responses to monitor.
+        condition (StopCondition): When to stop.
+        token_counter (Optional[TokenCounter]): Counter for `max_tokens`.
+        chat (bool): Whether the stream yields `ChatResponse`s.
+    """
+    monitor = StopMonitor(condition, token_counter)
+    pump = None
+    deadline = 0.0
+    if condition.max_time is not None:
+        pump = _Pump(stream)
+        deadline = time.monotonic() + condition.max_time
+    last: Optional[Response] = None
+    try:
+        while monitor.reason is None:
+            if pump is None:
+                response = next(stream, _END)
+            else:
+                try:
+                    response = pump.get(deadline - time.monotonic())
+                except queue.Empty:
+                    monitor.stop(MAX_TIME)
+                    yield _rebuild(last, monitor, "", chat)
+                    return
+            if response is _END:
+                text = monitor.flush()
+                if text:
+                    yield _rebuild(last, monitor, text, chat)
+                return
+            last = response
+            passed = _apply(monitor, response, chat)
+            if passed is not None:
+                yield passed
+    finally:
+        if pump is not None:
+            pump.close()
+        else:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+
+async def astop_stream(
+    stream: AsyncIterator[Response],
+    condition: StopCondition,
+    token_counter: Optional[TokenCounter] = None,
+    chat: bool = True,
+) -> AsyncGenerator[Response, None]:
+    """
+    Async version of `stop_stream`.
+
+    A `max_time` deadline cancels the pending read, which unwinds and
+    closes the stream immediately.
+    """
+    monitor = StopMonitor(condition, token_counter)
+    deadline = None
+    if condition.max_time is not None:
+        deadline = time.monotonic() + condition.max_time
+    last: Optional[Response] = None
+    try:
+        while monitor.reason is None:
+            try:
+                if deadline is None:
+                    response = await stream.__anext__()
+                else:
+                    response = await asyncio.wait_for(
+                        stream.__anext__(), max(deadline - time.monotonic(), 0.0)
+                    )
+            except StopAsyncIteration:
+                text = monitor.flush()
+                if text:
+                    yield _rebuild(last, monitor, text, chat)
+                return
+            except asyncio.TimeoutError:
+                monitor.stop(MAX_TIME)
+                yield _rebuild(last, monitor, "", chat)
+                return
+            last = response
+            passed = _apply(monitor, response, chat)
+            if passed is not None:
+                yield passed
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,181 @@
+"""Low-overhead streaming primitives for ASI responses."""
+
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+_DONE = b"[DONE]"
+
+
+class SSEDecoder:
+    """
+    Incremental server-sent events decoder working on raw bytes.
+
+    Bytes are appended to a single buffer and complete events are sliced out
+    of it, so no intermediate strings are built per network chunk. Only the
+    `data` field is kept; multi-line data is joined with newlines.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        # Where to resume looking for the end of the pending event.
+        self._scan = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Add `chunk` and return the payloads of the events it completed."""
+        buffer = self._buffer
+        if chunk.startswith(b"\n") and buffer.endswith(b"\r"):
+            # The CR of a CRLF ending the previous chunk.
+            del buffer[-1]
+        if b"\r" in chunk:
+            # Normalize CRLF framing in the new bytes only; a trailing lone CR
+            # is resolved by the next feed.
+            chunk = chunk.replace(b"\r\n", b"\n")
+        buffer += chunk
+
+        payloads = []
+        start = 0
+        while True:
+            end = buffer.find(b"\n\n", max(start, self._scan))
+            if end == -1:
+                break
+            data = _event_data(buffer, start, end)
+            if data is not None:
+                payloads.append(data)
+            start = end + 2
+        if start:
+            del buffer[:start]
+        # Bytes already scanned cannot end an event, except the last one
+        # (with a possibly dropped CR) before the next chunk.
+        self._scan = max(len(buffer) - 2, 0)
+        return payloads
+
+
+def _event_data(buffer: bytearray, start: int, end: int) -> Optional[bytes]:
+    lines = []
+    while start < end:
+        line_end = buffer.find(b"\n", start, end)
+        if line_end == -1:
+            line_end = end
+        if buffer.startswith(b"data:", start, line_end):
+            value_start = start + 5
+            if buffer[value_start : value_start + 1] == b" ":
+                value_start += 1
+            lines.append(bytes(buffer[value_start:line_end]))
+        start = line_end + 1
+    if not lines:
+        return None
+    return lines[0] if len(lines) == 1 else b"\n".join(lines)
+
+
+class _DeltaState:
+    """Bookkeeping shared by the sync and async delta streams."""
+
+    def __init__(self) -> None:
+        self._decoder = SSEDecoder()
+        self._deltas: List[str] = []
+        self._text: Optional[str] = None
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """Everything streamed so far, joined only when asked for."""
+        if self._text is None or len(self._deltas) > 1:
+            self._text = "".join(self._deltas)
+            self._deltas = [self._text]
+        return self._text
+
+    def _decode(self, chunk: bytes) -> List[str]:
+        deltas = []
+        for payload in self._decoder.feed(chunk):
+            if payload == _DONE:
+                self.done = True
+                break
+            event = json.loads(payload)
+            if "error" in event:
+                raise ValueError(f"ASI stream returned an error: {event['error']}")
+            if event.get("usage"):
+                self.usage = event["usage"]
+            choices = event.get("choices")
+            if not choices:
+                continue
+            choice = choices[0]
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+            delta = choice.get("delta")
+            if delta is not None:
+                content = delta.get("content")
+            else:
+                content = choice.get("text")
+            if content:
+                deltas.append(content)
+        self._deltas.extend(deltas)
+        return deltas
+
+
+class DeltaStream(_DeltaState):
+    """
+    Iterator over the text deltas of a streamed ASI response.
+
+    Unlike `stream_chat`, no response object is built per chunk and the
+    accumulated text is only joined when `text` is read.
+
+    Args:
+        chunks (Iterator[bytes]): Raw SSE bytes as received from the server.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        super().__init__()
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for chunk in self._chunks:
+                yield from self._decode(chunk)
+                if self.done:
+                    break
+        finally:
+            self.close()
+
+    def read(self) -> str:
+        """Consume the rest of the stream and return the full text."""
+        for _ in self:
+            pass
+        return self.text
+
+    def close(self) -> None:
+        """Stop streaming and release the underlying connection."""
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class AsyncDeltaStream(_DeltaState):
+    """Async version of `DeltaStream`."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        super().__init__()
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        try:
+            async for chunk in self._chunks:
+                for delta in self._decode(chunk):
+                    yield delta
+                if self.done:
+                    break
+        finally:
+            await self.aclose()
+
+    async def read(self) -> str:
+        """Consume the rest of the stream and return the full text."""
+        async for _ in self:
+            pass
+        return self.text
+
+    async def aclose(self) -> None:
+        """Stop streaming and release the underlying connection."""
+        aclose = getattr(self._chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,381 @@
+"""Incremental parsing of JSON and JSON Lines from streamed ASI output."""
+
+import bisect
+import collections.abc
+import json
+import re
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from llama_index.core.bridge.pydantic import BaseModel, TypeAdapter, ValidationError
+
+Path = Tuple[Union[str, int], ...]
+
+# Characters that can change the parser state. Everything else is skipped by
+# the regex engine rather than inspected one by one.
+_SPECIAL = re.compile(r'["\\{}\[\],]')
+_CLOSING = {"}": "{", "]": "["}
+_SEQUENCES = (
+    list,
+    set,
+    frozenset,
+    collections.abc.Sequence,
+    collections.abc.MutableSequence,
+    collections.abc.Set,
+    collections.abc.MutableSet,
+)
+
+
+def _item_type(schema: Any) -> Optional[Any]:
+    """The element type of a list or sequence schema, or None for others."""
+    if schema in (list, tuple, set, frozenset):
+        return Any
+    origin = get_origin(schema)
+    args = get_args(schema)
+    if origin in _SEQUENCES:
+        return args[0] if args else Any
+    if origin is tuple and len(args) == 2 and args[1] is Ellipsis:
+        return args[0]
+    return None
+
+
+class StructuredOutputError(ValueError):
+    """
+    Streamed output is not valid JSON or does not match the schema.
+
+    Args:
+        message (str): What is wrong.
+        text (str): The output received up to the error.
+    """
+
+    def __init__(self, message: str, text: str = "") -> None:
+        super().__init__(message)
+        self.text = text
+
+
+class StructuredItem:
+    """
+    A value that finished streaming.
+
+    Args:
+        path (Path): Where the value sits: `(key,)` for a field of a top-level
+            object, `(index,)` for an element of a top-level array, and `()`
+            for a whole document (or JSON Lines record).
+        value (Any): The parsed value, validated against the schema where one
+            applies.
+    """
+
+    __slots__ = ("path", "value")
+
+    def __init__(self, path: Path, value: Any) -> None:
+        self.path = path
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"StructuredItem(path={self.path!r}, value={self.value!r})"
+
+
+class JSONStreamParser:
+    """
+    Incremental JSON / JSON Lines parser emitting values as soon as they close.
+
+    Text outside of documents (prose, Markdown code fences) is skipped.
+    Documents are JSON objects or arrays. Each field of a top-level object and
+    each element of a top-level array is emitted once it is complete, and the
+    document itself once it closes.
+
+    With a `schema`, every record is validated: the document in JSON mode, or
+    each element when the document is an array, and each document in JSON
+    Lines mode. Elements are validated against the item type of a list or
+    sequence schema (`List[Item]`), and the document against the schema
+    itself; any other schema applies to each element. When the schema is a
+    Pydantic model, fields of a top-level object are also validated as they
+    close, so bad output fails fast.
+
+    Args:
+        schema (Optional[Any]): A Pydantic model or any type `TypeAdapter`
+            accepts.
+        json_lines (bool): Parse a sequence of documents rather than one.
+    """
+
+    def __init__(self, schema: Optional[Any] = None, json_lines: bool = False) -> None:
+        self.schema = schema
+        self.json_lines = json_lines
+        self.done = False
+        self._adapter = TypeAdapter(schema) if schema is not None else None
+        self._item_adapter = self._adapter
+        self._sequence_schema = False
+        item_type = _item_type(schema)
+        if item_type is not None:
+            self._item_adapter = TypeAdapter(item_type)
+            self._sequence_schema = True
+        self._field_adapters: Dict[str, Optional[TypeAdapter]] = {}
+        # The stream is kept once, as its deltas and their start offsets;
+        # positions below are offsets into the whole stream.
+        self._chunks: List[str] = []
+        self._starts: List[int] = []
+        self._length = 0
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._doc_start = 0
+        self._member_start = 0
+        self._member_emitted = False
+        self._index = 0
+        self._records: List[Any] = []
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return "".join(self._chunks)
+
+    def _slice(self, start: int, end: int) -> str:
+        """The text fed between the stream offsets `start` and `end`."""
+        first = bisect.bisect_right(self._starts, start) - 1
+        last = bisect.bisect_left(self._starts, end)
+        text = "".join(self._chunks[first:last])
+        offset = self._starts[first]
+        return text[start - offset : end - offset]
+
+    def _fail(self, message: str) -> StructuredOutputError:
+        self.done = True
+        return StructuredOutputError(message, self.text)
+
+    def feed(self, delta: str) -> List[StructuredItem]:
+        """Add streamed text and return the values it completed."""
+        if self.done or not delta:
+            return []
+        base = self._length
+        self._chunks.append(delta)
+        self._starts.append(base)
+        self._length += len(delta)
+        items: List[StructuredItem] = []
+        # `_pos` may be past this delta's start after a trailing backslash.
+        pos = self._pos - base
+        while not self.done:
+            match = _SPECIAL.search(delta, pos)
+            if match is None:
+                break
+            k = match.start()
+            c = delta[k]
+            pos = k + 1
+            k += base
+            if self._in_string:
+                if c == "\\":
+                    # Skip the escaped character, possibly in the next delta.
+                    pos += 1
+                elif c == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._member(base + pos, items, final=False)
+                continue
+            if not self._stack:
+                if c in "{[":
+                    self._stack.append(c)
+                    self._doc_start = k
+                    self._member_start = k + 1
+                    self._member_emitted = False
+                    self._index = 0
+                continue
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._stack.append(c)
+            elif c in "}]":
+                if self._stack[-1] != _CLOSING[c]:
+                    raise self._fail(f"Unexpected {c!r} in streamed JSON.")
+                if len(self._stack) == 1:
+                    self._member(k, items, final=True)
+                    self._stack.pop()
+                    items.append(self._document(self._slice(self._doc_start, k + 1)))
+                    if not self.json_lines:
+                        self.done = True
+                else:
+                    self._stack.pop()
+                    if len(self._stack) == 1:
+                        self._member(base + pos, items, final=False)
+            elif c == "," and len(self._stack) == 1:
+                self._member(k, items, final=True)
+                self._member_start = k + 1
+                self._member_emitted = False
+                self._index += 1
+        self._pos = max(base + pos, self._length)
+        return items
+
+    def _member(self, end: int, items: List[StructuredItem], final: bool) -> None:
+        """Emit the current field or element of the document if it is complete."""
+        if self._member_emitted:
+            return
+        member = self._slice(self._member_start, end).strip()
+        if not member:
+            if final and self._index:
+                raise self._fail("Empty member in streamed JSON.")
+            return
+        in_object = self._stack[0] == "{"
+        try:
+            value = json.loads("{" + member + "}" if in_object else member)
+        except ValueError:
+            if final:
+                raise self._fail(f"Invalid JSON member: {member[:80]!r}")
+            return
+        self._member_emitted = True
+        if in_object:
+            ((key, value),) = value.items()
+            items.append(StructuredItem((key,), self._validate_field(key, value)))
+        else:
+            if self._item_adapter is not None and not self.json_lines:
+                value = self._validate(self._item_adapter, value)
+                self._records.append(value)
+            items.append(StructuredItem((self._index,), value))
+
+    def _document(self, raw: str) -> StructuredItem:
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            raise self._fail(f"Invalid JSON document: {e}")
+        if self._adapter is not None:
+            if isinstance(value, list) and not self.json_lines:
+                # Elements were validated as they closed.
+                value = self._records
+                if self._sequence_schema:
+                    value = self._validate(self._adapter, value)
+            else:
+                value = self._validate(self._adapter, value)
+        return StructuredItem((), value)
+
+    def _validate(self, adapter: TypeAdapter, value: Any) -> Any:
+        try:
+            return adapter.validate_python(value)
+        except ValidationError as e:
+            raise self._fail(f"Streamed JSON does not match the schema: {e}")
+
+    def _validate_field(self, key: str, value: Any) -> Any:
+        schema = self.schema
+        if self.json_lines or not (
+            isinstance(schema, type) and issubclass(schema, BaseModel)
+        ):
+            return value
+        if key not in self._field_adapters:
+            fields = {f.alias or name: f for name, f in schema.model_fields.items()}
+            field = fields.get(key)
+            if field is None and schema.model_config.get("extra") == "forbid":
+                raise self._fail(f"Unexpected field {key!r} in streamed JSON.")
+            adapter = TypeAdapter(field.annotation) if field is not None else None
+            self._field_adapters[key] = adapter
+        adapter = self._field_adapters[key]
+        return value if adapter is None else self._validate(adapter, value)
+
+    def finish(self) -> None:
+        """Check that the stream did not end inside or before a document."""
+        if self._stack:
+            raise self._fail("Stream ended inside a JSON document.")
+        if not self.json_lines and not self.done:
+            raise self._fail("Stream ended without a JSON document.")
+        self.done = True
+
+
+class StructuredStream:
+    """
+    Iterator of `StructuredItem`s parsed from a stream of text deltas.
+
+    In JSON mode the upstream stream is closed as soon as the document ends,
+    and on any parse or validation error, so no further tokens are paid for.
+
+    Args:
+        deltas (Iterable[str]): Text deltas, e.g. a `DeltaStream`.
+        schema (Optional[Any]): See `JSONStreamParser`.
+        json_lines (bool): See `JSONStreamParser`.
+    """
+
+    def __init__(
+        self,
+        deltas: Iterable[str],
+        schema: Optional[Any] = None,
+        json_lines: bool = False,
+    ) -> None:
+        self.parser = JSONStreamParser(schema, json_lines)
+        self._deltas = deltas
+
+    @property
+    def text(self) -> str:
+        """The output received so far."""
+        return self.parser.text
+
+    def __iter__(self) -> Iterator[StructuredItem]:
+        try:
+            for delta in self._deltas:
+                yield from self.parser.feed(delta)
+                if self.parser.done:
+                    return
+            self.parser.finish()
+        finally:
+            self.close()
+
+    def result(self) -> Any:
+        """Consume the stream and return the last document (or record)."""
+        value = None
+        for item in self:
+            if not item.path:
+                value = item.value
+        return value
+
+    def close(self) -> None:
+        """Stop streaming and release the underlying connection."""
+        close = getattr(self._deltas, "close", None)
+        if close is not None:
+            close()
+
+
+class AsyncStructuredStream:
+    """Async version of `StructuredStream`."""
+
+    def __init__(
+        self,
+        deltas: AsyncIterable[str],
+        schema: Optional[Any] = None,
+        json_lines: bool = False,
+    ) -> None:
+        self.parser = JSONStreamParser(schema, json_lines)
+        self._deltas = deltas
+
+    @property
+    def text(self) -> str:
+        """The output received so far."""
+        return self.parser.text
+
+    async def __aiter__(self) -> AsyncIterator[StructuredItem]:
+        try:
+            async for delta in self._deltas:
+                for item in self.parser.feed(delta):
+                    yield item
+                if self.parser.done:
+                    return
+            self.parser.finish()
+        finally:
+            await self.aclose()
+
+    async def result(self) -> Any:
+        """Consume the stream and return the last document (or record)."""
+        value = None
+        async for item in self:
+            if not item.path:
+                value = item.value
+        return value
+
+    async def aclose(self) -> None:
+        """Stop streaming and release the underlying connection."""
+        aclose = getattr(self._deltas, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,651 @@
+"""Per-call timings and token counts of ASI requests, and sinks to export them."""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import httpx
+
+from llama_index_llms_asi.hedging import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+TIMINGS = (
+    "duration",
+    "serialize",
+    "connection_wait",
+    "time_to_first_byte",
+    "time_to_first_token",
+    "stream_duration",
+    "parse",
+)
+
+DEFAULT_PROMETHEUS_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_CURRENT_CALL: ContextVar[Optional["CallMetrics"]] = ContextVar(
+    "asi_current_call", default=None
+)
+
+
+class CallMetrics:
+    """
+    Timings (in seconds) and counters of one ASI call.
+
+    Timings that could not be observed, e.g. transport timings when a custom
+    `http_client` is used or stream timings of a non-streaming call, are None.
+
+    Attributes:
+        operation (str): The ASI method, e.g. "chat" or "astream_chat".
+        model (str): The requested model.
+        start (float): Unix time at which the call started.
+        duration (Optional[float]): Total time of the call.
+        serialize (Optional[float]): Time from the call start until the
+            first HTTP request reached the transport.
+        connection_wait (Optional[float]): Time the last attempt waited for
+            a pooled connection (including connecting and rate limiting).
+        time_to_first_byte (Optional[float]): Time from the request being
+            sent to the response headers arriving.
+        time_to_first_token (Optional[float]): Time from the call start to the
+            first streamed chunk.
+        stream_duration (Optional[float]): Time from the first to the last
+            streamed chunk.
+        parse (Optional[float]): Time from the response body being read to
+            the response object being returned.
+        prompt_tokens (Optional[int]): Prompt tokens reported by the server.
+        completion_tokens (Optional[int]): Completion tokens reported by the
+            server.
+        cache_hit (Optional[bool]): Whether the response cache answered the
+            call, or None when no cache is configured.
+        attempts (int): Number of HTTP requests sent for the call.
+        status_code (Optional[int]): HTTP status of the last attempt.
+        error (Optional[str]): Exception type name if the call failed.
+    """
+
+    __slots__ = (
+        "operation",
+        "model",
+        "start",
+        "duration",
+        "serialize",
+        "connection_wait",
+        "time_to_first_byte",
+        "time_to_first_token",
+        "stream_duration",
+        "parse",
+        "prompt_tokens",
+        "completion_tokens",
+        "cache_hit",
+        "attempts",
+        "status_code",
+        "error",
+        "_t0",
+        "_attempt_start",
+        "_sent",
+        "_body_done",
+        "_first_chunk",
+    )
+
+    def __init__(self, operation: str, model: str) -> None:
+        self.operation = operation
+        self.model = model
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.serialize: Optional[float] = None
+        self.connection_wait: Optional[float] = None
+        self.time_to_first_byte: Optional[float] = None
+        self.time_to_first_token: Optional[float] = None
+        self.stream_duration: Optional[float] = None
+        self.parse: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.cache_hit: Optional[bool] = None
+        self.attempts = 0
+        self.status_code: Optional[int] = None
+        self.error: Optional[str] = None
+        self._t0 = time.perf_counter()
+        self._attempt_start = self._t0
+        self._sent = self._t0
+        self._body_done: Optional[float] = None
+        self._first_chunk: Optional[float] = None
+
+    @property
+    def retries(self) -> int:
+        """Number of HTTP requests sent on top of the first one."""
+        return max(self.attempts - 1, 0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if not name.startswith("_")
+        }
+
+    # Transport events.
+
+    def start_attempt(self) -> None:
+        now = time.perf_counter()
+        self.attempts += 1
+        self._attempt_start = now
+        self._body_done = None
+        if self.serialize is None:
+            self.serialize = now - self._t0
+
+    def trace(self, name: str, info: Dict[str, Any]) -> None:
+        """httpcore `trace` extension callback."""
+        event = name.partition(".")[2]
+        if event == "send_request_headers.started":
+            self.connection_wait = time.perf_counter() - self._attempt_start
+        elif event == "send_request_body.complete":
+            self._sent = time.perf_counter()
+        elif event == "receive_response_headers.complete":
+            self.time_to_first_byte = time.perf_counter() - self._sent
+        elif event == "receive_response_body.complete":
+            self._body_done = time.perf_counter()
+
+    async def atrace(self, name: str, info: Dict[str, Any]) -> None:
+        self.trace(name, info)
+
+    # Call events.
+
+    def on_chunk(self) -> None:
+        if self._first_chunk is None:
+            self._first_chunk = time.perf_counter()
+            self.time_to_first_token = self._first_chunk - self._t0
+
+    def finish(
+        self, response: Any = None, error: Optional[BaseException] = None
+    ) -> None:
+        now = time.perf_counter()
+        self.duration = now - self._t0
+        if error is not None:
+            self.error = type(error).__name__
+        if self._first_chunk is not None:
+            self.stream_duration = now - self._first_chunk
+        elif self._body_done is not None:
+            self.parse = now - self._body_done
+        if response is not None:
+            usage = getattr(response, "additional_kwargs", None) or {}
+            self.prompt_tokens = usage.get("prompt_tokens", self.prompt_tokens)
+            self.completion_tokens = usage.get(
+                "completion_tokens", self.completion_tokens
+            )
+
+
+def current_call() -> Optional[CallMetrics]:
+    """The call being recorded in the current context, if any."""
+    return _CURRENT_CALL.get()
+
+
+def record_cache_lookup(hit: bool) -> None:
+    """Note a response cache hit or miss on the current call."""
+    call = _CURRENT_CALL.get()
+    if call is not None:
+        call.cache_hit = hit
+
+
+class TelemetrySink(ABC):
+    """Receives the metrics of every finished ASI call."""
+
+    @abstractmethod
+    def emit(self, call: CallMetrics) -> None:
+        """Handle the metrics of a finished call."""
+
+
+def _emit(sink: TelemetrySink, call: CallMetrics) -> None:
+    try:
+        sink.emit(call)
+    except Exception:
+        logger.exception("ASI telemetry sink %r failed", sink)
+
+
+def _error(e: BaseException) -> Optional[BaseException]:
+    # Closing a stream early is not a failure.
+    return None if isinstance(e, GeneratorExit) else e
+
+
+def record_call(
+    sink: TelemetrySink,
+    call: CallMetrics,
+    fn: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> Any:
+    """Run `fn` with `call` as the current call and emit it to `sink`."""
+    token = _CURRENT_CALL.set(call)
+    try:
+        response = fn(*args, **kwargs)
+    except BaseException as e:
+        call.finish(error=e)
+        _emit(sink, call)
+        raise
+    finally:
+        _CURRENT_CALL.reset(token)
+    call.finish(response)
+    _emit(sink, call)
+    return response
+
+
+async def arecord_call(
+    sink: TelemetrySink,
+    call: CallMetrics,
+    fn: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> Any:
+    """Async version of `record_call`."""
+    token = _CURRENT_CALL.set(call)
+    try:
+        response = await fn(*args, **kwargs)
+    except BaseException as e:
+        call.finish(error=e)
+        _emit(sink, call)
+        raise
+    finally:
+        _CURRENT_CALL.reset(token)
+    call.finish(response)
+    _emit(sink, call)
+    return response
+
+
+def record_stream(
+    sink: TelemetrySink,
+    call: CallMetrics,
+    fn: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> Generator[Any, None, None]:
+    """
+    Open the stream returned by `fn` and record it until it is exhausted.
+
+    `call` is only made current while the underlying stream runs, so it does
+    not leak into the consumer's context between chunks.
+    """
+    token = _CURRENT_CALL.set(call)
+    try:
+        stream = fn(*args, **kwargs)
+    except BaseException as e:
+        call.finish(error=e)
+        _emit(sink, call)
+        raise
+    finally:
+        _CURRENT_CALL.reset(token)
+    return _recorded_stream(sink, call, stream)
+
+
+def _recorded_stream(
+    sink: TelemetrySink, call: CallMetrics, stream: Generator[Any, None, None]
+) -> Generator[Any, None, None]:
+    last = None
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            token = _CURRENT_CALL.set(call)
+            try:
+                chunk = next(stream)
+            except StopIteration:
+                break
+            finally:
+                _CURRENT_CALL.reset(token)
+            call.on_chunk()
+            last = chunk
+            yield chunk
+    except BaseException as e:
+        error = _error(e)
+        raise
+    finally:
+        stream.close()
+        call.finish(last, error)
+        _emit(sink, call)
+
+
+async def arecord_stream(
+    sink: TelemetrySink,
+    call: CallMetrics,
+    fn: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> AsyncGenerator[Any, None]:
+    """Async version of `record_stream`."""
+    token = _CURRENT_CALL.set(call)
+    try:
+        stream = await fn(*args, **kwargs)
+    except BaseException as e:
+        call.finish(error=e)
+        _emit(sink, call)
+        raise
+    finally:
+        _CURRENT_CALL.reset(token)
+    return _arecorded_stream(sink, call, stream)
+
+
+async def _arecorded_stream(
+    sink: TelemetrySink, call: CallMetrics, stream: AsyncGenerator[Any, None]
+) -> AsyncGenerator[Any, None]:
+    last = None
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            token = _CURRENT_CALL.set(call)
+            try:
+                chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _CURRENT_CALL.reset(token)
+            call.on_chunk()
+            last = chunk
+            yield chunk
+    except BaseException as e:
+        error = _error(e)
+        raise
+    finally:
+        await stream.aclose()
+        call.finish(last, error)
+        _emit(sink, call)
+
+
+class TracingTransport(httpx.BaseTransport):
+    """Feeds httpcore trace events of each request to the current call."""
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        call = _CURRENT_CALL.get()
+        if call is None:
+            return self._transport.handle_request(request)
+        call.start_attempt()
+        request.extensions.setdefault("trace", call.trace)
+        response = self._transport.handle_request(request)
+        call.status_code = response.status_code
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncTracingTransport(httpx.AsyncBaseTransport):
+    """Async version of `TracingTransport`."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        call = _CURRENT_CALL.get()
+        if call is None:
+            return await self._transport.handle_async_request(request)
+        call.start_attempt()
+        request.extensions.setdefault("trace", call.atrace)
+        response = await self._transport.handle_async_request(request)
+        call.status_code = response.status_code
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class CallbackSink(TelemetrySink):
+    """
+    Passes every finished call to a user callback.
+
+    Args:
+        callback (Callable[[CallMetrics], None]): Called once per call.
+    """
+
+    def __init__(self, callback: Callable[[CallMetrics], None]) -> None:
+        self.callback = callback
+
+    def emit(self, call: CallMetrics) -> None:
+        self.callback(call)
+
+
+class MultiSink(TelemetrySink):
+    """Emits every call to several sinks."""
+
+    def __init__(self, *sinks: TelemetrySink) -> None:
+        self.sinks = sinks
+
+    def emit(self, call: CallMetrics) -> None:
+        for sink in self.sinks:
+            _emit(sink, call)
+
+
+class HistogramSink(TelemetrySink):
+    """
+    Aggregates calls in memory: a latency histogram per timing plus counters.
+
+    Examples:
+        ```python
+        sink = HistogramSink()
+        llm = ASI(model="asi1-mini", telemetry=sink)
+        llm.complete("Hello")
+        print(sink.summary())
+        ```
+    """
+
+    def __init__(self) -> None:
+        self.histograms = {name: LatencyHistogram() for name in TIMINGS}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _incr(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def emit(self, call: CallMetrics) -> None:
+        for name, histogram in self.histograms.items():
+            value = getattr(call, name)
+            if value is not None:
+                histogram.record(value)
+        with self._lock:
+            self._incr("calls")
+            self._incr("retries", call.retries)
+            if call.error is not None:
+                self._incr("errors")
+            if call.cache_hit is not None:
+                self._incr("cache_hits" if call.cache_hit else "cache_misses")
+            if call.prompt_tokens:
+                self._incr("prompt_tokens", call.prompt_tokens)
+            if call.completion_tokens:
+                self._incr("completion_tokens", call.completion_tokens)
+
+    def percentile(self, timing: str, q: float) -> Optional[float]:
+        """Get the `q` percentile of `timing`, one of `TIMINGS`."""
+        return self.histograms[timing].percentile(q)
+
+    def summary(
+        self, percentiles: Sequence[float] = (0.5, 0.95, 0.99)
+    ) -> Dict[str, Any]:
+        """Counters and timing percentiles, keyed like "duration_p95"."""
+        summary: Dict[str, Any] = dict(self.counters)
+        for name, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            for q in percentiles:
+                summary[f"{name}_p{q * 100:g}"] = histogram.percentile(q)
+        return summary
+
+
+class PrometheusSink(TelemetrySink):
+    """
+    Keeps Prometheus histograms and counters, labelled by operation and model.
+
+    Serve the output of `render` from a `/metrics` endpoint.
+
+    Args:
+        namespace (str): Prefix of every metric name.
+        buckets (Sequence[float]): Upper bounds of the latency buckets.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "asi",
+        buckets: Sequence[float] = DEFAULT_PROMETHEUS_BUCKETS,
+    ) -> None:
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        # (timing, labels) -> [bucket counts..., sum, count]
+        self._histograms: Dict[Tuple[str, Tuple[str, ...]], List[float]] = {}
+        self._counters: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        self._lock = threading.Lock()
+
+    def emit(self, call: CallMetrics) -> None:
+        labels = (call.operation, call.model)
+        with self._lock:
+            for name in TIMINGS:
+                value = getattr(call, name)
+                if value is None:
+                    continue
+                series = self._histograms.get((name, labels))
+                if series is None:
+                    series = self._histograms[(name, labels)] = [0.0] * (
+                        len(self.buckets) + 2
+                    )
+                for i, bound in enumerate(self.buckets):
+                    if value <= bound:
+                        series[i] += 1
+                series[-2] += value
+                series[-1] += 1
+
+            status = "error" if call.error is not None else "ok"
+            self._add("requests_total", labels + (status,), 1)
+            self._add("retries_total", labels, call.retries)
+            if call.cache_hit is not None:
+                result = "hit" if call.cache_hit else "miss"
+                self._add("cache_lookups_total", labels + (result,), 1)
+            if call.prompt_tokens:
+                self._add("tokens_total", labels + ("prompt",), call.prompt_tokens)
+            if call.completion_tokens:
+                self._add(
+                    "tokens_total", labels + ("completion",), call.completion_tokens
+                )
+
+    def _add(self, name: str, labels: Tuple[str, ...], amount: float) -> None:
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    _COUNTER_LABELS = {
+        "requests_total": ("operation", "model", "status"),
+        "retries_total": ("operation", "model"),
+        "cache_lookups_total": ("operation", "model", "result"),
+        "tokens_total": ("operation", "model", "type"),
+    }
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        seen = set()
+        for (name, labels), series in histograms:
+            metric = f"{self.namespace}_{name}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            base = _labels(("operation", "model"), labels)
+            for bound, count in zip(self.buckets, series):
+                le = _labels(("operation", "model", "le"), labels + (f"{bound:g}",))
+                lines.append(f"{metric}_bucket{le} {count:g}")
+            inf = _labels(("operation", "model", "le"), labels + ("+Inf",))
+            lines.append(f"{metric}_bucket{inf} {series[-1]:g}")
+            lines.append(f"{metric}_sum{base} {series[-2]!r}")
+            lines.append(f"{metric}_count{base} {series[-1]:g}")
+
+        for (name, labels), value in counters:
+            metric = f"{self.namespace}_{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            names = self._COUNTER_LABELS[name]
+            lines.append(f"{metric}{_labels(names, labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class OpenTelemetrySink(TelemetrySink):
+    """
+    Records every call as an OpenTelemetry span with GenAI attributes.
+
+    Spans are created when a call finishes, with their start and end times
+    set to those of the call.
+
+    Args:
+        tracer (Optional[Any]): An OpenTelemetry `Tracer`. Defaults to the
+            tracer of this module from the global tracer provider, which
+            requires `opentelemetry-api`.
+    """
+
+    def __init__(self, tracer: Optional[Any] = None) -> None:
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError as e:
+                raise ImportError(
+                    "OpenTelemetrySink requires `opentelemetry-api`. "
+                    "Install it with `pip install opentelemetry-api`."
+                ) from e
+            tracer = trace.get_tracer(__name__)
+        self.tracer = tracer
+
+    def emit(self, call: CallMetrics) -> None:
+        attributes: Dict[str, Any] = {
+            "gen_ai.system": "asi",
+            "gen_ai.operation.name": call.operation,
+            "gen_ai.request.model": call.model,
+            "asi.attempts": call.attempts,
+        }
+        if call.prompt_tokens is not None:
+            attributes["gen_ai.usage.input_tokens"] = call.prompt_tokens
+        if call.completion_tokens is not None:
+            attributes["gen_ai.usage.output_tokens"] = call.completion_tokens
+        if call.cache_hit is not None:
+            attributes["asi.cache_hit"] = call.cache_hit
+        if call.status_code is not None:
+            attributes["http.response.status_code"] = call.status_code
+        if call.error is not None:
+            attributes["error.type"] = call.error
+        for name in TIMINGS[1:]:
+            value = getattr(call, name)
+            if value is not None:
+                attributes[f"asi.{name}"] = value
+
+        start = int(call.start * 1e9)
+        span = self.tracer.start_span(
+            f"{call.operation} {call.model}", start_time=start, attributes=attributes
+        )
+        span.end(end_time=start + int((call.duration or 0.0) * 1e9))
@@ -0,0 +1,220 @@
+"""Local token counting and prompt budgeting for ASI requests."""
+
+import functools
+import re
+from typing import Any, List, Optional, Sequence, TypeVar
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+
+DEFAULT_COUNT_CACHE_SIZE = 8192
+
+# Per-message framing overhead and reply priming of OpenAI-style chat formats.
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+# Tokens separating packed nodes (a blank line).
+NODE_SEPARATOR_TOKENS = 1
+
+_PIECES = re.compile(r"[A-Za-z]+|\d+|\s+|[^\sA-Za-z\d]")
+
+N = TypeVar("N")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the BPE token count of `text` without a tokenizer.
+
+    Words of up to 8 letters count as one token and longer words as one per
+    4 letters, numbers as one per 3 digits, non-ASCII characters (such as
+    CJK) as 1.5 each and every other non-space character as one. This errs
+    on the high side, so budgets computed with it stay within the real limit.
+    """
+    tokens = 0
+    wide = 0
+    for piece in _PIECES.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += 1 if len(piece) <= 8 else (len(piece) + 3) // 4
+        elif first.isdigit() and first.isascii():
+            tokens += (len(piece) + 2) // 3
+        elif first.isspace():
+            tokens += piece != " "
+        elif first.isascii():
+            tokens += 1
+        else:
+            wide += len(piece)
+    return tokens + (3 * wide + 1) // 2
+
+
+class TokenCounter:
+    """
+    Counts tokens locally, memoizing the count of every string seen.
+
+    Chat histories and retrieved nodes are mostly re-sent unchanged, so
+    repeated budgeting only pays for the strings that are new.
+
+    Args:
+        tokenizer (Optional[Any]): An object with an `encode(text)` method (e.g.
+            a `tiktoken` encoding) for exact counts. Defaults to the
+            `estimate_tokens` heuristic.
+        cache_size (int): Number of distinct strings whose count is kept.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Optional[Any] = None,
+        cache_size: int = DEFAULT_COUNT_CACHE_SIZE,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self._cached_count = functools.lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text))
+
+    def count(self, text: Optional[str]) -> int:
+        """Count the tokens of `text`."""
+        if not text:
+            return 0
+        return self._cached_count(text)
+
+    def count_messages(self, messages: Sequence[ChatMessage]) -> int:
+        """Count the prompt tokens of a chat request with `messages`."""
+        total = REPLY_PRIMING_TOKENS
+        for message in messages:
+            total += MESSAGE_OVERHEAD_TOKENS + self.count(message.content)
+        return total
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Get the longest prefix of `text` with at most `max_tokens` tokens."""
+        if self.count(text) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            # Prefixes are counted uncached so they do not evict real entries.
+            if self._count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+    def clear(self) -> None:
+        """Forget all memoized counts."""
+        self._cached_count.cache_clear()
+
+
+_DEFAULT_COUNTER = TokenCounter()
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the process-wide heuristic token counter."""
+    return _DEFAULT_COUNTER
+
+
+def fit_messages(
+    messages: Sequence[ChatMessage],
+    budget: int,
+    counter: Optional[TokenCounter] = None,
+) -> List[ChatMessage]:
+    """
+    Trim a chat history to at most `budget` prompt tokens.
+
+    System messages are always kept. Other messages are kept newest first
+    while they fit; the newest message is always kept and, if it does not fit
+    on its own, its content is truncated. Tool results whose assistant call
+    was dropped are dropped as well.
+
+    Args:
+        messages (Sequence[ChatMessage]): The chat history, oldest first.
+        budget (int): Maximum prompt tokens.
+        counter (Optional[TokenCounter]): Counter to use. Defaults to the
+            process-wide heuristic counter.
+
+    Returns:
+        List[ChatMessage]: The kept messages, in their original order.
+
+    Raises:
+        ValueError: If the system messages alone exceed `budget`.
+    """
+    counter = counter or _DEFAULT_COUNTER
+    if counter.count_messages(messages) <= budget:
+        return list(messages)
+
+    system = [i for i, m in enumerate(messages) if m.role == MessageRole.SYSTEM]
+    remaining = budget - counter.count_messages([messages[i] for i in system])
+    if remaining < MESSAGE_OVERHEAD_TOKENS:
+        raise ValueError(
+            f"System messages alone exceed the prompt budget of {budget} tokens."
+        )
+
+    kept = set(system)
+    newest = True
+    for i in range(len(messages) - 1, -1, -1):
+        if i in kept:
+            continue
+        message = messages[i]
+        cost = MESSAGE_OVERHEAD_TOKENS + counter.count(message.content)
+        if cost <= remaining:
+            kept.add(i)
+            remaining -= cost
+        elif newest:
+            content = counter.truncate(
+                message.content or "", remaining - MESSAGE_OVERHEAD_TOKENS
+            )
+            messages = list(messages)
+            messages[i] = ChatMessage(
+                role=message.role,
+                content=content,
+                additional_kwargs=message.additional_kwargs,
+            )
+            kept.add(i)
+            remaining = 0
+        else:
+            break
+        newest = False
+
+    result = [messages[i] for i in sorted(kept)]
+    # Drop tool results whose assistant call was trimmed away.
+    while True:
+        first = next(
+            (i for i, m in enumerate(result) if m.role != MessageRole.SYSTEM), None
+        )
+        if first is None or first == len(result) - 1:
+            break
+        if result[first].role != MessageRole.TOOL:
+            break
+        result.pop(first)
+    return result
+
+
+def pack_nodes(
+    nodes: Sequence[N],
+    budget: int,
+    counter: Optional[TokenCounter] = None,
+) -> List[N]:
+    """
+    Select nodes, in the given (e.g. relevance) order, that fit in `budget`.
+
+    Nodes too large for the space left are skipped so smaller ones after them
+    can still be packed.
+
+    Args:
+        nodes (Sequence[N]): Nodes (`BaseNode`, `NodeWithScore`) or strings.
+        budget (int): Maximum tokens for all selected nodes.
+        counter (Optional[TokenCounter]): Counter to use. Defaults to the
+            process-wide heuristic counter.
+
+    Returns:
+        List[N]: The selected nodes, in their original order.
+    """
+    counter = counter or _DEFAULT_COUNTER
+    packed = []
+    remaining = budget
+    for node in nodes:
+        text = node.get_content() if hasattr(node, "get_content") else str(node)
+        cost = counter.count(text) + NODE_SEPARATOR_TOKENS
+        if cost <= remaining:
+            packed.append(node)
+            remaining -= cost
+    return packed
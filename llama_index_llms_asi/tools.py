@@ -0,0 +1,53 @@
+"""Concurrent execution of the tool calls of one model turn."""
+
+import asyncio
+from typing import List, Optional, Sequence
+
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.llms.llm import ToolSelection
+from llama_index.core.tools import BaseTool, ToolOutput
+from llama_index.core.tools.calling import acall_tool_with_selection
+
+
+async def acall_tools(
+    tool_calls: Sequence[ToolSelection],
+    tools: Sequence[BaseTool],
+    max_concurrency: Optional[int] = None,
+    verbose: bool = False,
+) -> List[ToolOutput]:
+    """
+    Run tool calls concurrently, returning their outputs in call order.
+
+    Async tools run on the event loop and sync tools on the default thread
+    pool, so independent calls overlap instead of running back to back. Tool
+    errors are returned as outputs with `is_error` set, as LlamaIndex does.
+
+    Args:
+        tool_calls (Sequence[ToolSelection]): The calls requested by the model.
+        tools (Sequence[BaseTool]): The tools they refer to, by name.
+        max_concurrency (Optional[int]): Maximum calls running at a time, or
+            None for no limit.
+        verbose (bool): Print each call and its output.
+
+    Returns:
+        List[ToolOutput]: One output per call.
+    """
+    if max_concurrency is not None and max_concurrency <= 0:
+        raise ValueError("max_concurrency must be positive.")
+    semaphore = asyncio.Semaphore(max_concurrency or len(tool_calls) or 1)
+
+    async def call(tool_call: ToolSelection) -> ToolOutput:
+        async with semaphore:
+            return await acall_tool_with_selection(tool_call, tools, verbose=verbose)
+
+    return list(await asyncio.gather(*(call(c) for c in tool_calls)))
+
+
+def call_tools(
+    tool_calls: Sequence[ToolSelection],
+    tools: Sequence[BaseTool],
+    max_concurrency: Optional[int] = None,
+    verbose: bool = False,
+) -> List[ToolOutput]:
+    """Synchronous version of `acall_tools`."""
+    return asyncio_run(acall_tools(tool_calls, tools, max_concurrency, verbose))
@@ -0,0 +1,315 @@
+"""
+Compact encoding of ASI chat requests.
+
+The OpenAI SDK turns every request into a body in several passes: the
+messages are deep-copied by its parameter transform, then encoded with a
+pure-Python JSON encoder subclass. For RAG prompts carrying tens of KB of
+context that dominates the client-side CPU of a request. `RequestEncoder`
+instead encodes each message once (with `orjson` when it is installed),
+memoizes the encoding of messages that repeat across calls (system prompts,
+retrieved context, chat history) and joins the body in a single copy,
+optionally gzipping it.
+
+`ASIOpenAI`/`AsyncASIOpenAI` are the SDK clients used by `ASI`: they send
+these bodies for chat completions when given an encoder, and close the HTTP
+response of a completion stream as soon as its consumer stops iterating it.
+The SDK's own streams only release their connection when fully read or
+garbage collected, so an abandoned stream would otherwise keep its pooled
+connection busy, and the server generating, until the next GC cycle.
+"""
+
+import datetime
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+import httpx
+import pydantic
+from openai import AsyncOpenAI, AsyncStream, Stream
+from openai import OpenAI as SyncOpenAI
+from openai._base_client import make_request_options
+from openai._types import NOT_GIVEN, NotGiven, Omit
+from openai.resources.chat import AsyncChat, Chat
+from openai.resources.chat.completions import AsyncCompletions, Completions
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Encoded messages kept for reuse by the next requests.
+DEFAULT_MEMO_SIZE = 64
+# Bodies smaller than this are sent uncompressed.
+DEFAULT_GZIP_MIN_SIZE = 1024
+# Fast compression: most of the gain on JSON text for little CPU.
+DEFAULT_GZIP_LEVEL = 1
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, pydantic.BaseModel):
+        return value.model_dump(mode="json", exclude_unset=True, by_alias=True)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Encode `value` as compact UTF-8 JSON, with `orjson` if available."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(
+        value,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        allow_nan=False,
+    ).encode("utf-8")
+
+
+def request_body(request: httpx.Request) -> bytes:
+    """The body of `request`, decompressed if it was sent gzipped."""
+    body = request.content
+    if request.headers.get("content-encoding") == "gzip":
+        return gzip.decompress(body)
+    return body
+
+
+class WireStats:
+    """Counters of a request encoder."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.messages_encoded = 0
+        self.messages_reused = 0
+        self.bytes_encoded = 0
+        self.bytes_sent = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "messages_encoded": self.messages_encoded,
+            "messages_reused": self.messages_reused,
+            "bytes_encoded": self.bytes_encoded,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+class RequestEncoder:
+    """
+    Encodes chat completion bodies, reusing the encoding of repeated messages.
+
+    Messages made of plain strings (role, content, name) are memoized in a
+    small LRU keyed by their fields, so a system prompt or retrieved context
+    shared by consecutive requests is encoded once. The memoized prefix and
+    the new messages are joined into the body with a single copy.
+
+    Args:
+        memo_size (int): Encoded messages kept for reuse; 0 disables reuse.
+        gzip_min_size (Optional[int]): Gzip bodies of at least this many
+            bytes and mark them with `Content-Encoding: gzip`. None never
+            compresses; only use it with endpoints that accept gzip bodies.
+        gzip_level (int): Gzip compression level.
+    """
+
+    def __init__(
+        self,
+        memo_size: int = DEFAULT_MEMO_SIZE,
+        gzip_min_size: Optional[int] = None,
+        gzip_level: int = DEFAULT_GZIP_LEVEL,
+    ) -> None:
+        self.memo_size = memo_size
+        self.gzip_min_size = gzip_min_size
+        self.gzip_level = gzip_level
+        self.stats = WireStats()
+        self._memo: "OrderedDict[Tuple[Tuple[str, str], ...], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _message(self, message: Mapping[str, Any]) -> bytes:
+        key = tuple(message.items())
+        if self.memo_size <= 0 or not all(type(v) is str for _, v in key):
+            with self._lock:
+                self.stats.messages_encoded += 1
+            return dumps(message)
+        with self._lock:
+            encoded = self._memo.get(key)
+            if encoded is not None:
+                self._memo.move_to_end(key)
+                self.stats.messages_reused += 1
+                return encoded
+        encoded = dumps(message)
+        with self._lock:
+            self._memo[key] = encoded
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+            self.stats.messages_encoded += 1
+        return encoded
+
+    def encode(
+        self, messages: Iterable[Mapping[str, Any]], params: Mapping[str, Any]
+    ) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Encode a chat completion body.
+
+        Args:
+            messages (Iterable[Mapping[str, Any]]): OpenAI-style message dicts.
+            params (Mapping[str, Any]): The other body fields. SDK sentinels
+                (`NOT_GIVEN`, `omit`) are dropped.
+
+        Returns:
+            Tuple[bytes, Dict[str, str]]: The body and the headers it needs.
+        """
+        rest = dumps(
+            {k: v for k, v in params.items() if not isinstance(v, (NotGiven, Omit))}
+        )
+        parts = [b'{"messages":[', b",".join(map(self._message, messages)), b"]"]
+        # Splice the other fields into the same object.
+        parts.append(b"," + rest[1:] if len(rest) > 2 else b"}")
+        body = b"".join(parts)
+        headers: Dict[str, str] = {}
+        size = len(body)
+        if self.gzip_min_size is not None and size >= self.gzip_min_size:
+            body = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            headers["Content-Encoding"] = "gzip"
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.bytes_encoded += size
+            self.stats.bytes_sent += len(body)
+        return body, headers
+
+
+def _split_options(
+    encoder: RequestEncoder, messages: Iterable[Any], params: Dict[str, Any]
+) -> Tuple[bytes, Dict[str, Any], bool]:
+    """Encode a `create` call into its body and SDK request options."""
+    extra_headers = params.pop("extra_headers", None) or {}
+    extra_query = params.pop("extra_query", None)
+    timeout = params.pop("timeout", NOT_GIVEN)
+    params.update(params.pop("extra_body", None) or {})
+    body, headers = encoder.encode(messages, params)
+    request_options = make_request_options(
+        extra_headers={**headers, **extra_headers},
+        extra_query=extra_query,
+        timeout=timeout,
+    )
+    return body, request_options, bool(params.get("stream"))
+
+
+def _close_on_exit(stream: Stream[Any]) -> Iterator[Any]:
+    try:
+        yield from stream
+    finally:
+        stream.close()
+
+
+async def _aclose_on_exit(stream: AsyncStream[Any]) -> AsyncIterator[Any]:
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await stream.close()
+
+
+class ASICompletions(Completions):
+    """
+    Chat completions for `ASIOpenAI`.
+
+    Bodies are built by the client's `RequestEncoder` when it has one.
+    Streams are returned as generators closing the response when closed.
+    """
+
+    def create(  # type: ignore[override]
+        self, *, messages: Iterable[Any], **params: Any
+    ) -> Any:
+        encoder: Optional[RequestEncoder] = self._client.encoder  # type: ignore
+        if encoder is None:
+            result = super().create(messages=messages, **params)
+        else:
+            body, options, stream = _split_options(encoder, messages, params)
+            result = self._post(
+                "/chat/completions",
+                content=body,
+                options=options,
+                cast_to=ChatCompletion,
+                stream=stream,
+                stream_cls=Stream[ChatCompletionChunk],
+            )
+        if isinstance(result, Stream):
+            return _close_on_exit(result)
+        return result
+
+
+class AsyncASICompletions(AsyncCompletions):
+    """Async version of `ASICompletions`."""
+
+    async def create(  # type: ignore[override]
+        self, *, messages: Iterable[Any], **params: Any
+    ) -> Any:
+        encoder: Optional[RequestEncoder] = self._client.encoder  # type: ignore
+        if encoder is None:
+            result = await super().create(messages=messages, **params)
+        else:
+            body, options, stream = _split_options(encoder, messages, params)
+            result = await self._post(
+                "/chat/completions",
+                content=body,
+                options=options,
+                cast_to=ChatCompletion,
+                stream=stream,
+                stream_cls=AsyncStream[ChatCompletionChunk],
+            )
+        if isinstance(result, AsyncStream):
+            return _aclose_on_exit(result)
+        return result
+
+
+class _ASIChat(Chat):
+    @cached_property
+    def completions(self) -> Completions:
+        return ASICompletions(self._client)
+
+
+class _AsyncASIChat(AsyncChat):
+    @cached_property
+    def completions(self) -> AsyncCompletions:
+        return AsyncASICompletions(self._client)
+
+
+class ASIOpenAI(SyncOpenAI):
+    """OpenAI client encoding chat completion requests with `encoder`, if any."""
+
+    def __init__(
+        self, *, encoder: Optional[RequestEncoder] = None, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self.encoder = encoder
+
+    @cached_property
+    def chat(self) -> Chat:
+        return _ASIChat(self)
+
+
+class AsyncASIOpenAI(AsyncOpenAI):
+    """Async version of `ASIOpenAI`."""
+
+    def __init__(
+        self, *, encoder: Optional[RequestEncoder] = None, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self.encoder = encoder
+
+    @cached_property
+    def chat(self) -> AsyncChat:
+        return _AsyncASIChat(self)
@@ -0,0 +1,76 @@
+"""Shared fixtures for ASI unit tests."""
+
+import json
+import re
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pytest
+
+
+def chat_completion_body(content: str, model: str = "asi1-mini") -> Dict[str, Any]:
+    """Build an OpenAI-compatible chat completion payload."""
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+    }
+
+
+def chat_completion_sse(chunks: List[str], model: str = "asi1-mini") -> bytes:
+    """Build an OpenAI-compatible chat completion SSE stream."""
+    events = []
+    for chunk in chunks:
+        payload = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": model,
+            "choices": [
+                {"index": 0, "delta": {"content": chunk}, "finish_reason": None}
+            ],
+        }
+        events.append(f"data: {json.dumps(payload)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+class MockEndpoint:
+    """Records requests and answers them like the ASI chat endpoint."""
+
+    def __init__(self, reply: Callable[[Dict[str, Any]], str]) -> None:
+        self.reply = reply
+        self.requests: List[Dict[str, Any]] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append(body)
+        content = self.reply(body)
+        if body.get("stream"):
+            return httpx.Response(
+                200,
+                content=chat_completion_sse(re.findall(r"\S+\s*", content)),
+                headers={"content-type": "text/event-stream"},
+            )
+        return httpx.Response(200, json=chat_completion_body(content))
+
+    def http_client(self) -> httpx.Client:
+        return httpx.Client(transport=httpx.MockTransport(self.handler))
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+@pytest.fixture
+def mock_server() -> MockEndpoint:
+    """A mock ASI endpoint echoing the last user message."""
+    return MockEndpoint(lambda body: "echo " + body["messages"][-1]["content"])
@@ -0,0 +1,179 @@
+"""Unit tests for multi-endpoint load balancing and failover."""
+
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.balancer import (
+    AsyncBalancedTransport,
+    BalancedTransport,
+    CircuitBreaker,
+    Endpoint,
+    LoadBalancer,
+)
+
+from .conftest import chat_completion_body
+
+MESSAGES = [ChatMessage(role=MessageRole.USER, content="hello")]
+BASE = "https://api.asi1.ai/v1"
+
+
+def test_weighted_round_robin_is_smooth():
+    """Test that round-robin follows the weights and interleaves endpoints."""
+    balancer = LoadBalancer([Endpoint("http://a", weight=2), Endpoint("http://b")])
+    picks = []
+    for _ in range(6):
+        endpoint = balancer.choose()
+        picks.append(endpoint.name)
+        balancer.release(endpoint)
+    assert picks == ["http://a", "http://b", "http://a"] * 2
+
+
+def test_least_outstanding_prefers_idle_endpoint():
+    """Test that least-outstanding picks the endpoint with fewest in flight."""
+    balancer = LoadBalancer(["http://a", "http://b"], strategy="least_outstanding")
+    first = balancer.choose()
+    second = balancer.choose()
+    assert first is not second
+    balancer.release(first)
+    assert balancer.choose() is first
+
+
+def test_duplicate_endpoints_get_unique_names():
+    """Test that one URL with two keys yields two endpoints."""
+    balancer = LoadBalancer([Endpoint(BASE, "k1"), Endpoint(BASE, "k2")])
+    assert [e.name for e in balancer.endpoints] == [BASE, f"{BASE}#1"]
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test closed -> open -> half-open -> closed transitions."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    breaker.on_failure()
+    assert breaker.state == "closed"
+    breaker.on_failure()
+    assert breaker.state == "open"
+    assert not breaker.available()
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    breaker.on_dispatch()
+    assert not breaker.available()  # one probe at a time
+    breaker.on_success()
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_is_skipped():
+    """Test that an ejected endpoint receives no traffic until reset."""
+    balancer = LoadBalancer(["http://a", "http://b"], failure_threshold=1)
+    bad = balancer.endpoints[0]
+    balancer.on_result(bad, ok=False)
+    picks = {balancer.choose().name for _ in range(4)}
+    assert picks == {"http://b"}
+    assert balancer.stats()["http://a"]["state"] == "open"
+
+
+def _transports(statuses):
+    seen = []
+
+    def make(name, status):
+        def handler(request):
+            seen.append((name, request.url.host, request.headers.get("Authorization")))
+            if status is None:
+                raise httpx.ConnectError("down", request=request)
+            return httpx.Response(status, json=chat_completion_body(name))
+
+        return httpx.MockTransport(handler)
+
+    return seen, {name: make(name, status) for name, status in statuses.items()}
+
+
+def test_transport_fails_over_and_rewrites_requests():
+    """Test that 5xx and connection errors move the attempt to another endpoint."""
+    balancer = LoadBalancer(
+        [
+            Endpoint("http://a/v1", "ka"),
+            Endpoint("http://b/v1", "kb"),
+            Endpoint("http://c/v1", "kc"),
+        ]
+    )
+    seen, transports = _transports(
+        {"http://a/v1": 503, "http://b/v1": None, "http://c/v1": 200}
+    )
+    client = httpx.Client(transport=BalancedTransport(balancer, transports, BASE))
+    response = client.post(f"{BASE}/chat/completions", json={})
+    assert response.status_code == 200
+    assert seen == [
+        ("http://a/v1", "a", "Bearer ka"),
+        ("http://b/v1", "b", "Bearer kb"),
+        ("http://c/v1", "c", "Bearer kc"),
+    ]
+    stats = balancer.stats()
+    assert stats["http://a/v1"]["failures"] == 1
+    assert stats["http://b/v1"]["failures"] == 1
+    assert all(s["outstanding"] == 0 for s in stats.values())
+
+
+def test_transport_returns_last_failure_when_all_fail():
+    """Test that the last failover response is returned once endpoints run out."""
+    balancer = LoadBalancer(["http://a/v1", "http://b/v1"])
+    _, transports = _transports({"http://a/v1": 500, "http://b/v1": 429})
+    client = httpx.Client(transport=BalancedTransport(balancer, transports, BASE))
+    assert client.get(f"{BASE}/models").status_code == 429
+
+
+def test_async_transport_fails_over():
+    """Test failover on the async transport."""
+    balancer = LoadBalancer(["http://a/v1", "http://b/v1"])
+
+    async def down(request):
+        raise httpx.ConnectError("down", request=request)
+
+    async def up(request):
+        return httpx.Response(200, json={"host": request.url.host})
+
+    transports = {
+        "http://a/v1": httpx.MockTransport(down),
+        "http://b/v1": httpx.MockTransport(up),
+    }
+
+    async def run():
+        transport = AsyncBalancedTransport(balancer, transports, BASE)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return (await client.get(f"{BASE}/models")).json()
+
+    assert asyncio.run(run()) == {"host": "b"}
+
+
+def test_asi_balances_across_servers():
+    """Test ASI spreading real requests over two mock servers."""
+    from benchmarks.mock_server import MockASIServer, MockServerConfig
+
+    with MockASIServer(MockServerConfig(completion_tokens=2)) as first, MockASIServer(
+        MockServerConfig(completion_tokens=2)
+    ) as second:
+        llm = ASI(
+            endpoints=[Endpoint(first.url, "k1"), Endpoint(second.url, "k2")],
+            max_retries=0,
+            use_connection_pool=False,
+        )
+        assert llm.api_key == "k1"
+        for _ in range(4):
+            assert llm.chat(MESSAGES).message.content
+        stats = llm.load_balancer.stats()
+        assert Counter(s["requests"] for s in stats.values()) == {2: 2}
+        assert all(s["latency_p50"] is not None for s in stats.values())
+
+
+def test_asi_without_endpoints_has_no_balancer():
+    """Test that balancing is opt-in."""
+    assert ASI(api_key="test_key").load_balancer is None
+
+
+def test_asi_rejects_unknown_strategy():
+    """Test that the balancing strategy is validated up front."""
+    with pytest.raises(ValueError):
+        ASI(api_key="test_key", endpoints=["http://a"], load_balancing="random")
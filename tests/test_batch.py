@@ -0,0 +1,94 @@
+"""Unit tests for ASI batch execution."""
+
+import asyncio
+
+import httpx
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.batch import aiter_batch, arun_batch
+
+
+def test_arun_batch_limits_concurrency_and_keeps_order():
+    """Test results come back in input order with bounded concurrency."""
+    in_flight = 0
+    peak = 0
+
+    async def fn(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001 * (10 - item))
+        in_flight -= 1
+        if item == 3:
+            raise RuntimeError("boom")
+        return item * 2
+
+    results = asyncio.run(arun_batch(fn, range(10), max_concurrency=4))
+    assert [r.index for r in results] == list(range(10))
+    assert peak == 4
+    assert not results[3].ok
+    assert isinstance(results[3].error, RuntimeError)
+    assert [r.response for r in results if r.ok] == [0, 2, 4, 8, 10, 12, 14, 16, 18]
+
+
+def test_aiter_batch_yields_as_completed():
+    """Test that fast items are yielded before slow ones."""
+
+    async def fn(item):
+        await asyncio.sleep(item)
+        return item
+
+    async def run():
+        return [r.index async for r in aiter_batch(fn, [0.05, 0.0], 2)]
+
+    assert asyncio.run(run()) == [1, 0]
+
+
+def test_aiter_batch_rejects_invalid_concurrency():
+    """Test that max_concurrency must be positive."""
+
+    async def run():
+        async for _ in aiter_batch(asyncio.sleep, [0], max_concurrency=0):
+            pass
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_asi_batch_chat_reports_errors_per_item(mock_server):
+    """Test that one failing request does not fail the whole batch."""
+    handler = mock_server.handler
+
+    def failing_handler(request):
+        if b"fail" in request.content:
+            return httpx.Response(400, json={"error": {"message": "bad request"}})
+        return handler(request)
+
+    llm = ASI(
+        api_key="test_key",
+        max_retries=0,
+        async_http_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(failing_handler)
+        ),
+    )
+    message_lists = [
+        [ChatMessage(role=MessageRole.USER, content=content)]
+        for content in ["a", "fail", "c"]
+    ]
+    results = llm.batch_chat(message_lists, max_concurrency=2)
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[0].response.message.content == "echo a"
+    assert results[2].response.message.content == "echo c"
+
+
+def test_asi_batch_complete(mock_server):
+    """Test batch completion through the mock endpoint."""
+    llm = ASI(
+        api_key="test_key",
+        max_retries=0,
+        async_http_client=mock_server.async_http_client(),
+    )
+    results = llm.batch_complete([f"p{i}" for i in range(20)], max_concurrency=5)
+    assert [r.response.text for r in results] == [f"echo p{i}" for i in range(20)]
@@ -0,0 +1,107 @@
+"""Unit tests for resumable JSONL batch runs."""
+
+import json
+
+import httpx
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.batch_file import main, run_batch_file
+
+
+def _write_requests(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            messages = [{"role": "user", "content": str(i)}]
+            f.write(json.dumps({"id": f"q{i}", "messages": messages}) + "\n")
+
+
+def _read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def _llm(mock_server):
+    return ASI(
+        api_key="test_key",
+        max_retries=0,
+        async_http_client=mock_server.async_http_client(),
+    )
+
+
+def test_runs_file_and_records_usage(tmp_path, mock_server):
+    """Test that every request gets one result line with usage and latency."""
+    source, results = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_requests(source, 20)
+    reports = []
+    stats = run_batch_file(
+        _llm(mock_server), str(source), str(results), 4, progress=reports.append
+    )
+    records = _read_results(results)
+    assert sorted(r["id"] for r in records) == sorted(f"q{i}" for i in range(20))
+    assert {r["content"] for r in records} == {f"echo {i}" for i in range(20)}
+    assert records[0]["usage"] == {"prompt_tokens": 3, "completion_tokens": 2}
+    assert stats.completed == 20 and stats.failed == 0
+    assert stats.completion_tokens == 40
+    assert reports[-1] is stats
+
+
+def test_restart_skips_completed_ids(tmp_path, mock_server):
+    """Test resuming after a crash that left a partial line behind."""
+    source, results = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_requests(source, 10)
+    with open(results, "w") as f:
+        for i in range(4):
+            f.write(json.dumps({"id": f"q{i}", "content": "old"}) + "\n")
+        f.write('{"id": "q4", "cont')
+
+    stats = run_batch_file(_llm(mock_server), str(source), str(results))
+    assert stats.skipped == 4 and stats.completed == 6
+    assert len(mock_server.requests) == 6
+    ids = [r["id"] for r in _read_results(results)]
+    assert sorted(ids) == sorted(f"q{i}" for i in range(10))
+
+
+def test_failures_are_recorded_and_retried(tmp_path, mock_server):
+    """Test that failed and malformed requests are written and retried later."""
+    source, results = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    with open(source, "w") as f:
+        messages = [{"role": "user", "content": "a"}]
+        f.write(json.dumps({"id": 1, "messages": messages}))
+        f.write("\nnot json\n")
+        f.write(json.dumps({"id": 3, "messages": "oops"}) + "\n")
+        f.write(json.dumps({"id": ["q4"], "messages": messages}) + "\n")
+
+    def down(request):
+        raise httpx.ConnectError("down", request=request)
+
+    llm = ASI(
+        api_key="test_key",
+        max_retries=0,
+        async_http_client=httpx.AsyncClient(transport=httpx.MockTransport(down)),
+    )
+    stats = run_batch_file(llm, str(source), str(results))
+    assert stats.failed == 4
+    records = {r["id"]: r for r in _read_results(results)}
+    assert set(records) == {1, 2, 3, 4}
+    assert "id must be a string or an integer" in records[4]["error"]
+
+    stats = run_batch_file(_llm(mock_server), str(source), str(results))
+    assert stats.completed == 1 and stats.failed == 3
+
+    stats = run_batch_file(
+        _llm(mock_server), str(source), str(results), retry_failed=False
+    )
+    assert stats.skipped == 4 and stats.completed == stats.failed == 0
+
+
+def test_cli_runs_against_server(tmp_path, capsys, monkeypatch):
+    """Test the command line entry point against a mock server."""
+    from benchmarks.mock_server import MockASIServer, MockServerConfig
+
+    source, results = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_requests(source, 5)
+    with MockASIServer(MockServerConfig(completion_tokens=2)) as server:
+        monkeypatch.setenv("ASI_API_KEY", "test_key")
+        assert main([str(source), str(results), "--api-base", server.url]) == 0
+    assert len(_read_results(results)) == 5
+    assert "5 completed, 0 failed, 0 skipped" in capsys.readouterr().err
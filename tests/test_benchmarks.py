@@ -0,0 +1,90 @@
+"""Tests for the offline benchmark suite and its mock ASI server."""
+
+import asyncio
+import json
+
+import openai
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from benchmarks.mock_server import MockASIServer, MockServerConfig
+from benchmarks.run import main, percentile, run_benchmark
+from llama_index_llms_asi import ASI
+
+
+@pytest.fixture
+def asi_server():
+    """A local mock ASI server."""
+    with MockASIServer(MockServerConfig(completion_tokens=5, seed=0)) as server:
+        yield server
+
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    samples = list(range(1, 101))
+    assert percentile(samples, 0.5) == 50
+    assert percentile(samples, 0.99) == 99
+    assert percentile([], 0.5) is None
+
+
+def test_asi_against_mock_server(asi_server):
+    """Test sync, async and streaming calls over real HTTP."""
+    llm = ASI(api_key="mock", api_base=asi_server.url, max_retries=0)
+    messages = [ChatMessage(role=MessageRole.USER, content="hi")]
+    expected = "tok0 tok1 tok2 tok3 tok4 "
+
+    assert llm.complete("hi").text == expected
+    assert llm.chat(messages).message.content == expected
+    assert "".join(r.delta for r in llm.stream_chat(messages)) == expected
+
+    async def run():
+        response = await llm.achat(messages)
+        stream = await llm.astream_complete("hi")
+        return response, [chunk.delta async for chunk in stream]
+
+    response, deltas = asyncio.run(run())
+    assert response.message.content == expected
+    assert len(deltas) == 5
+    assert asi_server.requests == 5
+
+
+def test_error_injection():
+    """Test that injected errors surface as API errors."""
+    config = MockServerConfig(error_rate=1.0, error_status=503)
+    with MockASIServer(config) as server:
+        llm = ASI(api_key="mock", api_base=server.url, max_retries=0)
+        with pytest.raises(openai.InternalServerError):
+            llm.complete("hi")
+
+
+@pytest.mark.parametrize("mode", ["chat", "astream_chat"])
+def test_run_benchmark_reports_metrics(asi_server, mode):
+    """Test that a benchmark run reports throughput and percentiles."""
+    llm = ASI(api_key="mock", api_base=asi_server.url, max_retries=0)
+    result = run_benchmark(llm, mode, concurrency=4, requests=12, trace_memory=True)
+    assert result["errors"] == 0
+    assert result["throughput"] > 0
+    assert result["latency_p50"] <= result["latency_p99"]
+    assert result["peak_traced_memory"] > 0
+    if mode.endswith("stream_chat"):
+        assert result["first_chunk_p50"] is not None
+
+
+def test_cli_writes_json(tmp_path):
+    """Test that the CLI writes machine-readable results."""
+    output = tmp_path / "results.json"
+    main(
+        [
+            "--modes",
+            "complete,acomplete",
+            "--concurrency",
+            "2",
+            "--requests",
+            "4",
+            "--output",
+            str(output),
+        ]
+    )
+    report = json.loads(output.read_text())
+    assert [r["mode"] for r in report["results"]] == ["complete", "acomplete"]
+    assert report["server"]["completion_tokens"] == 64
@@ -0,0 +1,111 @@
+"""Unit tests for ASI response caching."""
+
+import asyncio
+import time
+
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI, InMemoryCache, SQLiteCache
+from llama_index_llms_asi.cache import make_cache_key
+
+
+def _llm(mock_server, cache):
+    return ASI(
+        api_key="test_key",
+        cache=cache,
+        max_retries=0,
+        http_client=mock_server.http_client(),
+        async_http_client=mock_server.async_http_client(),
+    )
+
+
+def test_cache_key_is_deterministic():
+    """Test that keys do not depend on dict ordering but on every param."""
+    first = make_cache_key({"model": "m", "temperature": 0.1}, "hi")
+    second = make_cache_key({"temperature": 0.1, "model": "m"}, "hi")
+    assert first == second
+    assert first != make_cache_key({"model": "m", "temperature": 0.2}, "hi")
+
+
+def test_in_memory_cache_lru_eviction():
+    """Test least recently used entries are evicted first."""
+    cache = InMemoryCache(max_size=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.stats.evictions == 1
+
+
+def test_in_memory_cache_ttl():
+    """Test that expired entries are treated as misses."""
+    cache = InMemoryCache(ttl=0.01)
+    cache.set("a", {"v": 1})
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats.misses == 1
+
+
+def test_sqlite_cache_persists(tmp_path):
+    """Test that the SQLite cache survives reopening and evicts LRU entries."""
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, max_size=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.set("c", {"v": 3})
+    assert len(cache) == 2
+    cache.close()
+
+    reopened = SQLiteCache(path)
+    assert reopened.get("c") == {"v": 3}
+    assert reopened.get("a") is None
+    reopened.close()
+
+
+def test_chat_and_complete_hit_cache(mock_server):
+    """Test that identical requests are answered from the cache."""
+    llm = _llm(mock_server, InMemoryCache())
+    messages = [ChatMessage(role=MessageRole.USER, content="hello")]
+
+    assert llm.chat(messages).message.content == "echo hello"
+    assert llm.chat(messages).message.content == "echo hello"
+    assert llm.complete("hello").text == "echo hello"
+    assert len(mock_server.requests) == 1
+    assert llm.cache.stats.hits == 2
+
+    llm.chat(messages, temperature=0.5)
+    assert len(mock_server.requests) == 2
+
+
+def test_stream_replays_cached_chat(mock_server):
+    """Test that a completed stream is cached and replayed as a stream."""
+    llm = _llm(mock_server, InMemoryCache())
+    messages = [ChatMessage(role=MessageRole.USER, content="hello there")]
+
+    streamed = "".join(r.delta for r in llm.stream_chat(messages))
+    replayed = list(llm.stream_chat(messages))
+    assert streamed == "echo hello there"
+    assert len(replayed) == 1
+    assert replayed[0].delta == "echo hello there"
+    assert llm.chat(messages).message.content == "echo hello there"
+    assert len(mock_server.requests) == 1
+
+
+def test_async_chat_hits_cache(mock_server):
+    """Test the async paths share entries with the sync ones."""
+    llm = _llm(mock_server, InMemoryCache())
+    messages = [ChatMessage(role=MessageRole.USER, content="hello")]
+
+    async def run():
+        first = await llm.achat(messages)
+        second = await llm.acomplete("hello")
+        stream = await llm.astream_chat(messages)
+        chunks = [chunk async for chunk in stream]
+        return first, second, chunks
+
+    first, second, chunks = asyncio.run(run())
+    assert first.message.content == second.text == "echo hello"
+    assert [c.delta for c in chunks] == ["echo hello"]
+    assert len(mock_server.requests) == 1
@@ -0,0 +1,165 @@
+"""Unit tests for single-flight request coalescing."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.coalesce import SingleFlight
+
+MESSAGES = [ChatMessage(role=MessageRole.USER, content="hello there")]
+
+
+def test_call_shares_result_between_threads():
+    """Test that concurrent identical calls run once."""
+    flight = SingleFlight()
+    runs = []
+    release = threading.Event()
+
+    def fn():
+        runs.append(1)
+        release.wait()
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(flight.call, "key", fn) for _ in range(4)]
+        while flight.stats.requests < 4:
+            time.sleep(0.001)
+        release.set()
+        assert [f.result() for f in futures] == ["result"] * 4
+    assert len(runs) == 1
+    assert flight.stats.as_dict() == {"requests": 4, "coalesced": 3}
+
+
+def test_call_shares_errors_and_forgets_key():
+    """Test that errors reach every waiter and the next call runs again."""
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.call("key", fail)
+    assert flight.call("key", lambda: "again") == "again"
+
+
+def test_acall_survives_cancelled_waiter():
+    """Test that cancelling one waiter does not cancel the shared request."""
+    flight = SingleFlight()
+    runs = []
+
+    async def fn():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        first = asyncio.ensure_future(flight.acall("key", fn))
+        second = asyncio.ensure_future(flight.acall("key", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "result"
+    assert len(runs) == 1
+
+
+def test_stream_fans_out_to_late_joiner():
+    """Test that a consumer joining mid-stream replays earlier chunks."""
+    flight = SingleFlight()
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        return iter(["a", "b", "c"])
+
+    first = flight.stream("key", open_stream)
+    assert next(first) == "a"
+    second = flight.stream("key", open_stream)
+    assert list(first) == ["b", "c"]
+    assert list(second) == ["a", "b", "c"]
+    assert len(opened) == 1
+
+
+def test_astream_fans_out():
+    """Test async stream fan-out to concurrent consumers."""
+    flight = SingleFlight()
+    opened = []
+
+    async def open_stream():
+        opened.append(1)
+
+        async def gen():
+            for chunk in "abc":
+                await asyncio.sleep(0.001)
+                yield chunk
+
+        return gen()
+
+    async def consume():
+        return [c async for c in flight.astream("key", open_stream)]
+
+    async def run():
+        return await asyncio.gather(consume(), consume(), consume())
+
+    assert asyncio.run(run()) == [["a", "b", "c"]] * 3
+    assert len(opened) == 1
+
+
+def _slow_llm(mock_server, delay=0.05):
+    def handler(request):
+        time.sleep(delay)
+        return mock_server.handler(request)
+
+    async def ahandler(request):
+        await asyncio.sleep(delay)
+        return mock_server.handler(request)
+
+    return ASI(
+        api_key="test_key",
+        max_retries=0,
+        coalesce_requests=True,
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+        async_http_client=httpx.AsyncClient(transport=httpx.MockTransport(ahandler)),
+    )
+
+
+def test_asi_coalesces_concurrent_achat(mock_server):
+    """Test that identical concurrent achat calls send one request."""
+    llm = _slow_llm(mock_server)
+
+    async def run():
+        other = [ChatMessage(role=MessageRole.USER, content="other")]
+        return await asyncio.gather(
+            llm.achat(MESSAGES), llm.achat(MESSAGES), llm.achat(other)
+        )
+
+    first, second, third = asyncio.run(run())
+    assert first.message.content == second.message.content == "echo hello there"
+    assert third.message.content == "echo other"
+    assert len(mock_server.requests) == 2
+    assert llm.single_flight.stats.coalesced == 1
+
+
+def test_asi_coalesces_concurrent_streams(mock_server):
+    """Test that identical concurrent streams share one upstream request."""
+    llm = _slow_llm(mock_server)
+
+    def consume():
+        return "".join(r.delta for r in llm.stream_chat(MESSAGES))
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(lambda _: consume(), range(3)))
+    assert results == ["echo hello there"] * 3
+    assert len(mock_server.requests) == 1
+
+
+def test_asi_does_not_coalesce_by_default(mock_server):
+    """Test that coalescing is opt-in."""
+    llm = ASI(api_key="test_key", http_client=mock_server.http_client())
+    assert llm.single_flight is None
@@ -0,0 +1,155 @@
+"""Unit tests for adaptive concurrency limiting."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from llama_index_llms_asi import ASI, AdaptiveConcurrencyLimiter, LoadShedError
+
+from .conftest import chat_completion_body
+
+
+async def _saturate(limiter: AdaptiveConcurrencyLimiter, latency: float) -> None:
+    """Complete one call per slot, each reporting `latency`."""
+    slots = limiter.limit
+    for _ in range(slots):
+        await limiter.acquire()
+    for _ in range(slots):
+        limiter.release(latency)
+
+
+def test_gradient_grows_then_backs_off():
+    """Test the limit grows at steady latency and shrinks as latency inflates."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=100)
+
+    async def run():
+        for _ in range(5):
+            await _saturate(limiter, 0.1)
+        grown = limiter.limit
+        await _saturate(limiter, 1.0)
+        return grown
+
+    grown = asyncio.run(run())
+    assert grown > 4
+    assert limiter.limit < grown
+
+
+def test_aimd_and_overload_backoff():
+    """Test AIMD grows by one per saturated call and halves on errors."""
+    limiter = AdaptiveConcurrencyLimiter(
+        algorithm="aimd", initial_limit=4, backoff_ratio=0.5
+    )
+
+    async def run():
+        await _saturate(limiter, 0.1)
+        assert limiter.limit == 6
+        await limiter.acquire()
+        limiter.release(overload=True)
+
+    asyncio.run(run())
+    assert limiter.limit == 3
+    assert limiter.stats.overloads == 1
+    # An idle limiter does not grow.
+    asyncio.run(limiter.acquire())
+    limiter.release(0.1)
+    assert limiter.limit == 3
+
+
+def test_queueing_and_load_shedding():
+    """Test waiters are served in order and shed past `max_queue_wait`."""
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=1, max_limit=1, max_queue_wait=0.05
+    )
+    order = []
+
+    async def worker(i: int) -> None:
+        await limiter.acquire()
+        order.append(i)
+        await asyncio.sleep(0.01)
+        limiter.release()
+
+    async def run():
+        await limiter.acquire()
+        waiters = [asyncio.ensure_future(worker(i)) for i in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 3
+        limiter.release()
+        await asyncio.gather(*waiters)
+
+        await limiter.acquire()
+        with pytest.raises(LoadShedError):
+            await limiter.acquire()
+        limiter.release()
+
+    asyncio.run(run())
+    assert order == [0, 1, 2]
+    snapshot = limiter.snapshot()
+    assert snapshot["shed"] == 1
+    assert snapshot["in_flight"] == 0 and snapshot["queue_depth"] == 0
+
+
+def test_asi_caps_async_calls():
+    """Test ASI never exceeds the limit and recovers after overload errors."""
+    active = 0
+    peak = 0
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak, calls
+        calls += 1
+        if calls == 1:
+            return httpx.Response(503, json={"error": {"message": "busy"}})
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        body = json.loads(request.content)
+        return httpx.Response(200, json=chat_completion_body(str(body["messages"])))
+
+    llm = ASI(
+        api_key="test",
+        max_retries=0,
+        adaptive_concurrency=True,
+        initial_concurrency=3,
+        max_in_flight=3,
+        async_http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+    async def run():
+        with pytest.raises(Exception):
+            await llm.acomplete("first")
+        assert llm.concurrency_limiter.limit == 2
+        return await asyncio.gather(*(llm.acomplete(f"p{i}") for i in range(12)))
+
+    responses = asyncio.run(run())
+    assert len(responses) == 12
+    limiter = llm.concurrency_limiter
+    assert limiter is not None and limiter.stats.overloads == 1
+    assert 1 < peak <= 3
+    assert limiter.in_flight == 0
+
+
+def test_streams_take_slots_lazily_and_learn_first_item_latency():
+    """Test unread streams hold no slot and long generations are not overload."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=4)
+
+    async def generate():
+        yield "first"
+        await asyncio.sleep(0.2)
+        yield "second"
+
+    async def open_stream():
+        return generate()
+
+    async def run():
+        stream = await limiter.stream(open_stream)
+        del stream
+        assert limiter.in_flight == 0
+        stream = await limiter.stream(open_stream)
+        assert [item async for item in stream] == ["first", "second"]
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert limiter._long_rtt is not None and limiter._long_rtt < 0.1
@@ -0,0 +1,143 @@
+"""Unit tests for hedged ASI requests."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.hedging import Hedger, LatencyHistogram
+
+
+def test_histogram_percentile():
+    """Test percentiles are accurate within the bucket growth factor."""
+    histogram = LatencyHistogram()
+    for i in range(1, 101):
+        histogram.record(i / 100)
+    assert histogram.percentile(0.5) == pytest.approx(0.5, rel=0.1)
+    assert histogram.percentile(0.95) == pytest.approx(0.95, rel=0.1)
+
+
+def test_hedge_delay_tracks_histogram():
+    """Test the initial delay is used until enough samples were seen."""
+    hedger = Hedger(percentile=0.9, initial_delay=5.0, min_samples=10)
+    assert hedger.hedge_delay(hedger.latency) == 5.0
+    for _ in range(10):
+        hedger.latency.record(0.1)
+    assert hedger.hedge_delay(hedger.latency) == pytest.approx(0.1, rel=0.1)
+
+
+def test_acall_hedges_slow_attempt_and_cancels_loser():
+    """Test that a slow first attempt is raced and cancelled."""
+    hedger = Hedger(budget=1.0, initial_delay=0.01)
+    delays = [1.0, 0.0]
+    cancelled = []
+
+    async def attempt():
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    assert asyncio.run(hedger.acall(attempt)) == 0.0
+    assert cancelled == [1.0]
+    assert hedger.stats.as_dict() == {"requests": 1, "hedges": 1, "hedge_wins": 1}
+
+
+def test_budget_caps_hedges():
+    """Test that no hedge is sent without budget credits."""
+    hedger = Hedger(budget=0.0, initial_delay=0.001)
+
+    async def attempt():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    assert asyncio.run(hedger.acall(attempt)) == "ok"
+    assert hedger.stats.hedges == 0
+
+
+def test_astream_races_on_first_chunk():
+    """Test that the stream producing the first chunk first is relayed."""
+    hedger = Hedger(budget=1.0, initial_delay=0.01)
+    first_chunk_delays = [1.0, 0.0]
+    closed = []
+
+    async def open_stream():
+        delay = first_chunk_delays.pop(0)
+
+        async def gen():
+            try:
+                await asyncio.sleep(delay)
+                for i in range(3):
+                    yield f"{delay}-{i}"
+            finally:
+                closed.append(delay)
+
+        return gen()
+
+    async def run():
+        return [chunk async for chunk in hedger.astream(open_stream)]
+
+    assert asyncio.run(run()) == ["0.0-0", "0.0-1", "0.0-2"]
+    assert sorted(closed) == [0.0, 1.0]
+
+
+def test_sync_call_hedges_on_threads():
+    """Test the thread based sync hedging path."""
+    hedger = Hedger(budget=1.0, initial_delay=0.01)
+    delays = [0.5, 0.0]
+    lock = threading.Lock()
+
+    def attempt():
+        with lock:
+            delay = delays.pop(0)
+        time.sleep(delay)
+        return delay
+
+    assert hedger.call(attempt) == 0.0
+    assert hedger.stats.hedge_wins == 1
+
+
+def test_sync_call_runs_inline_and_ignores_pool_queueing():
+    """Test unhedgeable calls stay on the caller's thread and queue time is free."""
+    hedger = Hedger(budget=0.0)
+    assert hedger.call(threading.current_thread) is threading.current_thread()
+
+    # A busy worker pool delays the attempt without triggering a hedge.
+    hedger = Hedger(budget=1.0, initial_delay=0.1)
+    hedger._executor = ThreadPoolExecutor(max_workers=1)
+    hedger._executor.submit(time.sleep, 0.3)
+    assert hedger.call(lambda: time.sleep(0.05) or "ok") == "ok"
+    assert hedger.stats.hedges == 0
+    assert hedger.latency.percentile(0.5) < 0.1
+
+
+def test_asi_chat_is_hedged(mock_server):
+    """Test that ASI sends a hedge when the endpoint stalls."""
+    calls = []
+
+    def stalling_handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            time.sleep(0.5)
+        return mock_server.handler(request)
+
+    llm = ASI(
+        api_key="test_key",
+        max_retries=0,
+        hedge_requests=True,
+        hedge_budget=1.0,
+        hedge_initial_delay=0.05,
+        http_client=httpx.Client(transport=httpx.MockTransport(stalling_handler)),
+    )
+    response = llm.chat([ChatMessage(role=MessageRole.USER, content="hi")])
+    assert response.message.content == "echo hi"
+    assert llm.hedger.stats.hedge_wins == 1
+    assert len(calls) == 2
@@ -0,0 +1,33 @@
+"""Tests for the lazy package import."""
+
+import pytest
+
+import llama_index_llms_asi
+from benchmarks.import_time import main, measure_import
+
+
+def test_bare_import_skips_heavy_dependencies():
+    """Test that importing the package does not load the LLM stack."""
+    result = measure_import("import llama_index_llms_asi")
+    assert result["heavy_modules"] == []
+
+
+def test_lazy_exports_resolve():
+    """Test that every export is importable and listed by dir()."""
+    for name in llama_index_llms_asi.__all__:
+        assert getattr(llama_index_llms_asi, name) is not None
+        assert name in dir(llama_index_llms_asi)
+    from llama_index_llms_asi import ASI
+
+    assert ASI.class_name() == "ASI"
+
+
+def test_unknown_attribute():
+    """Test that unknown names still raise AttributeError."""
+    with pytest.raises(AttributeError):
+        llama_index_llms_asi.NotAThing
+
+
+def test_cli_guard_passes():
+    """Test the import-time guard used by `make bench-import`."""
+    assert main(["--repeat", "1"]) == 0
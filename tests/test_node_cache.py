@@ -0,0 +1,140 @@
+"""Unit tests for the persistent node and embedding cache."""
+
+import asyncio
+from typing import Any, List, Sequence
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import (
+    BaseNode,
+    Document,
+    NodeRelationship,
+    TransformComponent,
+)
+
+from llama_index_llms_asi import NodeCache
+
+
+class CountingEmbedding(BaseEmbedding):
+    """Deterministic embeddings that count the texts embedded."""
+
+    texts: List[str] = []
+
+    def _embed(self, text: str) -> List[float]:
+        self.texts.append(text)
+        return [float(len(text)), float(text.count("a")), 1.0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+
+def _documents() -> List[Document]:
+    # Fresh random ids on every call, as in the examples.
+    return [
+        Document(text="Python is a language. " * 20, metadata={"lang": "py"}),
+        Document(text="Rust is a language too. " * 20, metadata={"lang": "rs"}),
+    ]
+
+
+def test_unchanged_corpus_is_loaded_not_embedded(tmp_path):
+    """Test a second run loads nodes and vectors without embedding."""
+    path = str(tmp_path / "nodes")
+    splitter = SentenceSplitter(chunk_size=64, chunk_overlap=0)
+    embed_model = CountingEmbedding(texts=[])
+    cache = NodeCache(path, embed_model, transformations=[splitter])
+    first = cache.get_nodes(_documents())
+    embedded = len(embed_model.texts)
+    assert embedded == len(first) > 2
+    cache.close()
+
+    embed_model = CountingEmbedding(texts=[])
+    cache = NodeCache(path, embed_model, transformations=[splitter])
+    documents = _documents()
+    second = cache.get_nodes(documents)
+    assert embed_model.texts == []
+    assert [n.get_content() for n in second] == [n.get_content() for n in first]
+    assert [n.embedding for n in second] == [n.embedding for n in first]
+    assert second[0].relationships[NodeRelationship.SOURCE].node_id == (
+        documents[0].doc_id
+    )
+    assert cache.stats.as_dict()["documents_reused"] == 2
+
+    # The index is built from cached vectors without embedding the nodes.
+    index = cache.build_index(documents)
+    assert embed_model.texts == []
+    retriever = index.as_retriever(similarity_top_k=1)
+    assert retriever.retrieve("Rust")
+    cache.close()
+
+
+def test_incremental_update_embeds_only_changed_documents(tmp_path):
+    """Test a changed document is re-embedded and its old rows are reused."""
+    path = str(tmp_path / "nodes")
+    embed_model = CountingEmbedding(texts=[])
+    cache = NodeCache(path, embed_model)
+    documents = _documents()
+    cache.get_nodes(documents)
+    assert len(cache) == 2
+    rows = cache._size
+
+    documents[1] = Document(text="Rust is memory safe.", metadata={"lang": "rs"})
+    embed_model.texts.clear()
+    nodes = cache.get_nodes(documents)
+    assert embed_model.texts and all("Rust" in t for t in embed_model.texts)
+    assert len(cache) == 2
+    assert cache.stats.as_dict() == {
+        "documents_reused": 1,
+        "documents_indexed": 3,
+        "documents_removed": 1,
+        "nodes_embedded": rows + 1,
+    }
+    # The replaced document's slot was freed and recycled.
+    assert cache._size == rows
+    assert nodes[-1].get_content() == "Rust is memory safe."
+
+    # Another embedding model invalidates every entry.
+    other = NodeCache(path, CountingEmbedding(model_name="other", texts=[]))
+    asyncio.run(other.aget_nodes(documents))
+    assert other.stats.documents_indexed == 2
+    assert np.asarray(other._vectors).dtype == np.float32
+
+
+class DetachNodes(TransformComponent):
+    """A transformation that drops the source relationship of every node."""
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[BaseNode]:
+        for node in nodes:
+            node.relationships.pop(NodeRelationship.SOURCE, None)
+        return list(nodes)
+
+
+def test_new_nodes_are_attributed_by_document(tmp_path):
+    """Test shared doc ids and detached nodes land under their own document."""
+    path = str(tmp_path / "nodes")
+    splitter = SentenceSplitter(chunk_size=64, chunk_overlap=0)
+    cache = NodeCache(
+        path, CountingEmbedding(texts=[]), transformations=[splitter, DetachNodes()]
+    )
+    documents = [
+        Document(text="Python is a language.", id_="same"),
+        Document(text="Rust is a language too.", id_="same"),
+    ]
+    first = cache.get_nodes(documents)
+    assert [n.get_content() for n in first] == [d.text for d in documents]
+    cache.close()
+
+    cache = NodeCache(
+        path, CountingEmbedding(texts=[]), transformations=[splitter, DetachNodes()]
+    )
+    second = cache.get_nodes(documents[::-1])
+    assert [n.get_content() for n in second] == [d.text for d in documents[::-1]]
+    assert [n.embedding for n in second] == [n.embedding for n in first[::-1]]
+    assert cache.stats.documents_reused == 2
+    cache.close()
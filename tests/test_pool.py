@@ -0,0 +1,104 @@
+"""Unit tests for the shared ASI connection pool."""
+
+import asyncio
+
+import httpx
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.pool import ConnectionPool, make_pool_key
+
+
+def test_pool_key_hashes_api_key():
+    """Test that credentials are not stored in clear text in the key."""
+    key = make_pool_key("https://api.asi1.ai/v1/", "secret")
+    assert "secret" not in key
+    assert key[0] == "https://api.asi1.ai/v1"
+    assert key != make_pool_key("https://api.asi1.ai/v1", "other")
+
+
+def test_transport_is_shared_per_key():
+    """Test that equal keys share one underlying transport."""
+    pool = ConnectionPool()
+    key = make_pool_key("https://api.asi1.ai/v1", "k")
+    first = pool.get_transport(key)
+    second = pool.get_transport(key)
+    other = pool.get_transport(make_pool_key("https://api.asi1.ai/v1", "k2"))
+    assert first._transport is second._transport
+    assert first._transport is not other._transport
+    pool.close()
+
+
+def test_closing_client_keeps_pooled_transport_open():
+    """Test that closing a per-instance client does not close the pool."""
+    pool = ConnectionPool()
+    key = make_pool_key("https://api.asi1.ai/v1", "k")
+    client = pool.get_http_client(key)
+    shared = client._transport._transport
+    client.close()
+    assert pool.get_transport(key)._transport is shared
+    pool.close()
+    assert pool.get_transport(key)._transport is not shared
+    pool.close()
+
+
+def test_async_transport_is_bound_to_loop():
+    """Test that async transports are not reused across event loops."""
+    pool = ConnectionPool()
+    key = make_pool_key("https://api.asi1.ai/v1", "k")
+
+    async def get_transport():
+        return pool.get_async_transport(key)._transport
+
+    first = asyncio.run(get_transport())
+    second = asyncio.run(get_transport())
+    assert isinstance(first, httpx.AsyncHTTPTransport)
+    assert first is not second
+    pool.close()
+
+
+def test_async_connections_are_closed_on_their_loop():
+    """Test that loop-bound connections close with the loop or the pool."""
+    from benchmarks.mock_server import MockASIServer, MockServerConfig
+
+    body = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+    with MockASIServer(MockServerConfig()) as server:
+        pool = ConnectionPool()
+        key = make_pool_key(server.url, "k")
+
+        async def request():
+            client = pool.get_async_http_client(key)
+            response = await client.post(f"{server.url}/chat/completions", json=body)
+            assert response.status_code == 200
+            transport = pool.get_async_transport(key)._transport
+            assert len(transport._pool.connections) == 1
+            return transport
+
+        # `asyncio.run` closes them as it shuts the loop down.
+        transport = asyncio.run(request())
+        assert transport._pool.connections == []
+
+        # `close` closes those of a loop that is still open.
+        loop = asyncio.new_event_loop()
+        transport = loop.run_until_complete(request())
+        pool.close()
+        assert transport._pool.connections == []
+        loop.close()
+
+
+def test_asi_instances_share_pool():
+    """Test that ASI instances with the same credentials share connections."""
+    first = ASI(api_key="test_key")
+    second = ASI(api_key="test_key")
+    first_client = first._get_credential_kwargs()["http_client"]
+    second_client = second._get_credential_kwargs()["http_client"]
+    assert first_client._transport._transport is second_client._transport._transport
+
+
+def test_asi_explicit_http_client_bypasses_pool():
+    """Test that a user supplied http_client is used as is."""
+    http_client = httpx.Client()
+    llm = ASI(api_key="test_key", http_client=http_client)
+    assert llm._get_credential_kwargs()["http_client"] is http_client
+
+    llm = ASI(api_key="test_key", use_connection_pool=False)
+    assert llm._get_credential_kwargs()["http_client"] is None
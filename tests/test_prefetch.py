@@ -0,0 +1,154 @@
+"""Unit tests for speculative follow-up prefetching."""
+
+import time
+
+import httpx
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.prefetch import (
+    Prefetcher,
+    PriorityGate,
+    PriorityTransport,
+)
+
+FOLLOW_UPS = ["Summarize that.", "Make it shorter."]
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_jobs_run_by_priority():
+    """Test that queued jobs run lowest priority value first."""
+    prefetcher = Prefetcher()
+    prefetcher.gate.begin()  # hold the workers back while jobs queue up
+    order = []
+    for priority in (2, 0, 1):
+        prefetcher.schedule(
+            f"k{priority}", lambda p=priority: order.append(p) or {"p": p}, priority
+        )
+    assert not prefetcher.schedule("k0", lambda: {}, 0)  # already queued
+    prefetcher.gate.end()
+    _wait_for(lambda: prefetcher.stats.completed == 3)
+    assert order == [0, 1, 2]
+    assert prefetcher.get("k1") == {"p": 1}
+    prefetcher.close()
+
+
+def test_queue_is_bounded_and_jobs_expire():
+    """Test that excess and stale jobs are dropped."""
+    prefetcher = Prefetcher(ttl=0.05, max_pending=2)
+    prefetcher.gate.begin()
+    prefetcher.schedule("a", lambda: {}, 0)
+    # The worker may already hold "a"; the rest stay queued.
+    time.sleep(0.01)
+    for key, priority in (("b", 0), ("c", 1), ("d", 2)):
+        prefetcher.schedule(key, lambda: {}, priority)
+    assert prefetcher.stats.dropped >= 1
+    time.sleep(0.1)
+    prefetcher.gate.end()
+    _wait_for(lambda: prefetcher.stats.dropped + prefetcher.stats.completed == 4)
+    assert prefetcher.get("b") is None
+    prefetcher.close()
+
+
+def test_background_requests_wait_for_foreground():
+    """Test that the transport holds background requests behind foreground ones."""
+    gate = PriorityGate()
+    events = []
+
+    def handler(request):
+        events.append(request.url.path)
+        return httpx.Response(200, content=iter([b"x" * 10]))
+
+    client = httpx.Client(
+        transport=PriorityTransport(httpx.MockTransport(handler), gate)
+    )
+    with client.stream("GET", "http://asi/foreground") as response:
+        assert gate.foreground == 1
+        prefetcher = Prefetcher()
+        prefetcher.gate = gate
+        prefetcher.schedule(
+            "bg", lambda: {"status": client.get("http://asi/background").status_code}
+        )
+        time.sleep(0.05)
+        assert events == ["/foreground"]
+        response.read()
+    _wait_for(lambda: prefetcher.get("bg") is not None)
+    assert events == ["/foreground", "/background"]
+    assert gate.foreground == 0
+    prefetcher.close()
+
+
+def test_asi_answers_follow_up_from_prefetch(mock_server):
+    """Test that a predicted follow-up is served without a new request."""
+    llm = ASI(
+        api_key="test_key",
+        http_client=mock_server.http_client(),
+        prefetch_follow_ups=FOLLOW_UPS,
+    )
+    question = ChatMessage(role=MessageRole.USER, content="Tell me about Paris")
+    answer = llm.chat([question])
+    _wait_for(lambda: llm.prefetcher.stats.completed == 2)
+    assert len(mock_server.requests) == 3
+
+    follow_up = [
+        question,
+        ChatMessage(role=MessageRole.ASSISTANT, content=answer.message.content),
+        ChatMessage(role=MessageRole.USER, content="Summarize that."),
+    ]
+    chunks = list(llm.stream_chat(follow_up))
+    assert chunks[-1].message.content == "echo Summarize that."
+    # Only the follow-ups of the follow-up were requested, in the background.
+    _wait_for(lambda: llm.prefetcher.stats.completed == 4)
+    assert len(mock_server.requests) == 5
+    assert llm.prefetcher.cache.stats.hits == 1
+    llm.prefetcher.close()
+
+
+def test_asi_prefetch_is_opt_in(mock_server):
+    """Test that no follow-ups are sent by default."""
+    llm = ASI(api_key="test_key", http_client=mock_server.http_client())
+    llm.chat([ChatMessage(role=MessageRole.USER, content="hi")])
+    assert llm.prefetcher is None
+    assert len(mock_server.requests) == 1
+
+
+def test_asi_builds_gated_client():
+    """Test that ASI-built clients put prefetches behind foreground requests."""
+    llm = ASI(api_key="test_key", prefetch_follow_ups=FOLLOW_UPS)
+    client = llm._build_http_client(False)
+    assert isinstance(client._transport, PriorityTransport)
+    client.close()
+
+
+def test_user_clients_mark_foreground_requests(mock_server):
+    """Test the gate sees foreground requests sent with the user's clients."""
+    seen = []
+
+    def handler(request):
+        seen.append((request.url.path, llm.prefetcher.gate.foreground))
+        return mock_server.handler(request)
+
+    transport = httpx.MockTransport(handler)
+    llm = ASI(
+        api_key="test_key",
+        prefetch_follow_ups=FOLLOW_UPS[:1],
+        http_client=httpx.Client(transport=transport),
+    )
+    question = [ChatMessage(role=MessageRole.USER, content="hi")]
+    llm.chat(question)
+    _wait_for(lambda: llm.prefetcher.stats.completed == 1)
+    # The foreground chat held the gate; its background follow-up did not.
+    assert [count for _, count in seen] == [1, 0]
+
+    stream = llm.stream_chat([ChatMessage(role=MessageRole.USER, content="yo")])
+    next(stream)
+    assert llm.prefetcher.gate.foreground == 1
+    list(stream)
+    assert llm.prefetcher.gate.foreground == 0
+    llm.prefetcher.close()
@@ -0,0 +1,99 @@
+"""Unit tests for pickling ASI and using it from worker processes."""
+
+import logging
+import multiprocessing
+import pickle
+
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI, InMemoryCache, SQLiteCache
+from llama_index_llms_asi.pool import get_connection_pool, make_pool_key
+from llama_index_llms_asi.process_pool import map_chat, map_complete
+from llama_index_llms_asi.telemetry import HistogramSink
+
+fork_only = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="requires the fork start method",
+)
+
+
+def test_pickles_configuration_only(tmp_path, caplog):
+    """Test that clients and per-process options are not pickled."""
+    llm = ASI(
+        api_key="test_key",
+        temperature=0.3,
+        max_tokens=64,
+        coalesce_requests=True,
+        cache=SQLiteCache(str(tmp_path / "cache.db")),
+        telemetry=HistogramSink(),
+    )
+    llm._get_client()
+    llm.single_flight
+
+    with caplog.at_level(logging.WARNING, logger="llama_index_llms_asi.asi"):
+        copy = pickle.loads(pickle.dumps(llm))
+    assert "telemetry" in caplog.text and "scheduler" not in caplog.text
+    assert (copy.api_key, copy.temperature, copy.max_tokens) == ("test_key", 0.3, 64)
+    assert copy._client is None and copy._single_flight is None
+    assert copy.telemetry is None
+    assert copy.cache.path == llm.cache.path
+    llm.cache.set("key", {"text": "shared"})
+    assert copy.cache.get("key") == {"text": "shared"}
+
+
+def test_in_memory_cache_pickles_empty():
+    """Test that in-memory cache entries stay in their process."""
+    cache = InMemoryCache(max_size=5, ttl=10.0)
+    cache.set("key", {"text": "x"})
+    copy = pickle.loads(pickle.dumps(cache))
+    assert (copy.max_size, copy.ttl, len(copy)) == (5, 10.0, 0)
+
+
+def test_pid_change_resets_clients():
+    """Test that state inherited through fork is dropped."""
+    llm = ASI(api_key="test_key", coalesce_requests=True, gzip_requests=True)
+    client = llm._get_client()
+    flight = llm.single_flight
+    encoder = llm.request_encoder
+    assert llm._get_client() is client
+
+    llm._pid = -1  # as seen from a forked child
+    assert llm._get_client() is not client
+    assert llm.single_flight is not flight
+    assert llm.request_encoder is not encoder
+
+
+def test_connection_pool_resets_after_fork():
+    """Test that a child process does not reuse the parent's sockets."""
+    pool = get_connection_pool()
+    key = make_pool_key("https://api.asi1.ai/v1", "test_key")
+    transport = pool.get_transport(key)._transport
+    assert pool.get_transport(key)._transport is transport
+    pool._pid = -1
+    assert pool.get_transport(key)._transport is not transport
+
+
+@fork_only
+def test_map_complete_across_processes():
+    """Test mapping prompts over forked workers against a real server."""
+    from benchmarks.mock_server import MockASIServer, MockServerConfig
+
+    with MockASIServer(MockServerConfig(completion_tokens=3)) as server:
+        llm = ASI(api_key="test_key", api_base=server.url, max_retries=0)
+        prompts = [f"prompt {i}" for i in range(10)]
+        results = map_complete(
+            llm,
+            prompts,
+            processes=2,
+            chunk_size=3,
+            mp_context=multiprocessing.get_context("fork"),
+        )
+        assert [r.index for r in results] == list(range(10))
+        assert all(r.ok and r.response.text for r in results)
+
+        messages = [[ChatMessage(role=MessageRole.USER, content="hi")]] * 3
+        chats = map_chat(
+            llm, messages, processes=2, mp_context=multiprocessing.get_context("fork")
+        )
+        assert all(r.ok and r.response.message.content for r in chats)
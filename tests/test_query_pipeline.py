@@ -0,0 +1,121 @@
+"""Unit tests for the pipelined RAG query runner."""
+
+import asyncio
+import json
+import time
+from typing import List
+
+import httpx
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.postprocessor import SimilarityPostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from llama_index_llms_asi import ASI, aiter_queries, run_queries
+
+from .conftest import chat_completion_sse
+
+
+class SlowRetriever(BaseRetriever):
+    """Returns two nodes per query after a delay, logging when it runs."""
+
+    def __init__(self, delay: float, log: list) -> None:
+        super().__init__()
+        self.delay = delay
+        self.log = log
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        raise NotImplementedError
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        query = query_bundle.query_str
+        if query == "broken":
+            raise RuntimeError("index unavailable")
+        self.log.append(("retrieve", query, time.perf_counter()))
+        await asyncio.sleep(self.delay)
+        return [
+            NodeWithScore(node=TextNode(text=f"about {query}"), score=0.9),
+            NodeWithScore(node=TextNode(text="unrelated"), score=0.1),
+        ]
+
+
+def _llm(log: list, delay: float = 0.05) -> ASI:
+    """An ASI model whose streamed answers take `delay` (longer for "slow")."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        query = prompt.rsplit("Query: ", 1)[1].split("\n", 1)[0]
+        log.append(("generate", query, time.perf_counter()))
+        await asyncio.sleep(delay * (4 if query == "slow" else 1))
+        log.append(("generated", query, time.perf_counter()))
+        return httpx.Response(
+            200,
+            content=chat_completion_sse(["answer ", query]),
+            headers={"content-type": "text/event-stream"},
+        )
+
+    return ASI(
+        api_key="test",
+        max_retries=0,
+        async_http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+def test_retrieval_overlaps_generation():
+    """Test retrieval of the next query runs while the previous one generates."""
+    log: list = []
+    llm = _llm(log)
+    retriever = SlowRetriever(0.05, log)
+    # Load the tokenizer and HTTP client outside the timed run.
+    run_queries(llm, retriever, ["warm-up"])
+    queries = [f"q{i}" for i in range(4)]
+    start = time.perf_counter()
+    results = run_queries(
+        llm,
+        retriever,
+        queries,
+        max_concurrency=1,
+        node_postprocessors=[SimilarityPostprocessor(similarity_cutoff=0.5)],
+    )
+    elapsed = time.perf_counter() - start
+    # Sequential runs take 4 * (0.05 + 0.05); pipelined ones about 5 * 0.05.
+    assert elapsed < 0.35
+    times = {(kind, query): at for kind, query, at in log}
+    assert times[("retrieve", "q1")] < times[("generated", "q0")]
+    assert [r.response for r in results] == [f"answer {q}" for q in queries]
+    assert all(len(r.source_nodes) == 1 for r in results)
+    timings = results[0].timings()
+    assert timings["retrieve"] >= 0.04
+    assert timings["first_token"] is not None and timings["generate"] >= 0.04
+    assert timings["total"] >= timings["retrieve"] + timings["generate"]
+
+
+def test_ordered_and_as_completed_output():
+    """Test results come in input order or as they finish, errors included."""
+    log: list = []
+    llm = _llm(log, delay=0.02)
+    retriever = SlowRetriever(0.01, log)
+    queries = ["slow", "broken", "fast"]
+
+    async def run(ordered: bool):
+        deltas: list = []
+        results = [
+            r
+            async for r in aiter_queries(
+                llm,
+                retriever,
+                queries,
+                max_concurrency=3,
+                ordered=ordered,
+                on_delta=lambda i, d: deltas.append(i),
+            )
+        ]
+        return results, deltas
+
+    results, deltas = asyncio.run(run(ordered=True))
+    assert [r.index for r in results] == [0, 1, 2]
+    assert not results[1].ok and "index unavailable" in str(results[1].error)
+    assert str(results[2]) == "answer fast"
+    assert sorted(set(deltas)) == [0, 2]
+
+    results, _ = asyncio.run(run(ordered=False))
+    assert [r.index for r in results] == [1, 2, 0]
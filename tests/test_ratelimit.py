@@ -0,0 +1,114 @@
+"""Unit tests for the adaptive ASI rate limiter."""
+
+import httpx
+import pytest
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.ratelimit import (
+    AdaptiveRateLimiter,
+    RateLimitedTransport,
+    estimate_request_tokens,
+    parse_duration,
+)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("1.5", 1.5), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3s", 3723.0), ("", None)],
+)
+def test_parse_duration(value, expected):
+    """Test parsing of rate-limit reset headers."""
+    assert parse_duration(value) == expected
+
+
+def test_estimate_request_tokens_uses_max_tokens():
+    """Test that the completion budget is part of the token estimate."""
+    content = b'{"messages": [], "max_tokens": 100}'
+    assert estimate_request_tokens(content) == len(content) // 4 + 100
+
+
+def test_request_bucket_delays_after_burst():
+    """Test that requests beyond the quota have to wait."""
+    limiter = AdaptiveRateLimiter(requests_per_minute=60)
+    for _ in range(60):
+        assert limiter.reserve() == 0.0
+    assert limiter.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_throttle_backs_off_once_per_burst_and_recovers():
+    """Test multiplicative decrease on 429 and additive increase on success."""
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, jitter=0.0)
+    headers = httpx.Headers({"retry-after": "2"})
+    limiter.on_response(429, headers)
+    limiter.on_response(429, headers)
+    assert limiter.scale == 0.5
+    assert limiter.throttled == 2
+    assert limiter.reserve() == pytest.approx(2.0, abs=0.05)
+
+    limiter.on_response(200, httpx.Headers())
+    assert limiter.scale == pytest.approx(0.52)
+
+
+def test_remaining_headers_pause_until_reset():
+    """Test that exhausted server quota pauses callers until it resets."""
+    limiter = AdaptiveRateLimiter(tokens_per_minute=10_000)
+    limiter.on_response(
+        200,
+        httpx.Headers(
+            {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "3s"}
+        ),
+    )
+    assert limiter.reserve(10) == pytest.approx(3.0, abs=0.05)
+
+
+def test_rate_limited_transport_observes_responses():
+    """Test that the transport acquires before and adapts after each attempt."""
+    limiter = AdaptiveRateLimiter(requests_per_minute=600, jitter=0.0)
+    transport = RateLimitedTransport(
+        httpx.MockTransport(
+            lambda request: httpx.Response(429, headers={"retry-after": "0"})
+        ),
+        limiter,
+    )
+    with httpx.Client(transport=transport) as client:
+        assert client.post("https://api.asi1.ai/v1/chat", json={}).status_code == 429
+    assert limiter.throttled == 1
+    assert limiter.scale == 0.5
+
+
+def test_asi_instances_share_limiter():
+    """Test that instances with the same endpoint and key share one limiter."""
+    first = ASI(api_key="shared_key", requests_per_minute=100)
+    second = ASI(api_key="shared_key", requests_per_minute=100)
+    assert first.adaptive_rate_limiter is second.adaptive_rate_limiter
+    assert ASI(api_key="shared_key").adaptive_rate_limiter is None
+
+    client = first._get_credential_kwargs()["http_client"]
+    assert isinstance(client._transport, RateLimitedTransport)
+
+
+def test_instances_with_different_quotas_share_one_bucket(caplog):
+    """Test that another instance's quotas neither refill nor drop the bucket."""
+    first = ASI(api_key="quota_key", requests_per_minute=60)
+    limiter = first.adaptive_rate_limiter
+    for _ in range(60):
+        limiter.reserve()
+    assert limiter._requests._level < 1
+
+    # A looser request quota and an extra token quota: the stricter apply.
+    second = ASI(api_key="quota_key", requests_per_minute=120, tokens_per_minute=1000)
+    with caplog.at_level("WARNING", logger="llama_index_llms_asi.ratelimit"):
+        second._get_credential_kwargs()
+        assert second.adaptive_rate_limiter is limiter
+    assert "Conflicting rate limits" in caplog.text
+    assert (limiter.requests_per_minute, limiter.tokens_per_minute) == (60, 1000)
+    assert limiter._requests._level < 1
+
+    # An instance limiting only tokens keeps the request limit, and a lower
+    # rate keeps the drained level.
+    third = ASI(api_key="quota_key", requests_per_minute=30, tokens_per_minute=None)
+    third._get_credential_kwargs()
+    first._get_credential_kwargs()
+    assert limiter.requests_per_minute == 30 and limiter._requests._level < 1
+    ASI(api_key="quota_key", tokens_per_minute=500)._get_credential_kwargs()
+    assert limiter._requests is not None and limiter.tokens_per_minute == 500
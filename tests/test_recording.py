@@ -0,0 +1,105 @@
+"""Unit tests for recording and replaying ASI exchanges."""
+
+import asyncio
+import json
+import time
+
+import httpx
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from benchmarks.mock_server import MockASIServer, MockServerConfig
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.recording import (
+    Recorder,
+    Recording,
+    RecordingTransport,
+    ReplayTransport,
+)
+
+from .conftest import MockEndpoint
+
+MESSAGES = [ChatMessage(role=MessageRole.USER, content="hi")]
+
+
+def test_record_then_replay_with_timings(tmp_path):
+    """Test streamed chunks are recorded with offsets and replayed in pace."""
+    path = str(tmp_path / "asi.jsonl")
+    config = MockServerConfig(
+        latency=0.05, completion_tokens=4, tokens_per_second=40, chunk_tokens=1
+    )
+    with MockASIServer(config) as server:
+        llm = ASI(api_key="mock", api_base=server.url, record_path=path)
+        recorded = "".join(r.delta for r in llm.stream_chat(MESSAGES))
+        llm.chat(MESSAGES)
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 2
+    streamed = records[0]
+    assert streamed["ttfb"] >= 0.04
+    assert streamed["chunks"][-1][0] >= 0.05
+
+    replay = ASI(api_key="mock", replay_path=path, max_retries=0)
+    start = time.perf_counter()
+    assert "".join(r.delta for r in replay.stream_chat(MESSAGES)) == recorded
+    assert time.perf_counter() - start >= 0.1
+
+    fast = ASI(api_key="mock", replay_path=path, replay_speed=0, max_retries=0)
+    start = time.perf_counter()
+    assert fast.chat(MESSAGES).message.content == recorded
+    assert time.perf_counter() - start < 0.1
+
+
+def test_replay_under_concurrency(tmp_path):
+    """Test many concurrent async replays overlap instead of queueing."""
+    path = str(tmp_path / "asi.jsonl")
+    endpoint = MockEndpoint(lambda body: "recorded answer")
+    recorder = Recorder(path)
+    client = httpx.Client(
+        transport=RecordingTransport(httpx.MockTransport(endpoint.handler), recorder)
+    )
+    ASI(api_key="mock", http_client=client).chat(MESSAGES)
+    recorder.close()
+    with open(path) as f:
+        record = json.loads(f.readline())
+    # Pretend the server took 0.2s to answer.
+    record["ttfb"] = 0.2
+    with open(path, "w") as f:
+        f.write(json.dumps(record) + "\n")
+
+    llm = ASI(api_key="mock", replay_path=path, replay_mode="any", max_retries=0)
+
+    async def run():
+        prompts = [f"prompt {i}" for i in range(50)]
+        return await asyncio.gather(*(llm.acomplete(p) for p in prompts))
+
+    start = time.perf_counter()
+    responses = asyncio.run(run())
+    assert time.perf_counter() - start < 1.0
+    assert {r.text for r in responses} == {"recorded answer"}
+
+
+def test_replay_cycles_and_rejects_unknown_requests(tmp_path):
+    """Test repeated recordings are served in turn and misses get a 404."""
+    path = str(tmp_path / "asi.jsonl")
+    answers = iter(["first", "second"])
+    endpoint = MockEndpoint(lambda body: next(answers))
+    recorder = Recorder(path)
+    transport = RecordingTransport(httpx.MockTransport(endpoint.handler), recorder)
+    with httpx.Client(transport=transport) as client:
+        for _ in range(2):
+            client.post("https://x/v1/chat/completions", json={"a": 1}).read()
+    # A torn last line is ignored.
+    with open(path, "a") as f:
+        f.write('{"key": "trunc')
+
+    recording = Recording(path)
+    assert len(recording) == 2
+    with httpx.Client(transport=ReplayTransport(recording, speed=0)) as client:
+        url = "https://x/v1/chat/completions"
+        contents = [
+            client.post(url, json={"a": 1}).json()["choices"][0]["message"]["content"]
+            for _ in range(3)
+        ]
+        assert contents == ["first", "second", "first"]
+        assert client.post(url, json={"a": 2}).status_code == 404
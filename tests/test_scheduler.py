@@ -0,0 +1,221 @@
+"""Unit tests for the multi-tenant fair scheduler."""
+
+import asyncio
+import threading
+import time
+from typing import List
+
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import (
+    ASI,
+    DeadlineExceededError,
+    FairScheduler,
+    Tenant,
+    tenant_context,
+)
+
+from .conftest import MockEndpoint
+
+
+def _grant_order(scheduler: FairScheduler, jobs: List[tuple]) -> List[str]:
+    """Queue `(tenant, priority)` jobs behind a held slot and record start order."""
+    order: List[str] = []
+
+    async def job(tenant: str, priority: str) -> None:
+        with tenant_context(tenant, priority):
+            ticket = await scheduler.aacquire()
+        order.append(tenant)
+        await asyncio.sleep(0)
+        scheduler.release(ticket)
+
+    async def run():
+        blocker = await scheduler.aacquire()
+        tasks = [asyncio.ensure_future(job(*j)) for j in jobs]
+        await asyncio.sleep(0.01)
+        assert scheduler.queue_depth == len(jobs)
+        scheduler.release(blocker)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    return order
+
+
+def test_weighted_fair_share():
+    """Test a heavier tenant gets proportionally more of contended slots."""
+    scheduler = FairScheduler(1, tenants=[Tenant("a", weight=3), Tenant("b")])
+    jobs = [("a", "interactive")] * 6 + [("b", "interactive")] * 6
+    order = _grant_order(scheduler, jobs)
+    assert order[:4].count("a") == 3
+    assert order[:8].count("a") == 6
+
+
+def test_interactive_before_batch():
+    """Test batch requests only get capacity interactive ones leave."""
+    scheduler = FairScheduler(1)
+    jobs = [("bulk", "batch")] * 3 + [("user", "interactive")] * 2
+    assert _grant_order(scheduler, jobs) == ["user", "user", "bulk", "bulk", "bulk"]
+
+
+def test_tenant_concurrency_cap():
+    """Test a capped tenant cannot take more slots than its limit."""
+    scheduler = FairScheduler(4, tenants=[Tenant("a", max_concurrency=1)])
+
+    async def run():
+        with tenant_context("a"):
+            first = await scheduler.aacquire()
+            waiting = asyncio.ensure_future(scheduler.aacquire())
+        with tenant_context("b"):
+            other = await scheduler.aacquire()
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        scheduler.release(first)
+        second = await waiting
+        scheduler.release(second)
+        scheduler.release(other)
+
+    asyncio.run(run())
+    assert scheduler.stats()["a"]["completed"] == 2
+
+
+def test_deadline_drops_queued_requests():
+    """Test sync and async requests queued past their deadline are dropped."""
+    scheduler = FairScheduler(1)
+    blocker = scheduler.acquire()
+    with tenant_context("late", timeout=0.05):
+        with pytest.raises(DeadlineExceededError):
+            scheduler.acquire()
+
+        async def run():
+            await scheduler.aacquire()
+
+        with pytest.raises(DeadlineExceededError):
+            asyncio.run(run())
+    scheduler.release(blocker)
+    assert scheduler.stats()["late"]["dropped"] == 2
+    assert scheduler.queue_depth == 0 and scheduler.in_flight == 0
+
+
+def test_token_budget_defers_tenant():
+    """Test a tenant out of budget waits for refill while others proceed."""
+    scheduler = FairScheduler(4, tenants=[Tenant("a", tokens_per_minute=600)])
+    with tenant_context("a"):
+        scheduler.release(scheduler.acquire(cost=603))
+        start = time.perf_counter()
+        started = []
+
+        def waiter() -> None:
+            with tenant_context("a"):
+                scheduler.release(scheduler.acquire())
+            started.append(time.perf_counter() - start)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+    with tenant_context("b"):
+        scheduler.release(scheduler.acquire())
+    assert not started
+    thread.join(2)
+    assert started and started[0] >= 0.2
+
+
+def test_asi_schedules_sync_and_async_calls():
+    """Test ASI calls go through the scheduler and charge reported usage."""
+    endpoint = MockEndpoint(lambda body: "ok")
+    scheduler = FairScheduler(2)
+    llm = ASI(
+        api_key="test",
+        max_retries=0,
+        scheduler=scheduler,
+        http_client=endpoint.http_client(),
+        async_http_client=endpoint.async_http_client(),
+    )
+    messages = [ChatMessage(role=MessageRole.USER, content="hi")]
+    with tenant_context("acme"):
+        llm.chat(messages)
+        assert "".join(r.delta for r in llm.stream_chat(messages)) == "ok"
+
+    async def run():
+        with tenant_context("acme", priority="batch"):
+            await asyncio.gather(*(llm.achat(messages) for _ in range(3)))
+
+    asyncio.run(run())
+    stats = scheduler.stats()["acme"]
+    assert stats["completed"] == 5
+    assert stats["tokens"] >= 4 * 5
+    assert scheduler.in_flight == 0
+
+
+def test_unconsumed_streams_hold_no_slot():
+    """Test a stream dropped before iteration leaves no slot taken."""
+    endpoint = MockEndpoint(lambda body: "ok")
+    scheduler = FairScheduler(max_concurrency=1)
+    llm = ASI(
+        api_key="test",
+        max_retries=0,
+        scheduler=scheduler,
+        http_client=endpoint.http_client(),
+        async_http_client=endpoint.async_http_client(),
+    )
+    messages = [ChatMessage(role=MessageRole.USER, content="hi")]
+    stream = llm.stream_chat(messages)
+    del stream
+    assert scheduler.in_flight == 0
+    assert llm.chat(messages).message.content == "ok"
+
+    async def run():
+        stream = await llm.astream_chat(messages)
+        del stream
+        assert scheduler.in_flight == 0
+        # The slot is charged to the tenant current when the stream was opened.
+        with tenant_context("acme"):
+            stream = await llm.astream_chat(messages)
+        return "".join([r.delta async for r in stream])
+
+    assert asyncio.run(run()) == "ok"
+    assert scheduler.stats()["acme"]["completed"] == 1
+    assert scheduler.in_flight == 0
+
+
+def test_lean_streams_and_prefetches_are_scheduled():
+    """Test lean streams and follow-up prefetches go through the scheduler."""
+    endpoint = MockEndpoint(lambda body: '{"a": 1}')
+    scheduler = FairScheduler(2)
+    tickets: List[tuple] = []
+    enqueue = scheduler._enqueue
+
+    def record(*args):
+        ticket = enqueue(*args)
+        tickets.append((ticket.tenant.config.name, ticket.priority))
+        return ticket
+
+    scheduler._enqueue = record
+    llm = ASI(
+        api_key="test",
+        max_retries=0,
+        scheduler=scheduler,
+        prefetch_follow_ups=["More."],
+        http_client=endpoint.http_client(),
+        async_http_client=endpoint.async_http_client(),
+    )
+    messages = [ChatMessage(role=MessageRole.USER, content="hi")]
+    with tenant_context("acme"):
+        assert "".join(llm.stream_chat_deltas(messages)) == '{"a": 1}'
+        assert list(llm.stream_structured("json?"))[-1].value == {"a": 1}
+
+    async def run():
+        with tenant_context("acme"):
+            return b"".join([c async for c in llm.astream_chat_sse(messages)])
+
+    assert asyncio.run(run()).startswith(b"data: ")
+    assert tickets == [("acme", "interactive")] * 3
+
+    with tenant_context("acme"):
+        llm.chat(messages)
+    deadline = time.monotonic() + 5
+    while llm.prefetcher.stats.completed < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    llm.prefetcher.close()
+    # The follow-up is batch work of the tenant whose chat triggered it.
+    assert tickets[3:] == [("acme", "interactive"), ("acme", "batch")]
+    assert scheduler.in_flight == 0
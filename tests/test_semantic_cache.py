@@ -0,0 +1,203 @@
+"""Unit tests for the semantic response cache."""
+
+import asyncio
+import re
+import time
+
+import numpy as np
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.semantic_cache import SemanticCache
+
+VOCABULARY = ["capital", "france", "germany", "paris", "city", "weather", "what"]
+
+
+def embed(text):
+    """Bag-of-words embedding over a tiny vocabulary."""
+    words = re.findall(r"[a-z]+", text.lower())
+    return [float(words.count(w)) for w in VOCABULARY] + [1e-3]
+
+
+class AsyncEmbedModel:
+    """Embedding model exposing the LlamaIndex method names."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_text_embedding(self, text):
+        self.calls += 1
+        return embed(text)
+
+    async def aget_text_embedding(self, text):
+        return self.get_text_embedding(text)
+
+
+def test_paraphrase_hits_and_unrelated_prompt_misses():
+    """Test that similar prompts share an answer and dissimilar ones do not."""
+    cache = SemanticCache(embed, threshold=0.9)
+    cache.set("What is the capital of France?", {"text": "Paris"})
+    assert cache.get("capital of France, what is it") == {"text": "Paris"}
+    assert cache.get("What is the capital of Germany?") is None
+    assert cache.stats.as_dict()["hits"] == 1
+    assert cache.stats.as_dict()["misses"] == 1
+
+
+def test_namespaces_and_scopes_are_isolated():
+    """Test that lookups only match entries of their namespace and scope."""
+    cache = SemanticCache(embed, threshold=0.9)
+    cache.set("capital of France", {"text": "a"}, namespace="docs-v1")
+    cache.set("capital of France", {"text": "b"}, namespace="docs-v2")
+    cache.set("capital of France", {"text": "c"}, namespace="docs-v2", scope="t=1")
+    assert cache.get("capital of France", namespace="docs-v1") == {"text": "a"}
+    assert cache.get("capital of France", namespace="docs-v2") == {"text": "b"}
+    assert cache.get("capital of France", "docs-v2", scope="t=1") == {"text": "c"}
+    assert cache.get("capital of France") is None
+
+
+def test_invalidate_namespace():
+    """Test that invalidation drops one namespace and frees its slots."""
+    cache = SemanticCache(embed, threshold=0.9)
+    cache.set("capital of France", {"text": "a"}, namespace="old")
+    cache.set("weather in Paris", {"text": "b"}, namespace="old")
+    cache.set("capital of France", {"text": "c"}, namespace="new")
+    assert cache.invalidate("old") == 2
+    assert len(cache) == 1
+    assert cache.get("capital of France", namespace="old") is None
+    cache.set("capital of Germany", {"text": "d"}, namespace="old")
+    assert len(cache) == 2
+
+
+def test_same_prompt_replaces_entry():
+    """Test that storing an identical prompt overwrites its answer."""
+    cache = SemanticCache(embed)
+    cache.set("capital of France", {"text": "old"})
+    cache.set("capital of France", {"text": "new"})
+    assert len(cache) == 1
+    assert cache.get("capital of France") == {"text": "new"}
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test LRU eviction once `max_size` is reached."""
+    cache = SemanticCache(embed, threshold=0.9, max_size=2)
+    cache.set("capital of France", {"text": "france"})
+    time.sleep(0.001)
+    cache.set("capital of Germany", {"text": "germany"})
+    time.sleep(0.001)
+    assert cache.get("capital of France") is not None
+    cache.set("weather in Paris", {"text": "weather"})
+    assert len(cache) == 2
+    assert cache.get("capital of Germany") is None
+    assert cache.get("capital of France") == {"text": "france"}
+    assert cache.stats.evictions == 1
+
+
+def test_in_memory_vectors_grow():
+    """Test that the in-memory matrix grows past its initial allocation."""
+    cache = SemanticCache(lambda text: np.eye(100)[int(text)], max_size=100)
+    for i in range(100):
+        cache.set(str(i), {"i": i})
+    assert len(cache) == 100
+    assert cache.get("70") == {"i": 70}
+
+
+def test_ttl_expires_entries():
+    """Test that expired entries miss."""
+    cache = SemanticCache(embed, ttl=0.01)
+    cache.set("capital of France", {"text": "Paris"})
+    time.sleep(0.02)
+    assert cache.get("capital of France") is None
+    assert len(cache) == 0
+
+
+def test_persists_across_instances(tmp_path):
+    """Test that a memory-mapped cache is reloaded from disk."""
+    path = str(tmp_path / "semantic")
+    cache = SemanticCache(embed, threshold=0.9, path=path)
+    cache.set("capital of France", {"text": "Paris"}, namespace="docs")
+    cache.set("weather in Paris", {"text": "sunny"}, namespace="other")
+    cache.invalidate("other")
+    cache.close()
+
+    reopened = SemanticCache(embed, threshold=0.9, path=path)
+    assert len(reopened) == 1
+    assert isinstance(reopened._vectors, np.memmap)
+    assert reopened.get("France capital", namespace="docs") == {"text": "Paris"}
+    reopened.set("capital of Germany", {"text": "Berlin"}, namespace="docs")
+    assert len(reopened) == 2
+    reopened.close()
+
+
+def test_async_lookup_reuses_embedding():
+    """Test aget/aset and that a missed prompt is embedded only once."""
+    model = AsyncEmbedModel()
+    cache = SemanticCache(model, threshold=0.9)
+
+    async def run():
+        assert await cache.aget("capital of France") is None
+        await cache.aset("capital of France", {"text": "Paris"})
+        return await cache.aget("France capital")
+
+    assert asyncio.run(run()) == {"text": "Paris"}
+    assert model.calls == 2
+
+
+def test_asi_answers_paraphrases_from_cache(mock_server):
+    """Test that ASI serves a paraphrased chat without a request."""
+    llm = ASI(
+        api_key="test_key",
+        http_client=mock_server.http_client(),
+        async_http_client=mock_server.async_http_client(),
+        semantic_cache=SemanticCache(embed, threshold=0.9),
+    )
+
+    def ask(text):
+        return llm.chat([ChatMessage(role=MessageRole.USER, content=text)])
+
+    first = ask("What is the capital of France?")
+    second = ask("capital of France, what is it?")
+    assert second.message.content == first.message.content
+    assert len(mock_server.requests) == 1
+
+    chunks = list(
+        llm.stream_chat(
+            [ChatMessage(role=MessageRole.USER, content="What is France's capital")]
+        )
+    )
+    assert chunks[-1].message.content == first.message.content
+    assert len(mock_server.requests) == 1
+
+    async def ask_async():
+        return await llm.acomplete("weather in the city")
+
+    asyncio.run(ask_async())
+    asyncio.run(ask_async())
+    assert len(mock_server.requests) == 2
+
+
+def test_asi_semantic_cache_respects_parameters(mock_server):
+    """Test that a different temperature does not reuse answers."""
+    llm = ASI(
+        api_key="test_key",
+        http_client=mock_server.http_client(),
+        semantic_cache=SemanticCache(embed),
+    )
+    messages = [ChatMessage(role=MessageRole.USER, content="capital of France")]
+    llm.chat(messages)
+    llm.chat(messages, temperature=0.9)
+    assert len(mock_server.requests) == 2
+
+
+def test_unpickled_copy_is_private(tmp_path):
+    """Test that a pickled persisted cache starts from its entries, privately."""
+    import pickle
+
+    path = str(tmp_path / "semantic")
+    cache = SemanticCache(embed, threshold=0.9, path=path)
+    cache.set("capital of France", {"text": "Paris"})
+
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.get("France capital") == {"text": "Paris"}
+    copy.set("capital of Germany", {"text": "Berlin"})
+    cache.close()
+    assert len(SemanticCache(embed, path=path)) == 1
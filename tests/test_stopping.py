@@ -0,0 +1,163 @@
+"""Unit tests for client-side early stopping of streams."""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List
+
+import httpx
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from benchmarks.mock_server import MockASIServer, MockServerConfig
+from llama_index_llms_asi import ASI, StopCondition
+from llama_index_llms_asi.stopping import StopMonitor
+
+from .conftest import chat_completion_sse
+
+MESSAGES = [ChatMessage(role=MessageRole.USER, content="What is 6 x 7?")]
+
+
+class EndlessBody(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """An SSE body that never ends, recording how much was read."""
+
+    def __init__(self, chunks: List[str], state: Dict[str, int]) -> None:
+        self.chunks = chunks
+        self.state = state
+
+    def _event(self, i: int) -> bytes:
+        self.state["sent"] += 1
+        chunk = self.chunks[i] if i < len(self.chunks) else f"filler{i} "
+        # Drop the [DONE] event.
+        return chat_completion_sse([chunk])[: -len(b"data: [DONE]\n\n")]
+
+    def __iter__(self) -> Iterator[bytes]:
+        for i in range(10_000):
+            yield self._event(i)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for i in range(10_000):
+            await asyncio.sleep(0)
+            yield self._event(i)
+
+    def close(self) -> None:
+        self.state["closed"] += 1
+
+    async def aclose(self) -> None:
+        self.state["closed"] += 1
+
+
+def _endless_llm(chunks: List[str], state: Dict[str, int], **kwargs: Any) -> ASI:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            stream=EndlessBody(chunks, state),
+            headers={"content-type": "text/event-stream"},
+        )
+
+    transport = httpx.MockTransport(handler)
+    return ASI(
+        api_key="test",
+        max_retries=0,
+        http_client=httpx.Client(transport=transport),
+        async_http_client=httpx.AsyncClient(transport=transport),
+        **kwargs,
+    )
+
+
+def test_stop_monitor_criteria():
+    """Test each criterion, with a stop sequence split across chunks."""
+    monitor = StopMonitor(StopCondition(stop=["</answer>", "\n\n"]))
+    emitted = [monitor.feed(d) for d in ["42 <", "/ans", "wer", "> more"]]
+    assert emitted == ["42 ", "", "", ""]
+    assert monitor.text == "42 " and monitor.reason == "stop_sequence"
+
+    # Held-back text that turns out not to be a stop sequence is released.
+    monitor = StopMonitor(StopCondition(stop="</answer>"))
+    assert [monitor.feed(d) for d in ["a </", "b> c <"]] == ["a ", "</b> c "]
+    assert monitor.flush() == "<" and monitor.reason is None
+
+    monitor = StopMonitor(StopCondition(pattern=r"[.!?](\s|$)"))
+    assert monitor.feed("It is 4") == "It is 4"
+    assert monitor.feed("2. Because") == "2. "
+    assert monitor.text == "It is 42. " and monitor.reason == "pattern"
+
+    monitor = StopMonitor(StopCondition(max_tokens=3))
+    assert monitor.feed("one two") == "one two"
+    assert monitor.feed(" three four five").split() == ["three"]
+    assert monitor.reason == "max_tokens" and monitor.tokens == 3
+
+    monitor = StopMonitor(StopCondition(predicate=lambda text: "}" in text))
+    assert monitor.feed('{"a": 1') == '{"a": 1'
+    assert monitor.feed("} trailing") == "} trailing"
+    assert monitor.reason == "predicate" and monitor.feed("more") == ""
+
+
+def test_stop_closes_the_http_stream():
+    """Test a stopped stream closes its response after a few chunks."""
+    state = {"sent": 0, "closed": 0}
+    chunks = ["The answer", " is 4", "2.\nQ", "uestion: ", "what"]
+    llm = _endless_llm(chunks, state)
+    responses = list(
+        llm.stream_chat(MESSAGES, stop_condition=StopCondition(stop="\nQuestion:"))
+    )
+    assert "".join(r.delta for r in responses) == "The answer is 42."
+    assert responses[-1].message.content == "The answer is 42."
+    assert responses[-1].additional_kwargs["stop_reason"] == "stop_sequence"
+    assert state == {"sent": 4, "closed": 1}
+
+    # A default condition on the LLM applies to completions too.
+    state.update(sent=0, closed=0)
+    llm = _endless_llm(chunks, state, stop_condition=StopCondition(pattern=r"\d\."))
+    responses = list(llm.stream_complete("What is 6 x 7?"))
+    assert responses[-1].text == "The answer is 42."
+    assert responses[-1].additional_kwargs["stop_reason"] == "pattern"
+    assert state == {"sent": 3, "closed": 1}
+
+    async def run() -> List[Any]:
+        condition = StopCondition(predicate=lambda text: "filler" in text)
+        stream = await llm.astream_chat(MESSAGES, stop_condition=condition)
+        responses = [r async for r in stream]
+        # The response is closed as the abandoned generators are finalized.
+        for _ in range(10):
+            await asyncio.sleep(0)
+        return responses
+
+    state.update(sent=0, closed=0)
+    responses = asyncio.run(run())
+    assert responses[-1].delta == "filler5 "
+    assert responses[-1].additional_kwargs["stop_reason"] == "predicate"
+    assert state == {"sent": 6, "closed": 1}
+
+
+def test_max_time_bounds_slow_streams():
+    """Test a wall-clock budget ends slow streams on time, sync and async."""
+    # The full reply would take 5 seconds.
+    config = MockServerConfig(completion_tokens=100, tokens_per_second=20)
+    condition = StopCondition(max_time=0.4)
+    with MockASIServer(config) as server:
+        llm = ASI(api_key="mock", api_base=server.url, max_retries=0)
+
+        start = time.perf_counter()
+        responses = list(llm.stream_chat(MESSAGES, stop_condition=condition))
+        assert time.perf_counter() - start < 1.0
+        assert responses[-1].additional_kwargs["stop_reason"] == "max_time"
+        assert responses[-1].message.content.startswith("tok0 ")
+
+        async def run() -> List[Any]:
+            stream = await llm.astream_complete("hi", stop_condition=condition)
+            return [r async for r in stream]
+
+        start = time.perf_counter()
+        responses = asyncio.run(run())
+        assert time.perf_counter() - start < 1.0
+        assert responses[-1].additional_kwargs["stop_reason"] == "max_time"
+        assert responses[-1].text.startswith("tok0 ")
+
+        # Streams that finish in time are passed through untouched.
+        fast = StopCondition(stop="never", max_tokens=1000, max_time=30)
+        llm = ASI(api_key="mock", api_base=server.url, max_retries=0)
+        server.config.tokens_per_second = None
+        responses = list(llm.stream_chat(MESSAGES, stop_condition=fast))
+        assert responses[-1].message.content == "".join(
+            f"tok{i} " for i in range(100)
+        )
+        assert "stop_reason" not in responses[-1].additional_kwargs
@@ -0,0 +1,78 @@
+"""Unit tests for the lean ASI streaming path."""
+
+import asyncio
+
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from benchmarks.mock_server import MockASIServer, MockServerConfig
+from llama_index_llms_asi import ASI, DeltaStream
+from llama_index_llms_asi.streaming import SSEDecoder
+
+from .conftest import chat_completion_sse
+
+
+def test_sse_decoder_handles_split_events():
+    """Test events split across arbitrary chunk boundaries."""
+    raw = b"data: one\n\n: comment\n\ndata: two\ndata: lines\n\ndata: [DONE]\n\n"
+    decoder = SSEDecoder()
+    payloads = []
+    for i in range(len(raw)):
+        payloads.extend(decoder.feed(raw[i : i + 1]))
+    assert payloads == [b"one", b"two\nlines", b"[DONE]"]
+
+
+def test_sse_decoder_handles_crlf_split():
+    """Test CRLF framing, including a CR and LF in different chunks."""
+    decoder = SSEDecoder()
+    assert decoder.feed(b"data: a\r\n\r") == []
+    assert decoder.feed(b"\ndata: b\r\n\r\n") == [b"a", b"b"]
+
+
+def test_sse_decoder_scans_large_events_once():
+    """Test an event split into many chunks is completed without rescans."""
+    raw = b"data: " + b"x" * 10_000 + b"\r\n\r\ndata: y\r\n\r\n"
+    decoder = SSEDecoder()
+    payloads = []
+    for i in range(0, len(raw), 7):
+        payloads.extend(decoder.feed(raw[i : i + 7]))
+        assert decoder._scan >= len(decoder._buffer) - 2
+    assert payloads == [b"x" * 10_000, b"y"]
+
+
+def test_delta_stream_accumulates_lazily():
+    """Test deltas are yielded as is and joined on demand."""
+    raw = chat_completion_sse(["Hello", ", ", "world"])
+    stream = DeltaStream(iter([raw[:50], raw[50:]]))
+    assert list(stream) == ["Hello", ", ", "world"]
+    assert stream.text == "Hello, world"
+    assert stream.done
+
+
+def test_delta_stream_raises_on_error_event():
+    """Test that error events in the stream are surfaced."""
+    stream = DeltaStream(iter([b'data: {"error": {"message": "overloaded"}}\n\n']))
+    with pytest.raises(ValueError):
+        list(stream)
+
+
+def test_asi_delta_and_raw_streams():
+    """Test the lean and passthrough paths against the mock server."""
+    config = MockServerConfig(completion_tokens=4, chunk_tokens=2)
+    messages = [ChatMessage(role=MessageRole.USER, content="hi")]
+    with MockASIServer(config) as server:
+        llm = ASI(api_key="mock", api_base=server.url, max_retries=0)
+
+        stream = llm.stream_chat_deltas(messages)
+        assert list(stream) == ["tok0 tok1 ", "tok2 tok3 "]
+        assert stream.text == "tok0 tok1 tok2 tok3 "
+
+        raw = b"".join(llm.stream_chat_sse(messages))
+        assert raw.startswith(b"data: {")
+        assert raw.endswith(b"data: [DONE]\n\n")
+
+        async def run():
+            stream = llm.astream_chat_deltas(messages)
+            return await stream.read()
+
+        assert asyncio.run(run()) == "tok0 tok1 tok2 tok3 "
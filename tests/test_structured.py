@@ -0,0 +1,147 @@
+"""Unit tests for incremental structured output parsing."""
+
+import asyncio
+import json
+from typing import List
+
+import pytest
+from llama_index.core.bridge.pydantic import BaseModel
+
+from llama_index_llms_asi import ASI, StructuredOutputError, StructuredStream
+from llama_index_llms_asi.structured import JSONStreamParser
+
+from .conftest import MockEndpoint
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+    tags: List[str] = []
+
+
+def _feed_chars(parser: JSONStreamParser, text: str) -> list:
+    items = []
+    for char in text:
+        items.extend((item.path, item.value) for item in parser.feed(char))
+    return items
+
+
+def test_parser_emits_fields_as_they_close():
+    """Test fields, nested values and the document across 1-char deltas."""
+    text = 'Sure:\n```json\n{"a": 1, "b": {"c": [1, "}"]}, "d": "x\\"y"}\n```'
+    items = _feed_chars(JSONStreamParser(), text)
+    assert items == [
+        (("a",), 1),
+        (("b",), {"c": [1, "}"]}),
+        (("d",), 'x"y'),
+        ((), {"a": 1, "b": {"c": [1, "}"]}, "d": 'x"y'}),
+    ]
+
+
+def test_parser_emits_array_elements_before_the_end():
+    """Test each array element is emitted once its delimiter arrives."""
+    parser = JSONStreamParser()
+    assert [(i.path, i.value) for i in parser.feed('[{"x": 1}, 2')] == [
+        ((0,), {"x": 1})
+    ]
+    assert [i.value for i in parser.feed(", 3")] == [2]
+    items = parser.feed("]")
+    assert [(i.path, i.value) for i in items] == [((2,), 3), ((), [{"x": 1}, 2, 3])]
+
+
+def test_parser_validates_list_schemas_per_item():
+    """Test a `List[Model]` schema validates elements against the model."""
+    parser = JSONStreamParser(List[Person])
+    text = '[{"name": "a", "age": 1}, {"name": "b", "age": "2"}]'
+    items = [(i.path, i.value) for i in parser.feed(text)]
+    people = [Person(name="a", age=1), Person(name="b", age=2)]
+    assert items == [((0,), people[0]), ((1,), people[1]), ((), people)]
+
+    parser = JSONStreamParser(List[Person])
+    with pytest.raises(StructuredOutputError):
+        parser.feed('[{"name": "a", "age": "old"}')
+        parser.feed("]")
+
+
+def test_parser_json_lines_validates_records():
+    """Test JSON Lines records are validated into schema instances."""
+    parser = JSONStreamParser(Person, json_lines=True)
+    lines = '{"name": "a", "age": 1}\n{"name": "b", "age": 2}\n'
+    records = [i.value for i in parser.feed(lines) if not i.path]
+    parser.finish()
+    assert records == [Person(name="a", age=1), Person(name="b", age=2)]
+
+
+def test_parser_fails_fast_on_invalid_field():
+    """Test a field of the wrong type fails before the document closes."""
+    parser = JSONStreamParser(Person)
+    assert [i.value for i in parser.feed('{"name": "a", ')] == ["a"]
+    with pytest.raises(StructuredOutputError) as e:
+        parser.feed('"age": "old", ')
+    assert e.value.text.endswith('"old", ')
+    assert parser.done
+
+
+@pytest.mark.parametrize("text", ['{"a": 1,, "b": 2}', '{"a": 1]', '{"a": tru,'])
+def test_parser_rejects_malformed_json(text):
+    """Test syntax errors raise `StructuredOutputError`."""
+    with pytest.raises(StructuredOutputError):
+        JSONStreamParser().feed(text)
+
+
+def test_parser_finish_detects_truncation():
+    """Test a stream ending mid-document (or without one) is an error."""
+    parser = JSONStreamParser()
+    parser.feed('{"a": [1, 2')
+    with pytest.raises(StructuredOutputError):
+        parser.finish()
+    with pytest.raises(StructuredOutputError):
+        JSONStreamParser().finish()
+
+
+def test_stream_closes_upstream_when_done():
+    """Test the delta stream is closed once the document ends."""
+    closed = []
+
+    def deltas():
+        try:
+            yield '{"name": "a", "age": 3}'
+            yield " trailing prose that is never read"
+            raise AssertionError("read past the document")
+        finally:
+            closed.append(True)
+
+    stream = StructuredStream(deltas(), schema=Person)
+    assert stream.result() == Person(name="a", age=3)
+    assert closed == [True]
+
+
+def test_asi_stream_structured():
+    """Test structured streaming end to end, sync and async."""
+    reply = {"name": "Ada", "age": 36, "tags": ["math", "engines"]}
+    endpoint = MockEndpoint(lambda body: "Here you go: " + json.dumps(reply))
+    llm = ASI(
+        api_key="test",
+        max_retries=0,
+        http_client=endpoint.http_client(),
+        async_http_client=endpoint.async_http_client(),
+    )
+    items = list(llm.stream_structured("Describe Ada.", schema=Person))
+    assert [item.path for item in items] == [("name",), ("age",), ("tags",), ()]
+    assert items[-1].value == Person(**reply)
+
+    async def run():
+        stream = llm.astream_structured("Describe Ada.", schema=Person)
+        return await stream.result()
+
+    assert asyncio.run(run()) == Person(**reply)
+
+
+def test_asi_stream_structured_aborts_on_invalid_output():
+    """Test invalid output raises and stops the stream."""
+    endpoint = MockEndpoint(lambda body: '{"name": "Ada", "age": "unknown"}')
+    llm = ASI(api_key="test", max_retries=0, http_client=endpoint.http_client())
+    stream = llm.stream_structured("Describe Ada.", schema=Person)
+    with pytest.raises(StructuredOutputError):
+        list(stream)
+    assert stream.text.startswith('{"name": "Ada"')
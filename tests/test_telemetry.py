@@ -0,0 +1,148 @@
+"""Unit tests for ASI telemetry."""
+
+import asyncio
+
+import httpx
+import pytest
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from benchmarks.mock_server import MockASIServer, MockServerConfig
+from llama_index_llms_asi import (
+    ASI,
+    CallbackSink,
+    CallMetrics,
+    HistogramSink,
+    InMemoryCache,
+    OpenTelemetrySink,
+    PrometheusSink,
+)
+from llama_index_llms_asi.telemetry import TracingTransport
+
+MESSAGES = [ChatMessage(role=MessageRole.USER, content="hi")]
+
+
+def _llm(mock_server, sink, **kwargs):
+    return ASI(
+        api_key="test_key",
+        max_retries=0,
+        telemetry=sink,
+        http_client=mock_server.http_client(),
+        async_http_client=mock_server.async_http_client(),
+        **kwargs,
+    )
+
+
+def test_records_tokens_and_cache_events(mock_server):
+    """Test token counts and cache hits are recorded per call."""
+    calls = []
+    llm = _llm(mock_server, CallbackSink(calls.append), cache=InMemoryCache())
+    llm.chat(MESSAGES)
+    llm.chat(MESSAGES)
+
+    first, second = calls
+    assert first.operation == "chat"
+    assert (first.prompt_tokens, first.completion_tokens) == (3, 2)
+    assert first.cache_hit is False
+    assert second.cache_hit is True
+    assert first.duration > 0
+    assert first.error is None
+
+
+def test_records_stream_timings(mock_server):
+    """Test time to first token and stream duration of streamed calls."""
+    calls = []
+    llm = _llm(mock_server, CallbackSink(calls.append))
+    assert "".join(r.delta for r in llm.stream_chat(MESSAGES)) == "echo hi"
+
+    async def run():
+        stream = await llm.astream_chat(MESSAGES)
+        return [r.delta async for r in stream]
+
+    asyncio.run(run())
+    for call in calls:
+        assert call.time_to_first_token is not None
+        assert call.stream_duration is not None
+        assert call.parse is None
+    assert [c.operation for c in calls] == ["stream_chat", "astream_chat"]
+
+
+def test_records_errors():
+    """Test failed calls are emitted with their error type."""
+    calls = []
+
+    def handler(request):
+        return httpx.Response(500, json={"error": {"message": "boom"}})
+
+    llm = ASI(
+        api_key="test_key",
+        max_retries=0,
+        telemetry=CallbackSink(calls.append),
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    with pytest.raises(Exception):
+        llm.chat(MESSAGES)
+    assert calls[0].error == "InternalServerError"
+
+
+def test_transport_timings_over_http():
+    """Test connection, serialization and server timings on real sockets."""
+    sink = HistogramSink()
+    with MockASIServer(MockServerConfig(latency=0.02)) as server:
+        llm = ASI(api_key="mock", api_base=server.url, max_retries=2, telemetry=sink)
+        llm.chat(MESSAGES)
+        asyncio.run(llm.achat(MESSAGES))
+
+    summary = sink.summary()
+    assert summary["calls"] == 2
+    assert summary["retries"] == 0
+    for timing in ("serialize", "connection_wait", "time_to_first_byte", "parse"):
+        assert sink.histograms[timing].count == 2, timing
+    assert sink.percentile("time_to_first_byte", 0.5) >= 0.02
+
+
+def test_no_tracing_without_sink():
+    """Test that the tracing transport is only installed with a sink."""
+    llm = ASI(api_key="test_key")
+    transport = llm._wrap_transport(httpx.MockTransport(lambda r: None), False)
+    assert not isinstance(transport, TracingTransport)
+
+
+def test_prometheus_render():
+    """Test the Prometheus text exposition output."""
+    sink = PrometheusSink(buckets=(0.1, 1.0))
+    call = CallMetrics("chat", "asi1-mini")
+    call.finish()
+    call.duration = 0.5
+    call.prompt_tokens = 7
+    sink.emit(call)
+    text = sink.render()
+    labels = 'operation="chat",model="asi1-mini"'
+    assert "# TYPE asi_duration_seconds histogram" in text
+    assert f'asi_duration_seconds_bucket{{{labels},le="0.1"}} 0' in text
+    assert f'asi_duration_seconds_bucket{{{labels},le="1"}} 1' in text
+    assert f'asi_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f'asi_requests_total{{{labels},status="ok"}} 1' in text
+    assert f'asi_tokens_total{{{labels},type="prompt"}} 7' in text
+
+
+def test_opentelemetry_spans():
+    """Test that calls are exported as spans on the given tracer."""
+
+    class Span:
+        def end(self, end_time):
+            self.end_time = end_time
+
+    class Tracer:
+        def start_span(self, name, start_time, attributes):
+            self.name, self.start_time, self.attributes = name, start_time, attributes
+            self.span = Span()
+            return self.span
+
+    tracer = Tracer()
+    call = CallMetrics("achat", "asi1-mini")
+    call.finish()
+    call.completion_tokens = 4
+    OpenTelemetrySink(tracer=tracer).emit(call)
+    assert tracer.name == "achat asi1-mini"
+    assert tracer.attributes["gen_ai.usage.output_tokens"] == 4
+    assert tracer.span.end_time >= tracer.start_time
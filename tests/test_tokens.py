@@ -0,0 +1,120 @@
+"""Unit tests for ASI model metadata, token counting and budgeting."""
+
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.models import ModelInfo, get_model_info, register_model
+from llama_index_llms_asi.tokens import (
+    TokenCounter,
+    estimate_tokens,
+    fit_messages,
+    pack_nodes,
+)
+
+
+def _message(role, content):
+    return ChatMessage(role=role, content=content)
+
+
+def test_estimate_tokens():
+    """Test the heuristic on typical text."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello world") == 2
+    assert estimate_tokens("The quick brown fox jumps over the lazy dog.") == 10
+    assert estimate_tokens("1234567") == 3
+    # Long words and CJK text tokenize finely: overestimate them too.
+    assert estimate_tokens("internationalization") == 5
+    assert estimate_tokens("你好世界") == 6
+
+
+def test_counter_memoizes_and_uses_tokenizer():
+    """Test that counts are cached and a tokenizer overrides the heuristic."""
+
+    class Tokenizer:
+        calls = 0
+
+        def encode(self, text):
+            Tokenizer.calls += 1
+            return text.split()
+
+    counter = TokenCounter(Tokenizer())
+    assert counter.count("a b c") == 3
+    assert counter.count("a b c") == 3
+    assert Tokenizer.calls == 1
+    assert counter.truncate("a b c d", 2) == "a b "
+
+
+def test_fit_messages_keeps_system_and_newest():
+    """Test that the oldest turns are dropped first."""
+    messages = [
+        _message(MessageRole.SYSTEM, "be brief"),
+        _message(MessageRole.USER, "word " * 50),
+        _message(MessageRole.ASSISTANT, "word " * 50),
+        _message(MessageRole.USER, "latest question"),
+    ]
+    kept = fit_messages(messages, budget=80)
+    assert [m.content for m in kept] == ["be brief", "word " * 50, "latest question"]
+    kept = fit_messages(messages, budget=30)
+    assert [m.content for m in kept] == ["be brief", "latest question"]
+    assert fit_messages(messages, budget=10_000) == messages
+
+
+def test_fit_messages_truncates_oversized_newest():
+    """Test that a lone oversized message is truncated to fit."""
+    messages = [_message(MessageRole.USER, "word " * 100)]
+    (kept,) = fit_messages(messages, budget=20)
+    assert 0 < len(kept.content) < len(messages[0].content)
+
+
+def test_fit_messages_drops_orphaned_tool_results():
+    """Test that tool results are not kept without their call."""
+    messages = [
+        _message(MessageRole.ASSISTANT, "word " * 50),
+        _message(MessageRole.TOOL, "result"),
+        _message(MessageRole.USER, "thanks"),
+    ]
+    kept = fit_messages(messages, budget=30)
+    assert [m.role for m in kept] == [MessageRole.USER]
+
+
+def test_pack_nodes_skips_oversized():
+    """Test greedy packing in relevance order."""
+    nodes = [
+        NodeWithScore(node=TextNode(text="short one"), score=0.9),
+        NodeWithScore(node=TextNode(text="long " * 100), score=0.8),
+        NodeWithScore(node=TextNode(text="short two"), score=0.7),
+    ]
+    packed = pack_nodes(nodes, budget=20)
+    assert [n.score for n in packed] == [0.9, 0.7]
+
+
+def test_registry_drives_asi_metadata():
+    """Test registry context windows and the default reply reservation."""
+    llm = ASI(api_key="test_key")
+    assert llm.metadata.context_window == get_model_info("asi1-mini").context_window
+    assert llm.prompt_budget == llm.context_window - 4096
+
+    register_model("asi1-test", ModelInfo(context_window=1000, num_output=100))
+    llm = ASI(model="asi1-test", api_key="test_key", max_tokens=50)
+    assert llm.prompt_budget == 950
+    assert ASI(api_key="test_key", context_window=2000).context_window == 2000
+
+
+def test_asi_trims_before_sending(mock_server):
+    """Test that trim_to_context_window trims the sent history."""
+    llm = ASI(
+        api_key="test_key",
+        context_window=200,
+        max_tokens=150,
+        trim_to_context_window=True,
+        http_client=mock_server.http_client(),
+    )
+    messages = [
+        _message(MessageRole.USER, "word " * 100),
+        _message(MessageRole.ASSISTANT, "ok"),
+        _message(MessageRole.USER, "hi"),
+    ]
+    assert llm.chat(messages).message.content == "echo hi"
+    sent = mock_server.requests[0]["messages"]
+    assert [m["content"] for m in sent] == ["ok", "hi"]
@@ -0,0 +1,167 @@
+"""Unit tests for ASI function calling and concurrent tool execution."""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from llama_index.core.llms.llm import ToolSelection
+from llama_index.core.tools import FunctionTool
+
+from llama_index_llms_asi import ASI, acall_tools, call_tools
+
+from .conftest import chat_completion_body
+
+TOOL_CALLS = [
+    {
+        "id": "call_0",
+        "type": "function",
+        "function": {"name": "slow_add", "arguments": '{"a": 1, "b": 2}'},
+    },
+    {
+        "id": "call_1",
+        "type": "function",
+        "function": {"name": "slow_add", "arguments": '{"a": 3, "b": 4}'},
+    },
+]
+
+
+def slow_add(a: int, b: int) -> int:
+    """Add two numbers, slowly."""
+    time.sleep(0.2)
+    return a + b
+
+
+def _tool_call_sse() -> bytes:
+    """Stream both tool calls, splitting their arguments across chunks."""
+    deltas: List[Dict[str, Any]] = []
+    for index, call in enumerate(TOOL_CALLS):
+        arguments = call["function"]["arguments"]
+        deltas.append(
+            {
+                "index": index,
+                "id": call["id"],
+                "type": "function",
+                "function": {"name": "slow_add", "arguments": arguments[:5]},
+            }
+        )
+        deltas.append({"index": index, "function": {"arguments": arguments[5:]}})
+    events = []
+    for delta in deltas:
+        chunk = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "asi1-mini",
+            "choices": [
+                {"index": 0, "delta": {"tool_calls": [delta]}, "finish_reason": None}
+            ],
+        }
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+def _handler(requests: List[Dict[str, Any]]) -> Any:
+    def handle(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        if body.get("stream"):
+            return httpx.Response(
+                200,
+                content=_tool_call_sse(),
+                headers={"content-type": "text/event-stream"},
+            )
+        payload = chat_completion_body("")
+        payload["choices"][0]["message"]["tool_calls"] = TOOL_CALLS
+        payload["choices"][0]["finish_reason"] = "tool_calls"
+        return httpx.Response(200, json=payload)
+
+    return handle
+
+
+@pytest.fixture
+def tool_llm():
+    requests: List[Dict[str, Any]] = []
+    transport = httpx.MockTransport(_handler(requests))
+    llm = ASI(
+        api_key="test",
+        max_retries=0,
+        http_client=httpx.Client(transport=transport),
+        async_http_client=httpx.AsyncClient(transport=transport),
+    )
+    llm._test_requests = requests  # type: ignore[attr-defined]
+    return llm
+
+
+def test_function_calling_defaults_from_registry():
+    """Test registered models enable function calling unless overridden."""
+    assert ASI(api_key="test").metadata.is_function_calling_model
+    assert not ASI(api_key="test", model="unknown-model").is_function_calling_model
+    llm = ASI(api_key="test", is_function_calling_model=False)
+    assert not llm.metadata.is_function_calling_model
+
+
+def test_chat_with_tools_sends_native_tools(tool_llm):
+    """Test tool schemas are sent and tool calls parsed from the reply."""
+    tool = FunctionTool.from_defaults(fn=slow_add)
+    response = tool_llm.chat_with_tools(
+        [tool], user_msg="Add things.", allow_parallel_tool_calls=True
+    )
+    request = tool_llm._test_requests[-1]
+    assert request["tools"][0]["function"]["name"] == "slow_add"
+    assert request["parallel_tool_calls"] is True
+    calls = tool_llm.get_tool_calls_from_response(response)
+    assert [(c.tool_id, c.tool_kwargs) for c in calls] == [
+        ("call_0", {"a": 1, "b": 2}),
+        ("call_1", {"a": 3, "b": 4}),
+    ]
+
+
+def test_stream_chat_with_tools_accumulates_deltas(tool_llm):
+    """Test streamed tool-call deltas are assembled into complete calls."""
+    tool = FunctionTool.from_defaults(fn=slow_add)
+    *_, last = tool_llm.stream_chat_with_tools([tool], user_msg="Add things.")
+    calls = tool_llm.get_tool_calls_from_response(last)
+    assert [c.tool_kwargs for c in calls] == [{"a": 1, "b": 2}, {"a": 3, "b": 4}]
+
+
+def test_predict_and_call_runs_tools_concurrently(tool_llm):
+    """Test both tool calls of a turn overlap, sync and async."""
+    tool = FunctionTool.from_defaults(fn=slow_add)
+    start = time.perf_counter()
+    response = tool_llm.predict_and_call(
+        [tool], user_msg="Add things.", allow_parallel_tool_calls=True
+    )
+    assert time.perf_counter() - start < 0.35
+    assert response.response == "3\n\n7"
+
+    start = time.perf_counter()
+    response = asyncio.run(
+        tool_llm.apredict_and_call(
+            [tool], user_msg="Add things.", allow_parallel_tool_calls=True
+        )
+    )
+    assert time.perf_counter() - start < 0.35
+    assert [s.raw_output for s in response.sources] == [3, 7]
+
+
+def test_call_tools_respects_max_concurrency():
+    """Test calls are limited, results ordered and errors returned."""
+    tool = FunctionTool.from_defaults(fn=slow_add)
+    calls = [
+        ToolSelection(
+            tool_id=str(i), tool_name="slow_add", tool_kwargs={"a": i, "b": 0}
+        )
+        for i in range(3)
+    ]
+    start = time.perf_counter()
+    outputs = call_tools(calls, [tool], max_concurrency=1)
+    assert time.perf_counter() - start >= 0.6
+    assert [o.raw_output for o in outputs] == [0, 1, 2]
+
+    bad = ToolSelection(tool_id="x", tool_name="slow_add", tool_kwargs={"a": 1})
+    (output,) = asyncio.run(acall_tools([bad], [tool]))
+    assert output.is_error
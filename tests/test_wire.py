@@ -0,0 +1,119 @@
+"""Unit tests for the compact request encoding path."""
+
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import httpx
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from benchmarks.mock_server import MockASIServer, MockServerConfig
+from llama_index_llms_asi import ASI
+from llama_index_llms_asi.recording import request_key
+from llama_index_llms_asi.wire import RequestEncoder, request_body
+
+from .conftest import MockEndpoint
+
+CONTEXT = "Retrieved context. " * 200
+
+
+def _messages(question: str) -> List[ChatMessage]:
+    return [
+        ChatMessage(role=MessageRole.SYSTEM, content=CONTEXT),
+        ChatMessage(role=MessageRole.USER, content=question),
+    ]
+
+
+def _llm(endpoint: MockEndpoint, **kwargs: Any) -> ASI:
+    return ASI(
+        api_key="test",
+        max_retries=0,
+        http_client=endpoint.http_client(),
+        async_http_client=endpoint.async_http_client(),
+        **kwargs,
+    )
+
+
+def test_compact_bodies_match_sdk_bodies():
+    """Test the compact path sends the same JSON for every call style."""
+    default = MockEndpoint(lambda body: "an answer")
+    compact = MockEndpoint(lambda body: "an answer")
+    kwargs: Dict[str, Any] = {"temperature": 0.2, "max_tokens": 64}
+
+    for llm in [
+        _llm(default, **kwargs),
+        _llm(compact, compact_requests=True, **kwargs),
+    ]:
+        assert llm.chat(_messages("q1"), stop=["\n"]).message.content == "an answer"
+        assert "".join(r.delta for r in llm.stream_chat(_messages("q2"))) == (
+            "an answer"
+        )
+        assert "".join(llm.stream_chat_deltas(_messages("q3"))) == "an answer"
+
+        async def run():
+            response = await llm.achat(_messages("q4"))
+            stream = await llm.astream_chat(_messages("q5"))
+            return response.message.content, [r.delta async for r in stream]
+
+        content, deltas = asyncio.run(run())
+        assert content == "an answer" and "".join(deltas) == "an answer"
+
+    assert compact.requests == default.requests
+    encoder = llm.request_encoder
+    assert encoder is not None
+    assert encoder.stats.requests == 5
+    # The context is encoded once and reused by the other requests.
+    assert encoder.stats.messages_reused == 4
+
+
+def test_gzip_request_bodies():
+    """Test large bodies are gzipped and understood by the server."""
+    bodies: List[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(request.content)
+        assert request.headers["content-encoding"] == "gzip"
+        body = json.loads(request_body(request))
+        return httpx.Response(
+            200,
+            json={
+                "id": "x",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "ok"},
+                        "finish_reason": "stop",
+                    }
+                ],
+            },
+        )
+
+    llm = ASI(
+        api_key="test",
+        max_retries=0,
+        gzip_requests=True,
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    assert llm.chat(_messages("q")).message.content == "ok"
+    encoder = llm.request_encoder
+    assert encoder is not None
+    assert encoder.stats.bytes_sent == len(bodies[0]) < encoder.stats.bytes_encoded
+
+    # Recording keys see through the compression.
+    plain = RequestEncoder().encode([{"role": "user", "content": "hi"}], {})[0]
+    gzipped, headers = RequestEncoder(gzip_min_size=0).encode(
+        [{"role": "user", "content": "hi"}], {}
+    )
+    url = "https://x/v1/chat/completions"
+    assert request_key(httpx.Request("POST", url, content=plain)) == request_key(
+        httpx.Request("POST", url, content=gzipped, headers=headers)
+    )
+
+    with MockASIServer(MockServerConfig(completion_tokens=2)) as server:
+        llm = ASI(
+            api_key="mock", api_base=server.url, max_retries=0, gzip_requests=True
+        )
+        assert llm.chat(_messages("q")).message.content == "tok0 tok1 "